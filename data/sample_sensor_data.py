@@ -16,8 +16,8 @@ def generate_sample_data():
     # Danh sách thiết bị
     equipment_ids = ['PUMP-101', 'PUMP-102', 'COMPRESSOR-A1', 'COMPRESSOR-B2', 'VALVE-S22']
     
-    # Khởi tạo DataFrame rỗng
-    all_data = pd.DataFrame()
+    # Gom các DataFrame của từng thiết bị rồi nối một lần
+    frames = []
     
     for equipment_id in equipment_ids:
         # Tạo dữ liệu cho mỗi thiết bị
@@ -84,8 +84,9 @@ def generate_sample_data():
         # Thêm ngày bảo trì cuối cùng (ngẫu nhiên trong khoảng 30-120 ngày trước)
         df['last_maintenance'] = start_date - timedelta(days=np.random.randint(30, 120))
         
-        # Thêm vào DataFrame chính
-        all_data = pd.concat([all_data, df])
+        frames.append(df)
+    
+    all_data = pd.concat(frames)
     
     # Đảm bảo thư mục tồn tại
     if not os.path.exists("data"):
@@ -8,14 +8,40 @@ from src.models.anomaly_detector import AnomalyDetector
 from src.advisors.llm_advisor import LLMAdvisor
 from src.agents.maintenance_agent import MaintenanceAgent
 from src.ui.maintenance_dashboard import MaintenanceDashboard
+from src.data.results_store import ResultsStore
+from src.data.rollups import RollupStore
+from src.advisors.recommendation_index import RecommendationIndex
 
-def main():
-    load_dotenv()
+# Dữ liệu demo được sinh một lần và lưu lại, để kết quả đã lưu khớp với dữ liệu ở các lần khởi động sau
+DEMO_DATA_PATH = "data/demo_sensor_data.csv"
+
+
+@st.cache_resource
+def load_agent() -> MaintenanceAgent:
+    """Build the agent and its stores once per server process.
+    
+    Streamlit reruns the script on every interaction; the cached agent keeps the
+    loaded data, the model and the SQLite connections across reruns.
+    """
     api_key = os.getenv("OPENAI_API_KEY")
     
-    agent = MaintenanceAgent(api_key=api_key)
-    agent.initialize_system()
-    agent.process_all_equipment()
+    agent = MaintenanceAgent(api_key=api_key, results_store=ResultsStore(),
+                             model_path="models/pretrained/anomaly_detector.joblib",
+                             rollup_store=RollupStore(),
+                             recommendation_index=RecommendationIndex(path="data/recommendation_index.joblib"))
+    if not os.path.exists(DEMO_DATA_PATH):
+        SensorDataProcessor().generate_synthetic_data().to_csv(DEMO_DATA_PATH, index=False)
+    agent.initialize_system(DEMO_DATA_PATH)
+    
+    # Đọc kết quả đã tính sẵn; chỉ xử lý lại khi chúng không thuộc về dữ liệu đang nạp
+    if not agent.load_results():
+        agent.process_all_equipment()
+    return agent
+
+
+def main():
+    load_dotenv()
+    agent = load_agent()
     
     # Khởi động bảng điều khiển
     dashboard = MaintenanceDashboard(agent)
@@ -3,6 +3,7 @@ import sys
 import importlib.util
 from pathlib import Path
 import subprocess
+from setuptools import setup, find_packages
 
 def generate_sample_data():
     spec = importlib.util.spec_from_file_location("sample_sensor_data", "data/sample_sensor_data.py")
@@ -43,5 +44,24 @@ def main():
     create_model_configs()
 
 
+def read_requirements():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "requirements.txt")) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
 if __name__ == "__main__":
-    main()
+    # `python setup.py` khởi tạo dữ liệu mẫu; các lệnh setuptools (pip install, ...) cài đặt gói
+    if len(sys.argv) > 1:
+        setup(
+            name="predictive-maintenance-agent",
+            version="0.1.0",
+            packages=find_packages(include=["src", "src.*"]),
+            install_requires=read_requirements(),
+            entry_points={
+                "console_scripts": [
+                    "pm-agent=src.cli:main",
+                ]
+            },
+        )
+    else:
+        main()
@@ -0,0 +1,137 @@
+"""
+Module lập kế hoạch bảo trì phân cấp (map-reduce) cho đội thiết bị lớn.
+"""
+import json
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from src.advisors.llm_advisor import LLMAdvisor, format_plan_entry, estimate_tokens
+from src.advisors.maintenance_scheduler import SEVERITY_ORDER, _downtime_hours, needs_work_order
+
+
+def equipment_type(equipment_id: str) -> str:
+    """Equipment type derived from the ID prefix, e.g. ``PUMP-101`` -> ``PUMP``."""
+    return equipment_id.split('-')[0].upper()
+
+
+class HierarchicalPlanner:
+    """Create maintenance plans for large fleets within a token budget.
+
+    Assets are split into chunks by site, type or severity; each chunk is planned
+    concurrently (map) and the partial plans are merged (reduce). Assets whose
+    severity is in ``compact_severities`` are only summarized per type. Fleets that
+    fit the budget are planned with a single call, exactly like LLMAdvisor. Assets
+    whose recommendation reports no issue are left out, as in MaintenanceScheduler.
+    """
+
+    def __init__(self, advisor: LLMAdvisor, token_budget: int = 6000, group_by: str = "type",
+                 sites: Dict[str, str] = None, compact_severities: Tuple[str, ...] = ("low",),
+                 max_workers: int = 4):
+        if group_by not in ("type", "site", "severity"):
+            raise ValueError(f"group_by không hợp lệ: {group_by}")
+        self.advisor = advisor
+        self.token_budget = token_budget
+        self.group_by = group_by
+        self.sites = sites or {}
+        self.compact_severities = set(compact_severities)
+        self.max_workers = max_workers
+
+    def create_maintenance_plan(self, equipment_list: List[str], recommendations: Dict) -> Dict:
+        selected = {equipment: recommendations[equipment] for equipment in equipment_list
+                    if needs_work_order(recommendations.get(equipment))}
+        entries = {equipment: format_plan_entry(equipment, rec) for equipment, rec in selected.items()}
+
+        # Small fleets: one call with every asset listed in full
+        if sum(estimate_tokens(entry) for entry in entries.values()) <= self.token_budget:
+            return self.advisor.create_maintenance_plan(list(selected), selected)
+
+        detailed = {equipment: rec for equipment, rec in selected.items()
+                    if rec.get('severity', 'low') not in self.compact_severities}
+        compact = {equipment: rec for equipment, rec in selected.items() if equipment not in detailed}
+        compact_summary = self.summarize_compact(compact)
+
+        # Map: plan every chunk concurrently
+        chunks = self._chunk(detailed, entries)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            partial_plans = list(executor.map(
+                lambda chunk: self.advisor.plan_from_summary(
+                    "".join(entries[equipment] for equipment in chunk),
+                    {equipment: detailed[equipment] for equipment in chunk}
+                ),
+                chunks
+            ))
+
+        # Reduce: merge partial plans, in several levels if they do not fit one prompt
+        return self._reduce(partial_plans, compact_summary)
+
+    def summarize_compact(self, recommendations: Dict) -> str:
+        """One line per equipment type instead of one entry per asset."""
+        by_type = defaultdict(list)
+        for equipment in sorted(recommendations):
+            by_type[equipment_type(equipment)].append(equipment)
+
+        lines = []
+        for type_name, equipment_ids in sorted(by_type.items()):
+            downtime = sum(_downtime_hours(recommendations[equipment].get('estimated_downtime_hours'))
+                           for equipment in equipment_ids)
+            shown = ", ".join(equipment_ids[:5])
+            if len(equipment_ids) > 5:
+                shown += f", ... (+{len(equipment_ids) - 5})"
+            lines.append(f"- {type_name}: {len(equipment_ids)} thiết bị ({shown}), "
+                         f"tổng thời gian ngừng ước tính {downtime:g} giờ")
+        return "\n".join(lines)
+
+    def _group_key(self, equipment: str, rec: Dict) -> str:
+        if self.group_by == "site":
+            return self.sites.get(equipment, "unknown")
+        if self.group_by == "severity":
+            return rec.get('severity', 'low')
+        return equipment_type(equipment)
+
+    def _chunk(self, detailed: Dict, entries: Dict[str, str]) -> List[List[str]]:
+        """Pack assets of the same group into chunks that fit the token budget."""
+        groups = defaultdict(list)
+        for equipment, rec in detailed.items():
+            groups[self._group_key(equipment, rec)].append(equipment)
+
+        chunks = []
+        for key in sorted(groups):
+            members = sorted(groups[key], key=lambda e: (SEVERITY_ORDER.get(detailed[e].get('severity'), 4), e))
+            chunk, chunk_tokens = [], 0
+            for equipment in members:
+                tokens = estimate_tokens(entries[equipment])
+                if chunk and chunk_tokens + tokens > self.token_budget:
+                    chunks.append(chunk)
+                    chunk, chunk_tokens = [], 0
+                chunk.append(equipment)
+                chunk_tokens += tokens
+            if chunk:
+                chunks.append(chunk)
+        return chunks
+
+    def _reduce(self, plans: List[Dict], compact_summary: str) -> Dict:
+        while True:
+            groups = self._pack_plans(plans)
+            if len(groups) <= 1:
+                return self.advisor.merge_maintenance_plans(groups[0] if groups else [], compact_summary)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                plans = list(executor.map(self.advisor.merge_maintenance_plans, groups))
+
+    def _pack_plans(self, plans: List[Dict]) -> List[List[Dict]]:
+        """Group partial plans so each merge prompt stays within the token budget."""
+        groups, group, group_tokens = [], [], 0
+        for plan in plans:
+            tokens = estimate_tokens(json.dumps(plan, ensure_ascii=False, default=str))
+            if group and group_tokens + tokens > self.token_budget:
+                groups.append(group)
+                group, group_tokens = [], 0
+            group.append(plan)
+            group_tokens += tokens
+        if group:
+            groups.append(group)
+
+        # Oversized plans: merge pairwise so every level still halves the count
+        if len(groups) > 1 and all(len(group) == 1 for group in groups):
+            groups = [plans[i:i + 2] for i in range(0, len(plans), 2)]
+        return groups
@@ -3,41 +3,200 @@ Module chứa cố vấn bảo trì dựa trên LLM cho dữ liệu cảm biến
 """
 import os
 import json
+import threading
 import pandas as pd
-from typing import Dict, List
+from typing import Dict, List, Optional
 from langchain_google_genai import GoogleGenerativeAI
 from langchain.prompts import PromptTemplate
 from langchain.memory import ConversationBufferMemory
+from src.advisors.maintenance_scheduler import MaintenanceScheduler
+from src.advisors.resilience import ResilientCaller, LLMUnavailableError
+from src.advisors.template_advisor import rule_based_recommendation
+from src.advisors.recommendation_index import RecommendationIndex
+from src.models.incident_aggregator import aggregate_incidents, top_incidents
+
+NO_ANOMALY_RECOMMENDATION = {"recommendation": "Không phát hiện bất thường. Hoạt động bình thường.", "severity": "low"}
+
+# Expected size of one recommendation in a batched response, reserved in the token budget
+RECOMMENDATION_OUTPUT_TOKENS = 300
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def summarize_anomalies(equipment_data: pd.DataFrame) -> Optional[Dict]:
+    """Statistics of the anomalous readings sent to the LLM, or None when there are none."""
+    anomaly_data = equipment_data[equipment_data['is_anomaly']]
+    if anomaly_data.empty:
+        return None
+    
+    return {
+        "equipment_id": equipment_data['equipment_id'].iloc[0],
+        "anomaly_count": len(anomaly_data),
+        "anomaly_percentage": (len(anomaly_data) / len(equipment_data)) * 100,
+        "avg_temperature": anomaly_data['temperature'].mean(),
+        "avg_pressure": anomaly_data['pressure'].mean(),
+        "avg_vibration": anomaly_data['vibration'].mean(),
+        "avg_flow_rate": anomaly_data['flow_rate'].mean(),
+        "avg_power_consumption": anomaly_data['power_consumption'].mean(),
+        "days_since_maintenance": anomaly_data['days_since_maintenance'].mean(),
+        **incident_summary(equipment_data)
+    }
+
+
+def incident_summary(equipment_data: pd.DataFrame, limit: int = 5) -> Dict:
+    """Incident count and the most severe incidents, which give the LLM the shape of the episodes."""
+    if 'timestamp' not in equipment_data.columns or 'anomaly_score' not in equipment_data.columns:
+        return {}
+    incidents = aggregate_incidents(equipment_data)
+    return {"incident_count": len(incidents), "incidents": top_incidents(incidents, limit)}
+
+
+def format_incident(incident: Dict) -> str:
+    line = (f"{incident['start'][:16]} → {incident['end'][:16]} ({incident['duration_minutes']:.0f} phút, "
+            f"{incident['readings']} lần đọc): cảm biến chính {incident['dominant_sensor']} "
+            f"lệch {incident['dominant_deviation']:+.2f}, điểm thấp nhất {incident['peak_score']:.3f}")
+    if incident.get("rule_violation"):
+        line += f", vi phạm luật {incident['rule_violation']}"
+    return line
+
+
+def format_data_summary(summary: Dict) -> str:
+    """Format anomaly statistics as the data summary block of the analysis prompt."""
+    return f"""
+        - Số bất thường được phát hiện: {summary['anomaly_count']} ({summary['anomaly_percentage']:.2f}% số đọc)
+        - Nhiệt độ trung bình (chuẩn hóa): {summary['avg_temperature']:.2f}
+        - Áp suất trung bình (chuẩn hóa): {summary['avg_pressure']:.2f}
+        - Độ rung trung bình (chuẩn hóa): {summary['avg_vibration']:.2f}
+        - Lưu lượng trung bình (chuẩn hóa): {summary['avg_flow_rate']:.2f}
+        - Mức tiêu thụ điện trung bình (chuẩn hóa): {summary['avg_power_consumption']:.2f}
+        - Số ngày kể từ lần bảo trì cuối: {summary['days_since_maintenance']:.0f}
+        """ + format_incidents(summary)
+
+
+def format_incidents(summary: Dict) -> str:
+    """Incident lines appended to the data summary (empty when incidents were not computed)."""
+    if not summary.get("incidents"):
+        return ""
+    lines = "".join(f"\n            * {format_incident(incident)}" for incident in summary["incidents"])
+    return (f"- Số sự cố (chuỗi bất thường liên tiếp): {summary['incident_count']}, "
+            f"nghiêm trọng nhất:{lines}\n        ")
+
+
+def pack_summaries(equipment_ids: List[str], summaries: Dict[str, Dict], token_budget: int) -> List[List[str]]:
+    """Pack assets into batches whose summaries plus expected answers fit the token budget."""
+    batches, batch, batch_tokens = [], [], 0
+    for equipment_id in equipment_ids:
+        tokens = estimate_tokens(format_data_summary(summaries[equipment_id])) + RECOMMENDATION_OUTPUT_TOKENS
+        if batch and batch_tokens + tokens > token_budget:
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(equipment_id)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def parse_json_array(result: str) -> List:
+    """Parse a JSON array from an LLM response, tolerating code fences and surrounding text."""
+    result = result.replace("```json", "").replace("```", "").strip()
+    try:
+        parsed = json.loads(result)
+    except json.JSONDecodeError:
+        start, end = result.find("["), result.rfind("]")
+        if start == -1 or end <= start:
+            return []
+        try:
+            parsed = json.loads(result[start:end + 1])
+        except json.JSONDecodeError:
+            return []
+    return parsed if isinstance(parsed, list) else [parsed]
+
 
 class LLMAdvisor:
     """Use LLM to analyze anomalies and provide maintenance recommendations."""
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, caller: ResilientCaller = None, llm=None,
+                 recommendation_index: RecommendationIndex = None):
         if api_key:
             os.environ["GEMINI_API_KEY"] = api_key
             
-        self.llm = GoogleGenerativeAI(model="gemini-2.0-flash",temperature=0.1)
+        # Any LangChain runnable can stand in for Gemini (e.g. a fake backend for replays)
+        self._llm = llm
         self.memory = ConversationBufferMemory(memory_key="chat_history")
+        self.caller = caller or ResilientCaller()
+        # Number of requests that reached the LLM (analyses, plans, justifications; retries included),
+        # e.g. for per-interval budgets; calls rejected by the breaker or rate limits are not counted
+        self.call_count = 0
+        self._count_lock = threading.Lock()
+        # Past analyses reused for near-identical summaries of the same equipment type
+        self.recommendation_index = recommendation_index
+    
+    @property
+    def llm(self):
+        """The LLM client, created on first use so paths that never call it need no API key."""
+        if self._llm is None:
+            self._llm = GoogleGenerativeAI(model="gemini-2.0-flash",temperature=0.1)
+        return self._llm
+    
+    @llm.setter
+    def llm(self, llm) -> None:
+        self._llm = llm
+    
+    def _invoke(self, prompt: PromptTemplate, inputs: Dict, expected_output_tokens: int = 500) -> str:
+        """Invoke the LLM under the rate limiter, deadline, retries and circuit breaker.
+        
+        Raises LLMUnavailableError; callers fall back to templates or the scheduler.
+        """
+        chain = prompt|self.llm
+        estimated_tokens = estimate_tokens(prompt.format(**inputs)) + expected_output_tokens
+        
+        def invoke() -> str:
+            # Runs only once the breaker and the rate limits let the request through
+            with self._count_lock:
+                self.call_count += 1
+            return chain.invoke(inputs)
+        
+        return self.caller.call(invoke, estimated_tokens)
         
     def analyze_anomaly(self, equipment_data: pd.DataFrame) -> Dict:
         """Analyze anomalies using LLM and generate recommendations."""
-  
-        anomaly_data = equipment_data[equipment_data['is_anomaly']]
-        
-        if anomaly_data.empty:
-            return {"recommendation": "Không phát hiện bất thường. Hoạt động bình thường.", "severity": "low"}
-        
-        # Prepare data for LLM analysis
-        equipment_id = equipment_data['equipment_id'].iloc[0]
-        avg_temp = anomaly_data['temperature'].mean()
-        avg_pressure = anomaly_data['pressure'].mean()
-        avg_vibration = anomaly_data['vibration'].mean()
-        avg_flow = anomaly_data['flow_rate'].mean()
-        avg_power = anomaly_data['power_consumption'].mean()
-        days_since_maint = anomaly_data['days_since_maintenance'].mean()
-        anomaly_count = len(anomaly_data)
-        total_data_points = len(equipment_data)
-        anomaly_percentage = (anomaly_count / total_data_points) * 100
+        summary = summarize_anomalies(equipment_data)
+        
+        if summary is None:
+            return dict(NO_ANOMALY_RECOMMENDATION)
+        
+        return self._analyze_summary(summary)
+    
+    def fallback_recommendation(self, equipment_data: pd.DataFrame) -> Dict:
+        """Template/rule-based recommendation without calling the LLM."""
+        summary = summarize_anomalies(equipment_data)
+        if summary is None:
+            return dict(NO_ANOMALY_RECOMMENDATION)
+        return rule_based_recommendation(summary)
+    
+    def _reuse(self, summary: Dict) -> Optional[Dict]:
+        if self.recommendation_index is None:
+            return None
+        return self.recommendation_index.lookup(summary)
+    
+    def _remember(self, summary: Dict, recommendation: Dict) -> None:
+        if self.recommendation_index is not None:
+            self.recommendation_index.add(summary, recommendation)
+    
+    def save_index(self) -> None:
+        """Persist the recommendation index, if any."""
+        if self.recommendation_index is not None:
+            self.recommendation_index.save()
+    
+    def _analyze_summary(self, summary: Dict, lookup: bool = True) -> Dict:
+        """Single-asset analysis; ``lookup=False`` when the index was already searched for this summary."""
+        reused = self._reuse(summary) if lookup else None
+        if reused is not None:
+            return reused
         
         prompt = PromptTemplate(
             input_variables=["equipment_id", "data_summary"],
@@ -65,28 +224,22 @@ class LLMAdvisor:
             """
         )
         
-        data_summary = f"""
-        - Số bất thường được phát hiện: {anomaly_count} ({anomaly_percentage:.2f}% số đọc)
-        - Nhiệt độ trung bình (chuẩn hóa): {avg_temp:.2f}
-        - Áp suất trung bình (chuẩn hóa): {avg_pressure:.2f}
-        - Độ rung trung bình (chuẩn hóa): {avg_vibration:.2f}
-        - Lưu lượng trung bình (chuẩn hóa): {avg_flow:.2f}
-        - Mức tiêu thụ điện trung bình (chuẩn hóa): {avg_power:.2f}
-        - Số ngày kể từ lần bảo trì cuối: {days_since_maint:.0f}
-        """
-        
-        chain = prompt|self.llm
-        result = chain.invoke({"equipment_id":equipment_id, "data_summary":data_summary})
+        try:
+            result = self._invoke(prompt, {"equipment_id": summary["equipment_id"],
+                                           "data_summary": format_data_summary(summary)})
+        except LLMUnavailableError:
+            return rule_based_recommendation(summary)
         
         try:
             # Clean and parse the JSON response
             result = result.replace("```json", "").replace("```", "").strip()
             recommendation = json.loads(result)
+            self._remember(summary, recommendation)
         except json.JSONDecodeError:
             recommendation = {
                 "issue": "Thiết bị có thể gặp trục trặc",
                 "recommendation": result,
-                "severity": "medium" if anomaly_percentage > 10 else "low",
+                "severity": "medium" if summary["anomaly_percentage"] > 10 else "low",
                 "consequences": "Thiết bị có thể bị hỏng nếu không được xử lý",
                 "estimated_downtime_hours": 4,
                 "parts_needed": ["công cụ kiểm tra"]
@@ -94,7 +247,102 @@ class LLMAdvisor:
             
         return recommendation
     
+    def analyze_anomalies_batch(self, equipment_frames: Dict[str, pd.DataFrame],
+                                token_budget: int = 4000, max_batch_retries: int = 1) -> Dict[str, Dict]:
+        """Analyze several assets per LLM call.
+        
+        Assets matching a past analysis in the recommendation index reuse it; the
+        others are looked up once and packed into batches that fit ``token_budget``
+        (input plus expected output), so the batch size K adapts to the budget.
+        Assets missing from a partial or malformed response are retried in a new
+        batch, then one by one with the single-asset prompt.
+        """
+        recommendations = {}
+        summaries = {}
+        for equipment_id, equipment_data in equipment_frames.items():
+            summary = summarize_anomalies(equipment_data)
+            reused = self._reuse(summary) if summary is not None else None
+            if summary is None:
+                recommendations[equipment_id] = dict(NO_ANOMALY_RECOMMENDATION)
+            elif reused is not None:
+                recommendations[equipment_id] = reused
+            else:
+                summaries[equipment_id] = summary
+        
+        pending = list(summaries)
+        for _ in range(max_batch_retries + 1):
+            if not pending:
+                break
+            for batch in pack_summaries(pending, summaries, token_budget):
+                recommendations.update(self._analyze_batch([summaries[e] for e in batch]))
+            pending = [equipment_id for equipment_id in pending if equipment_id not in recommendations]
+        
+        for equipment_id in pending:
+            recommendations[equipment_id] = self._analyze_summary(summaries[equipment_id], lookup=False)
+        
+        return recommendations
+    
+    def _analyze_batch(self, summaries: List[Dict]) -> Dict[str, Dict]:
+        """One structured prompt for several assets; returns only the assets that parsed.
+        
+        The summaries are expected to have missed the recommendation index already.
+        """
+        if len(summaries) == 1:
+            return {summaries[0]["equipment_id"]: self._analyze_summary(summaries[0], lookup=False)}
+        
+        prompt = PromptTemplate(
+            input_variables=["asset_summaries"],
+            template="""
+            Bạn là chuyên gia tư vấn bảo trì thiết bị dầu khí. Hãy phân tích dữ liệu cảm biến của
+            TỪNG thiết bị dưới đây và đưa ra khuyến nghị bảo trì chi tiết cho từng thiết bị.
+            
+            {asset_summaries}
+            
+            Với mỗi thiết bị, hãy xác định:
+            1. Vấn đề có khả năng gây ra các bất thường này
+            2. Hành động bảo trì được khuyến nghị
+            3. Mức độ khẩn cấp (low-thấp, medium-trung bình, high-cao, critical-nguy cấp)
+            4. Hậu quả tiềm ẩn nếu không được xử lý
+            5. Thời gian dừng máy ước tính để bảo trì
+            6. Các phụ tùng hoặc công cụ cần thiết
+            
+            Phản hồi của bạn phải là một mảng JSON, mỗi phần tử là một đối tượng với các khóa:
+            "equipment_id", "issue", "recommendation", "severity", "consequences",
+            "estimated_downtime_hours", "parts_needed"
+            
+            Tất cả nội dung phải được viết bằng tiếng Việt có dấu đầy đủ.
+            """
+        )
+        
+        asset_summaries = "\n".join(
+            f"Mã thiết bị: {summary['equipment_id']}{format_data_summary(summary)}" for summary in summaries
+        )
+        
+        try:
+            result = self._invoke(prompt, {"asset_summaries": asset_summaries},
+                                  RECOMMENDATION_OUTPUT_TOKENS * len(summaries))
+        except LLMUnavailableError:
+            return {summary["equipment_id"]: rule_based_recommendation(summary) for summary in summaries}
+        
+        requested = {summary["equipment_id"]: summary for summary in summaries}
+        recommendations = {}
+        for item in parse_json_array(result):
+            if isinstance(item, dict) and item.get("equipment_id") in requested:
+                equipment_id = item.pop("equipment_id")
+                recommendations[equipment_id] = item
+                self._remember(requested[equipment_id], item)
+        return recommendations
+    
     def create_maintenance_plan(self, equipment_list: List[str], recommendations: Dict) -> Dict:
+        equipment_data = ""
+        for equipment in equipment_list:
+            if equipment in recommendations:
+                equipment_data += format_plan_entry(equipment, recommendations[equipment])
+        
+        return self.plan_from_summary(equipment_data, recommendations)
+    
+    def plan_from_summary(self, equipment_data: str, recommendations: Dict) -> Dict:
+        """Create a maintenance plan from pre-formatted equipment entries."""
         prompt = PromptTemplate(
             input_variables=["equipment_data"],
             template="""
@@ -119,33 +367,132 @@ class LLMAdvisor:
             """
         )
         
-        equipment_data = ""
-        for equipment in equipment_list:
-            if equipment in recommendations:
-                rec = recommendations[equipment]
-                equipment_data += f"""
-                Thiết bị: {equipment}
-                Vấn đề: {rec.get('issue', 'Không xác định')}
-                Mức độ nghiêm trọng: {rec.get('severity', 'low')}
-                Thời gian ngừng hoạt động ước tính: {rec.get('estimated_downtime_hours', 4)} giờ
-                Phụ tùng cần thiết: {', '.join(rec.get('parts_needed', ['công cụ kiểm tra']))}
-                
-                """
-        
-        chain = prompt|self.llm
-        result = chain.invoke({"equipment_data":equipment_data})
+        try:
+            result = self._invoke(prompt, {"equipment_data":equipment_data})
+        except LLMUnavailableError:
+            return fallback_plan(recommendations)
         
         try:
             result = result.replace("```json", "").replace("```", "").strip()
             plan = json.loads(result)
         except json.JSONDecodeError:
+            plan = fallback_plan(recommendations)
+            
+        return plan
+    
+    def justify_schedule(self, plan: Dict, max_items: int = 20) -> str:
+        """Ask the LLM only for the justification text of an algorithmically built schedule."""
+        prompt = PromptTemplate(
+            input_variables=["schedule", "summary"],
+            template="""
+            Bạn là một chuyên gia lập kế hoạch bảo trì cho các cơ sở dầu khí.
+            Lịch trình bảo trì dưới đây đã được tính toán sẵn và KHÔNG được thay đổi.
+            Hãy viết một đoạn ngắn giải thích lý do cho thứ tự ưu tiên và cách phân công đội.
 
-            plan = {
-                "schedule": "Ưu tiên theo mức độ nghiêm trọng",
-                "justification": "Các vấn đề nguy cấp phải được giải quyết trước",
-                "total_downtime_hours": sum([rec.get('estimated_downtime_hours', 4) for rec in recommendations.values()]),
-                "parts_list": list(set([part for rec in recommendations.values() for part in rec.get('parts_needed', ['công cụ kiểm tra'])])),
-                "crew_requirements": "Đội bảo trì tiêu chuẩn"
-            }
+            Lịch trình (các mục đầu tiên):
+            {schedule}
+            
+            Tổng quan:
+            {summary}
+            
+            Chỉ trả về đoạn văn giải thích, viết bằng tiếng Việt có dấu đầy đủ.
+            """
+        )
+        
+        schedule = "\n".join(
+            f"{item['order']}. {item['equipment_id']} ({item['severity']}) - {item['crew']}, "
+            f"giờ {item['start_hour']:.1f} → {item['end_hour']:.1f}"
+            for item in plan["schedule"][:max_items]
+        )
+        summary = (f"{len(plan['schedule'])} công việc, tổng thời gian ngừng {plan['total_downtime_hours']} giờ, "
+                   f"hoàn tất sau {plan.get('makespan_hours', 0):.1f} giờ, "
+                   f"phân công: {plan.get('crew_requirements', {})}")
+        
+        try:
+            return self._invoke(prompt, {"schedule": schedule, "summary": summary}).strip()
+        except LLMUnavailableError:
+            return plan.get("justification", "")
+    
+    def merge_maintenance_plans(self, partial_plans: List[Dict], compact_summary: str = "") -> Dict:
+        """Reduce step: merge partial plans (one per chunk of equipment) into a single plan."""
+        prompt = PromptTemplate(
+            input_variables=["partial_plans", "compact_summary"],
+            template="""
+            Bạn là một chuyên gia lập kế hoạch bảo trì cho các cơ sở dầu khí.
+            Dưới đây là các kế hoạch bảo trì từng phần, mỗi kế hoạch cho một nhóm thiết bị.
+            Hãy hợp nhất chúng thành một lịch trình bảo trì tổng thể tối ưu, giữ nguyên thứ tự ưu tiên
+            theo mức độ nghiêm trọng và tránh xung đột giữa các đội bảo trì.
+
+            Các kế hoạch từng phần:
+            {partial_plans}
+            
+            Các thiết bị mức độ thấp (tóm tắt, có thể bảo trì định kỳ):
+            {compact_summary}
+            
+            Phản hồi của bạn phải ở định dạng JSON với các khóa: "schedule", "justification", 
+            "total_downtime_hours", "parts_list", "crew_requirements"
+            
+            Tất cả nội dung phải được viết bằng tiếng Việt có dấu đầy đủ.
+            """
+        )
+        
+        try:
+            result = self._invoke(prompt, {
+                "partial_plans": json.dumps(partial_plans, ensure_ascii=False, default=str),
+                "compact_summary": compact_summary or "Không có"
+            })
+        except LLMUnavailableError:
+            return combine_plans(partial_plans)
+        
+        try:
+            result = result.replace("```json", "").replace("```", "").strip()
+            plan = json.loads(result)
+        except json.JSONDecodeError:
+            plan = combine_plans(partial_plans)
             
         return plan
+
+
+def format_plan_entry(equipment: str, rec: Dict) -> str:
+    """Format one equipment's recommendation as an entry of the planning prompt."""
+    return f"""
+                Thiết bị: {equipment}
+                Vấn đề: {rec.get('issue', 'Không xác định')}
+                Mức độ nghiêm trọng: {rec.get('severity', 'low')}
+                Thời gian ngừng hoạt động ước tính: {rec.get('estimated_downtime_hours', 4)} giờ
+                Phụ tùng cần thiết: {', '.join(rec.get('parts_needed', ['công cụ kiểm tra']))}
+                
+                """
+
+
+def fallback_plan(recommendations: Dict) -> Dict:
+    """Plan used when the LLM response cannot be parsed: the deterministic scheduler's plan."""
+    return MaintenanceScheduler().create_maintenance_plan(list(recommendations), recommendations)
+
+
+def combine_plans(partial_plans: List[Dict]) -> Dict:
+    """Merge partial plans without the LLM, used when the reduce response cannot be parsed."""
+    schedule = []
+    for plan in partial_plans:
+        part = plan.get("schedule", [])
+        schedule.extend(part if isinstance(part, list) else [part])
+    
+    total_downtime = 0
+    for plan in partial_plans:
+        try:
+            total_downtime += float(plan.get("total_downtime_hours", 0))
+        except (TypeError, ValueError):
+            pass
+    
+    parts = set()
+    for plan in partial_plans:
+        part_list = plan.get("parts_list", [])
+        parts.update(part_list if isinstance(part_list, list) else [part_list])
+    
+    return {
+        "schedule": schedule,
+        "justification": " ".join(str(plan.get("justification", "")) for plan in partial_plans).strip(),
+        "total_downtime_hours": total_downtime,
+        "parts_list": sorted(str(part) for part in parts),
+        "crew_requirements": "; ".join(str(plan.get("crew_requirements", "")) for plan in partial_plans)
+    }
@@ -0,0 +1,134 @@
+"""
+Module lập lịch bảo trì tất định (không dùng LLM): ưu tiên theo mức độ nghiêm trọng và phân công đội.
+"""
+import heapq
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from src.advisors.template_advisor import load_maintenance_templates
+
+SEVERITY_ORDER = {"critical": 0, "high": 1, "medium": 2, "low": 3}
+
+# Các đội bảo trì (giống các lựa chọn trên bảng điều khiển) và số giờ kể từ bây giờ đến khi sẵn sàng
+DEFAULT_CREWS = {
+    "Đội Alpha": 0,
+    "Đội Beta": 0,
+    "Đội Gamma": 0,
+    "Nhà thầu bên ngoài": 24
+}
+
+DEFAULT_DOWNTIME_HOURS = 4
+DEFAULT_PARTS = ["công cụ kiểm tra"]
+
+
+def load_template_defaults(templates_dir: str = "data/templates") -> Dict[Tuple[str, str], Dict]:
+    """Per equipment type and severity: typical downtime and parts from the maintenance templates."""
+    defaults = {}
+    templates = load_maintenance_templates(templates_dir)
+    # Keep the most demanding template per (type, severity) as the conservative default
+    for equipment_type, scenarios in templates.items():
+        for template in scenarios.values():
+            key = (equipment_type, template.get("severity", "medium"))
+            downtime = template.get("estimated_downtime_hours", DEFAULT_DOWNTIME_HOURS)
+            if key not in defaults or downtime > defaults[key]["estimated_downtime_hours"]:
+                defaults[key] = {
+                    "estimated_downtime_hours": downtime,
+                    "parts_needed": template.get("parts_needed", DEFAULT_PARTS)
+                }
+    return defaults
+
+
+def _downtime_hours(value) -> float:
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return float(DEFAULT_DOWNTIME_HOURS)
+
+
+def needs_work_order(recommendation: Dict) -> bool:
+    """Whether a recommendation reports an issue; healthy assets get no work order."""
+    return bool(recommendation) and bool(recommendation.get("issue"))
+
+
+class MaintenanceScheduler:
+    """Build a prioritised, crew-assigned maintenance schedule without calling the LLM.
+
+    Work orders are ordered by severity (critical first) and, within a severity,
+    shortest downtime first so the most assets come back online soonest. Each work
+    order goes to the crew that becomes free earliest (a heap keyed by free time),
+    so a schedule for thousands of work orders takes milliseconds. Assets whose
+    recommendation reports no issue are left out of the schedule and the totals.
+    If an advisor is given, the LLM only writes the justification text.
+    """
+
+    def __init__(self, crews: Dict[str, float] = None, advisor=None, templates_dir: str = "data/templates"):
+        self.crews = dict(crews or DEFAULT_CREWS)
+        if not self.crews:
+            raise ValueError("Cần ít nhất một đội bảo trì")
+        self.advisor = advisor
+        self.template_defaults = load_template_defaults(templates_dir)
+
+    def create_maintenance_plan(self, equipment_list: List[str], recommendations: Dict) -> Dict:
+        work_orders = [self._work_order(equipment, recommendations[equipment])
+                       for equipment in equipment_list if needs_work_order(recommendations.get(equipment))]
+        work_orders.sort(key=lambda order: (SEVERITY_ORDER.get(order["severity"], 4),
+                                            order["downtime_hours"], order["equipment_id"]))
+
+        # Heap of (free_at_hour, crew_index, crew_name); the index keeps ties deterministic
+        crew_heap = [(float(available_from), index, name)
+                     for index, (name, available_from) in enumerate(self.crews.items())]
+        heapq.heapify(crew_heap)
+        crew_hours = Counter()
+
+        schedule = []
+        for order_number, order in enumerate(work_orders, start=1):
+            free_at, index, crew = heapq.heappop(crew_heap)
+            end = free_at + order["downtime_hours"]
+            heapq.heappush(crew_heap, (end, index, crew))
+            crew_hours[crew] += order["downtime_hours"]
+            schedule.append({
+                "order": order_number,
+                "equipment_id": order["equipment_id"],
+                "severity": order["severity"],
+                "crew": crew,
+                "start_hour": free_at,
+                "end_hour": end,
+                "downtime_hours": order["downtime_hours"],
+                "parts_needed": order["parts_needed"]
+            })
+
+        parts_count = Counter(part for order in work_orders for part in order["parts_needed"])
+        plan = {
+            "schedule": schedule,
+            "justification": self._default_justification(schedule),
+            "total_downtime_hours": sum(order["downtime_hours"] for order in work_orders),
+            "makespan_hours": max((item["end_hour"] for item in schedule), default=0.0),
+            "parts_list": sorted(parts_count),
+            "parts_quantities": dict(sorted(parts_count.items())),
+            "crew_requirements": {crew: crew_hours[crew] for crew in self.crews if crew_hours[crew]}
+        }
+
+        if self.advisor is not None and schedule:
+            plan["justification"] = self.advisor.justify_schedule(plan)
+
+        return plan
+
+    def _work_order(self, equipment: str, rec: Dict) -> Dict:
+        severity = rec.get("severity", "low")
+        defaults = self.template_defaults.get((equipment.split('-')[0].upper(), severity), {})
+        downtime = rec.get("estimated_downtime_hours",
+                           defaults.get("estimated_downtime_hours", DEFAULT_DOWNTIME_HOURS))
+        parts = rec.get("parts_needed") or defaults.get("parts_needed") or DEFAULT_PARTS
+        return {
+            "equipment_id": equipment,
+            "severity": severity,
+            "downtime_hours": _downtime_hours(downtime),
+            "parts_needed": list(parts) if isinstance(parts, (list, tuple)) else [str(parts)]
+        }
+
+    @staticmethod
+    def _default_justification(schedule: List[Dict]) -> str:
+        counts = Counter(item["severity"] for item in schedule)
+        summary = ", ".join(f"{counts[severity]} {severity}" for severity in SEVERITY_ORDER if counts[severity])
+        return ("Ưu tiên theo mức độ nghiêm trọng (nguy cấp trước), trong cùng mức ưu tiên công việc ngắn hơn "
+                f"để đưa thiết bị hoạt động trở lại sớm nhất; mỗi việc giao cho đội rảnh sớm nhất. ({summary})")
@@ -0,0 +1,140 @@
+"""
+Module chỉ mục láng giềng gần nhất (chạy cục bộ) trên các tóm tắt bất thường đã phân tích, để dùng lại khuyến nghị
+cho thiết bị cùng loại có hồ sơ bất thường gần như giống nhau thay vì gọi lại LLM.
+"""
+import os
+import joblib
+import numpy as np
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+INDEX_VERSION = 1
+
+# Thành phần của vector tóm tắt và hệ số chia để các thành phần có thang đo tương đương
+VECTOR_SCALES = {
+    "avg_temperature": 1.0,
+    "avg_pressure": 1.0,
+    "avg_vibration": 1.0,
+    "avg_flow_rate": 1.0,
+    "avg_power_consumption": 1.0,
+    "anomaly_percentage": 10.0,
+    "days_since_maintenance": 30.0
+}
+
+
+def equipment_type(equipment_id: str) -> str:
+    return str(equipment_id).split('-')[0].upper()
+
+
+def summary_vector(summary: Dict) -> np.ndarray:
+    """Scaled vector of an anomaly summary: mean normalized deviation per sensor,
+    anomaly percentage (per 10 points) and days since maintenance (per 30 days)."""
+    vector = np.array([float(summary.get(key, 0.0)) / scale for key, scale in VECTOR_SCALES.items()])
+    return np.nan_to_num(vector)
+
+
+class RecommendationIndex:
+    """Brute-force nearest-neighbour index of past analyses, partitioned by equipment type.
+
+    Vectors of one type live in one contiguous float64 matrix (grown by doubling)
+    with their squared norms kept alongside, so a lookup is one matrix-vector
+    product: ``|x|² - 2 x·q + |q|²``. At 100k stored analyses that is about a
+    millisecond, without any native dependency. A summary within ``max_distance``
+    of a stored one of the same type reuses its recommendation.
+    """
+
+    def __init__(self, max_distance: float = 0.5, path: str = None):
+        self.max_distance = max_distance
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._vectors = {}
+        self._norms = {}
+        self._sizes = {}
+        self._entries = {}
+        self._dirty = False
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self) -> int:
+        return sum(self._sizes.values())
+
+    def add(self, summary: Dict, recommendation: Dict) -> None:
+        """Store the recommendation of an LLM analysis with the summary it was made for."""
+        key = equipment_type(summary["equipment_id"])
+        vector = summary_vector(summary)
+        size = self._sizes.get(key, 0)
+        if key not in self._vectors:
+            self._vectors[key] = np.empty((0, len(vector)))
+            self._norms[key] = np.empty(0)
+            self._entries[key] = []
+        if size == len(self._vectors[key]):
+            # Double the capacity so appends stay amortized O(1)
+            capacity = max(16, 2 * size)
+            self._vectors[key] = np.resize(self._vectors[key], (capacity, len(vector)))
+            self._norms[key] = np.resize(self._norms[key], capacity)
+
+        self._vectors[key][size] = vector
+        self._norms[key][size] = vector @ vector
+        self._entries[key].append({
+            "recommendation": recommendation,
+            "equipment_id": str(summary["equipment_id"]),
+            "analyzed_at": datetime.now().isoformat(timespec="seconds")
+        })
+        self._sizes[key] = size + 1
+        self._dirty = True
+
+    def nearest(self, summary: Dict) -> Optional[Tuple[Dict, float]]:
+        """Closest stored entry of the same equipment type and its distance, None if there is none."""
+        key = equipment_type(summary["equipment_id"])
+        size = self._sizes.get(key, 0)
+        if size == 0:
+            return None
+        query = summary_vector(summary)
+        squared = self._norms[key][:size] - 2 * (self._vectors[key][:size] @ query) + query @ query
+        best = int(np.argmin(squared))
+        return self._entries[key][best], float(np.sqrt(max(squared[best], 0.0)))
+
+    def lookup(self, summary: Dict) -> Optional[Dict]:
+        """A stored recommendation within ``max_distance``, with its provenance under ``reused_from``."""
+        match = self.nearest(summary)
+        if match is None or match[1] > self.max_distance:
+            self.misses += 1
+            return None
+        entry, distance = match
+        self.hits += 1
+        return dict(entry["recommendation"], reused_from={
+            "equipment_id": entry["equipment_id"],
+            "analyzed_at": entry["analyzed_at"],
+            "distance": round(distance, 4)
+        })
+
+    def save(self, path: str = None) -> None:
+        """Persist the index (skipped when nothing was added since the last save)."""
+        path = path or self.path
+        if path is None or not self._dirty:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        joblib.dump({
+            "version": INDEX_VERSION,
+            "components": list(VECTOR_SCALES),
+            "types": {key: {"vectors": self._vectors[key][:size], "entries": self._entries[key]}
+                      for key, size in self._sizes.items()}
+        }, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        self._dirty = False
+
+    def load(self, path: str) -> bool:
+        """Restore an index saved by ``save``; False if it was written with other vector components."""
+        bundle = joblib.load(path)
+        if bundle.get("version") != INDEX_VERSION or bundle.get("components") != list(VECTOR_SCALES):
+            return False
+        for key, stored in bundle["types"].items():
+            vectors = np.array(stored["vectors"], dtype=float)
+            self._vectors[key] = vectors
+            self._norms[key] = np.einsum("ij,ij->i", vectors, vectors)
+            self._sizes[key] = len(vectors)
+            self._entries[key] = list(stored["entries"])
+        return True
@@ -0,0 +1,205 @@
+"""
+Module bảo vệ các lời gọi LLM: giới hạn tốc độ, thử lại có backoff, thời hạn và cầu dao (circuit breaker).
+"""
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+# Giới hạn mặc định của nhà cung cấp LLM cho cả tiến trình
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_TOKENS_PER_MINUTE = 100000
+
+# Lỗi tạm thời đáng thử lại: quá giới hạn tốc độ, hết thời gian, lỗi máy chủ
+TRANSIENT_STATUS_CODES = {408, 429}
+
+
+class LLMUnavailableError(Exception):
+    """The LLM could not be called within the limits (breaker open, deadline or retries exhausted)."""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether retrying may succeed: rate limits, timeouts, connection and 5xx errors.
+
+    Provider exceptions (e.g. google.api_core) carry the HTTP status in ``code``
+    or ``status_code``; the cause of a wrapped exception is checked as well.
+    """
+    while error is not None:
+        if isinstance(error, (LLMUnavailableError, TimeoutError, ConnectionError)):
+            return True
+        code = getattr(error, "status_code", None) or getattr(error, "code", None)
+        try:
+            code = int(code)
+        except (TypeError, ValueError):
+            code = None
+        if code is not None:
+            return code in TRANSIENT_STATUS_CODES or 500 <= code < 600
+        error = error.__cause__
+    return False
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``rate_per_minute``."""
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        if not rate_per_minute > 0:
+            raise ValueError(f"Tốc độ của token bucket phải lớn hơn 0: {rate_per_minute}")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0, timeout: float = None) -> bool:
+        """Take ``amount`` tokens, waiting at most ``timeout`` seconds; False if they never became available."""
+        amount = min(amount, self.capacity)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return True
+                wait = (amount - self.tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Open after ``failure_threshold`` consecutive failures; allow one trial call after ``reset_timeout``.
+
+    While half-open exactly one caller gets through as the probe; the others are
+    rejected until it records a success (closing the breaker) or a failure
+    (re-opening it).
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release(self) -> None:
+        """Give up a half-open probe that never reached the provider."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold or self._probing:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class ResilientCaller:
+    """Run provider calls under rate limits, per-attempt timeouts, jittered retries and a circuit breaker.
+
+    ``deadline`` bounds the total time of one logical call, including waiting for
+    rate-limit tokens and all retries. Only transient errors are retried; e.g. an
+    authentication or validation error fails the call at once.
+
+    Each caller runs attempts on its own pool of ``max_in_flight`` threads. An
+    attempt that timed out keeps its thread until the provider returns, so when all
+    of them are taken a new attempt is not queued but counted as a breaker failure.
+    """
+
+    def __init__(self, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+                 call_timeout: float = 30.0, deadline: float = 90.0, max_retries: int = 3,
+                 base_delay: float = 1.0, max_delay: float = 20.0,
+                 breaker: CircuitBreaker = None, max_in_flight: int = 4):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.call_timeout = call_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="llm-call")
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+
+    def call(self, fn: Callable[[], T], estimated_tokens: int = 0) -> T:
+        if not self.breaker.allow():
+            raise CircuitOpenError("Circuit breaker đang mở, bỏ qua lời gọi LLM")
+
+        deadline = time.monotonic() + self.deadline
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not (self.request_bucket.acquire(1, timeout=remaining)
+                    and self.token_bucket.acquire(estimated_tokens, timeout=deadline - time.monotonic())):
+                last_error = LLMUnavailableError("Hết thời hạn khi chờ giới hạn tốc độ")
+                self.breaker.release()
+                break
+
+            if not self._slots.acquire(blocking=False):
+                last_error = LLMUnavailableError("Quá nhiều lời gọi LLM chưa trả về")
+                self.breaker.record_failure()
+                break
+            future = self._executor.submit(fn)
+            future.add_done_callback(lambda _: self._slots.release())
+            try:
+                result = future.result(timeout=max(0.0, min(self.call_timeout, deadline - time.monotonic())))
+            except FutureTimeoutError:
+                future.cancel()
+                last_error = LLMUnavailableError(f"Lời gọi LLM vượt quá {self.call_timeout}s")
+            except Exception as exc:
+                last_error = exc
+            else:
+                self.breaker.record_success()
+                return result
+
+            self.breaker.record_failure()
+            if not is_transient(last_error) or attempt == self.max_retries or not self.breaker.allow():
+                break
+            # Full jitter exponential backoff, never sleeping past the deadline
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+            if time.monotonic() + delay >= deadline:
+                break
+            time.sleep(delay)
+
+        raise LLMUnavailableError(f"Không gọi được LLM: {last_error}") from last_error
@@ -0,0 +1,71 @@
+"""
+Module khuyến nghị bảo trì dựa trên mẫu và luật, dùng khi không gọi được LLM.
+"""
+import os
+import json
+from functools import lru_cache
+from typing import Dict
+
+# Mẫu khuyến nghị tương ứng với cảm biến lệch nhiều nhất cho từng loại thiết bị
+SENSOR_TEMPLATES = {
+    "PUMP": {
+        "temperature": "high_temperature",
+        "vibration": "high_vibration",
+        "flow_rate": "low_flow_rate"
+    },
+    "COMPRESSOR": {
+        "temperature": "high_temperature",
+        "power_consumption": "high_power_consumption",
+        "pressure": "pressure_fluctuation"
+    },
+    "VALVE": {
+        "flow_rate": "stuck_valve",
+        "pressure": "leakage",
+        "vibration": "control_failure"
+    }
+}
+
+GENERIC_RECOMMENDATION = {
+    "issue": "Thiết bị có thể gặp trục trặc",
+    "recommendation": "Kiểm tra tổng thể thiết bị và các cảm biến có giá trị bất thường.",
+    "severity": "medium",
+    "consequences": "Thiết bị có thể bị hỏng nếu không được xử lý",
+    "estimated_downtime_hours": 4,
+    "parts_needed": ["công cụ kiểm tra"]
+}
+
+
+@lru_cache(maxsize=None)
+def load_maintenance_templates(templates_dir: str = "data/templates") -> Dict:
+    """Load data/templates/maintenance_templates.json (empty dict if missing)."""
+    path = os.path.join(templates_dir, "maintenance_templates.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def rule_based_recommendation(summary: Dict, templates_dir: str = "data/templates") -> Dict:
+    """Pick the template matching the most deviating sensor of an anomaly summary.
+
+    Sensor means are normalized, so the absolute value measures the deviation.
+    """
+    equipment_type = str(summary["equipment_id"]).split('-')[0].upper()
+    templates = load_maintenance_templates(templates_dir).get(equipment_type, {})
+    sensor_templates = SENSOR_TEMPLATES.get(equipment_type, {})
+
+    deviations = sorted(
+        ((abs(summary.get(f"avg_{sensor}", 0.0)), sensor) for sensor in sensor_templates),
+        reverse=True
+    )
+    recommendation = dict(GENERIC_RECOMMENDATION)
+    for _, sensor in deviations:
+        if sensor_templates[sensor] in templates:
+            recommendation = dict(templates[sensor_templates[sensor]])
+            break
+
+    # Escalate when a large share of readings is anomalous
+    if summary.get("anomaly_percentage", 0) >= 15:
+        recommendation["severity"] = "critical"
+    recommendation["source"] = "template"
+    return recommendation
@@ -0,0 +1,176 @@
+"""
+Module chạy xử lý hàng loạt (không giao diện) cho toàn bộ thiết bị, chia shard theo thiết bị.
+"""
+import os
+import json
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from src.data.sensor_processor import SensorDataProcessor
+from src.models.anomaly_detector import AnomalyDetector
+from src.advisors.llm_advisor import LLMAdvisor
+from src.advisors.resilience import DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE, ResilientCaller
+from src.advisors.hierarchical_planner import HierarchicalPlanner
+from src.advisors.maintenance_scheduler import MaintenanceScheduler
+from src.agents.maintenance_agent import classify_status
+from src.models.rule_engine import DEFAULT_RULES_PATH, RuleEngine, load_rules, more_severe
+from src.data.results_store import ResultsStore
+
+
+def shard_equipment(equipment_ids: List[str], n_shards: int) -> List[List[str]]:
+    """Split equipment IDs round-robin into at most ``n_shards`` non-empty shards."""
+    equipment_ids = sorted(equipment_ids)
+    n_shards = max(1, min(n_shards, len(equipment_ids)))
+    return [equipment_ids[i::n_shards] for i in range(n_shards)]
+
+
+def process_shard(shard_data: pd.DataFrame, detector: AnomalyDetector,
+                  advise: bool = False, api_key: str = None, batch_analysis: bool = False,
+                  rule_engine: RuleEngine = None, rate_share: float = 1.0) -> Dict:
+    """Score one shard of equipment and optionally ask the LLM for recommendations.
+
+    ``rate_share`` is the fraction of the provider rate limits this shard may use,
+    so parallel worker processes together stay within the limits.
+    """
+    scored = detector.detect_anomalies(shard_data)
+    if rule_engine is not None:
+        scored = rule_engine.apply(scored)
+    advisor = None
+    if advise:
+        caller = ResilientCaller(requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE * rate_share,
+                                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE * rate_share)
+        advisor = LLMAdvisor(api_key, caller=caller)
+
+    equipment_status = {}
+    recommendations = {}
+    equipment_frames = dict(tuple(scored.groupby('equipment_id', sort=True)))
+    for equipment_id, equipment_data in equipment_frames.items():
+        anomaly_percentage = equipment_data['is_anomaly'].mean() * 100
+        status = classify_status(anomaly_percentage)
+        if rule_engine is not None:
+            status = more_severe(status, rule_engine.worst_severity(equipment_data))
+        equipment_status[equipment_id] = {
+            "status": status,
+            "anomaly_percentage": float(anomaly_percentage),
+            "anomaly_count": int(equipment_data['is_anomaly'].sum()),
+            "total_readings": int(len(equipment_data))
+        }
+        if advisor is not None and not batch_analysis:
+            recommendations[equipment_id] = advisor.analyze_anomaly(equipment_data)
+
+    if advisor is not None and batch_analysis:
+        recommendations = advisor.analyze_anomalies_batch(equipment_frames)
+
+    return {
+        "scores": scored[['timestamp', 'equipment_id', 'anomaly_score', 'is_anomaly']],
+        "equipment_status": equipment_status,
+        "recommendations": recommendations
+    }
+
+
+class BatchRunner:
+    """Run load → preprocess → detect → (advise) over input files and write the results to disk."""
+
+    def __init__(self, input_paths: List[str], output_dir: str, workers: int = 1,
+                 advise: bool = False, api_key: str = None, store_path: str = None,
+                 planning: str = "llm", batch_analysis: bool = False, rules_path: str = DEFAULT_RULES_PATH):
+        self.input_paths = input_paths
+        self.rules = load_rules(rules_path) if rules_path else {}
+        self.batch_analysis = batch_analysis
+        self.planning = planning
+        self.store_path = store_path
+        self.output_dir = output_dir
+        self.workers = max(1, workers)
+        self.advise = advise
+        self.api_key = api_key
+        self.data_processor = SensorDataProcessor()
+        # With one shard the cores score chunks in threads instead of shards in processes
+        self.anomaly_detector = AnomalyDetector(workers=(os.cpu_count() or 1) if self.workers == 1 else 1)
+
+    def run(self) -> Dict:
+        """Process every equipment in the input files, sharded across worker processes."""
+        data = self.data_processor.load_data(self.input_paths)
+        data = self.data_processor.preprocess_data()
+
+        # Train once in the parent so every shard is scored by the same model
+        self.anomaly_detector.train(data)
+        rule_engine = RuleEngine(self.rules, self.data_processor.scaler) if self.rules else None
+
+        shards = shard_equipment(data['equipment_id'].unique().tolist(), self.workers)
+        shard_frames = [data[data['equipment_id'].isin(shard)] for shard in shards]
+
+        if self.workers == 1:
+            results = [process_shard(frame, self.anomaly_detector, self.advise, self.api_key,
+                                     self.batch_analysis, rule_engine)
+                       for frame in shard_frames]
+        else:
+            with ProcessPoolExecutor(max_workers=len(shard_frames)) as executor:
+                futures = [executor.submit(process_shard, frame, self.anomaly_detector,
+                                           self.advise, self.api_key, self.batch_analysis, rule_engine,
+                                           1 / len(shard_frames))
+                           for frame in shard_frames]
+                results = [future.result() for future in futures]
+
+        scores = pd.concat([result["scores"] for result in results]).sort_index()
+        equipment_status = {}
+        recommendations = {}
+        for result in results:
+            equipment_status.update(result["equipment_status"])
+            recommendations.update(result["recommendations"])
+
+        maintenance_plan = None
+        if self.advise and recommendations:
+            advisor = LLMAdvisor(self.api_key)
+            if self.planning == "scheduler":
+                planner = MaintenanceScheduler(advisor=advisor)
+            else:
+                planner = HierarchicalPlanner(advisor)
+            maintenance_plan = planner.create_maintenance_plan(
+                sorted(recommendations), recommendations
+            )
+
+        self._write_outputs(scores, equipment_status, recommendations, maintenance_plan)
+        if self.store_path:
+            self._write_store(scores, equipment_status, recommendations, maintenance_plan)
+
+        return {
+            "scores": scores,
+            "equipment_status": equipment_status,
+            "recommendations": recommendations,
+            "maintenance_plan": maintenance_plan
+        }
+
+    def _write_outputs(self, scores: pd.DataFrame, equipment_status: Dict,
+                       recommendations: Dict, maintenance_plan: Dict) -> None:
+        """Write scores as CSV and statuses/recommendations/plan as JSON."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        scores.to_csv(os.path.join(self.output_dir, "scores.csv"), index=False)
+
+        outputs = {
+            "equipment_status.json": equipment_status,
+            "recommendations.json": recommendations if self.advise else None,
+            "maintenance_plan.json": maintenance_plan
+        }
+        for filename, payload in outputs.items():
+            if payload is None:
+                continue
+            with open(os.path.join(self.output_dir, filename), "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, indent=4, default=str)
+
+    def _write_store(self, scores: pd.DataFrame, equipment_status: Dict,
+                     recommendations: Dict, maintenance_plan: Dict) -> None:
+        """Bulk-insert the run's results into the SQLite results store."""
+        store = ResultsStore(self.store_path)
+        try:
+            store.save_scores(scores)
+            store.save_status(
+                {equipment_id: info["status"] for equipment_id, info in equipment_status.items()},
+                {equipment_id: info["anomaly_percentage"] for equipment_id, info in equipment_status.items()}
+            )
+            if recommendations:
+                store.save_recommendations(recommendations)
+            if maintenance_plan:
+                store.save_plan(maintenance_plan)
+        finally:
+            store.close()
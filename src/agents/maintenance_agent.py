@@ -1,60 +1,286 @@
-from typing import Dict, List
+import os
+import hashlib
+import joblib
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
 
 from src.data.sensor_processor import SensorDataProcessor
-from src.models.anomaly_detector import AnomalyDetector
+from src.models.anomaly_detector import AnomalyDetector, FEATURES
+from src.models.drift_monitor import DriftMonitor
+from src.models.incident_aggregator import aggregate_incidents
+from src.models.rule_engine import DEFAULT_RULES_PATH, RuleEngine, load_rules, more_severe
 from src.advisors.llm_advisor import LLMAdvisor
+from src.advisors.recommendation_index import RecommendationIndex
+from src.advisors.hierarchical_planner import HierarchicalPlanner
+from src.advisors.maintenance_scheduler import MaintenanceScheduler
+from src.data.results_store import ResultsStore
+from src.data.rollups import RollupStore
+from src.agents.snapshot import AgentSnapshot, snapshot_key
+
+
+def classify_status(anomaly_percentage: float) -> str:
+    """Map the percentage of anomalous readings to an equipment status."""
+    if anomaly_percentage < 3:
+        return "low"
+    elif anomaly_percentage < 7:
+        return "medium"
+    elif anomaly_percentage < 15:
+        return "high"
+    return "critical"
+
+
+# Absolute tolerances within which an anomaly signature is considered unchanged
+DEFAULT_SIGNATURE_TOLERANCES = {
+    "anomaly_count": 5,
+    "anomaly_percentage": 1.0,
+    "sensor_mean": 0.25
+}
+
+
+def anomaly_signature(equipment_data: pd.DataFrame) -> Dict[str, float]:
+    """Summarize scored equipment data the way the LLM advisor sees it."""
+    anomaly_data = equipment_data[equipment_data['is_anomaly']]
+    signature = {
+        "anomaly_count": float(len(anomaly_data)),
+        "anomaly_percentage": len(anomaly_data) / max(len(equipment_data), 1) * 100
+    }
+    means = anomaly_data[FEATURES].mean() if not anomaly_data.empty else pd.Series(np.nan, index=FEATURES)
+    signature.update({f"mean_{feature}": float(value) for feature, value in means.items()})
+    return signature
+
+
+def downsample_readings(scored_data: pd.DataFrame, max_points: int = 2000) -> pd.DataFrame:
+    """Time-bucketed view of scored readings with at most about ``max_points`` rows.
+
+    Sensors are averaged per bucket, the lowest anomaly score is kept and a bucket
+    is anomalous when any of its readings is; short series are returned unchanged.
+    """
+    if len(scored_data) <= max_points:
+        return scored_data
+    timestamps = pd.to_datetime(scored_data['timestamp'])
+    width = ((timestamps.max() - timestamps.min()) / max_points).ceil("1min")
+    aggregations = {feature: (feature, "mean") for feature in FEATURES}
+    aggregations["anomaly_score"] = ("anomaly_score", "min")
+    aggregations["is_anomaly"] = ("is_anomaly", "any")
+    return scored_data.groupby(timestamps.dt.floor(width)).agg(**aggregations).rename_axis('timestamp').reset_index()
+
+
+def signature_changed(previous: Optional[Dict[str, float]], current: Dict[str, float],
+                      tolerances: Dict[str, float] = None) -> bool:
+    """Whether any component of the anomaly signature moved beyond its tolerance."""
+    if previous is None:
+        return True
+    tolerances = {**DEFAULT_SIGNATURE_TOLERANCES, **(tolerances or {})}
+    for key, value in current.items():
+        tolerance = tolerances["sensor_mean"] if key.startswith("mean_") else tolerances[key]
+        old_value = previous.get(key, np.nan)
+        if np.isnan(value) and np.isnan(old_value):
+            continue
+        if np.isnan(value) or np.isnan(old_value) or abs(value - old_value) > tolerance:
+            return True
+    return False
+
 
 class MaintenanceAgent:
     """Agent that coordinates data processing, anomaly detection, and maintenance planning."""
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, results_store: ResultsStore = None,
+                 signature_tolerances: Dict[str, float] = None, planning: str = "llm",
+                 batch_analysis: bool = False, model_path: str = None, drift_monitor: DriftMonitor = None,
+                 snapshot_dir: str = None, rules_path: str = DEFAULT_RULES_PATH,
+                 rollup_store: RollupStore = None, llm_advisor: LLMAdvisor = None,
+                 recommendation_index: RecommendationIndex = None):
         self.data_processor = SensorDataProcessor()
-        self.anomaly_detector = AnomalyDetector()
-        self.llm_advisor = LLMAdvisor(api_key)
+        # Whole-fleet scoring (drift checks, reference scores) uses every core
+        self.anomaly_detector = AnomalyDetector(workers=os.cpu_count() or 1)
+        self.llm_advisor = llm_advisor or LLMAdvisor(api_key, recommendation_index=recommendation_index)
+        if planning == "scheduler":
+            # Deterministic schedule; the LLM only writes the justification
+            self.planner = MaintenanceScheduler(advisor=self.llm_advisor)
+        else:
+            self.planner = HierarchicalPlanner(self.llm_advisor)
+        self.results_store = results_store
+        self.rollup_store = rollup_store
+        self.model_path = model_path
+        self.drift_monitor = drift_monitor or DriftMonitor()
+        self.drift_events = []
+        self.retrain_count = 0
+        self.planning = planning
+        self.snapshot = AgentSnapshot(snapshot_dir) if snapshot_dir else None
+        self.snapshot_key = None
+        self.data_key = None
+        self.rules = load_rules(rules_path) if rules_path else {}
+        self._rule_engine = None
         self.equipment_status = {}
         self.maintenance_recommendations = {}
         self.maintenance_plan = None
+        self.signature_tolerances = signature_tolerances
+        self.batch_analysis = batch_analysis
+        self.anomaly_signatures = {}
+        self.anomaly_percentages = {}
+        self.incidents = {}
+        # Per equipment: model generation (retrain_count) and last timestamp already persisted
+        self._persisted = {}
+        self.analysis_count = 0
+        self._changed_recommendations = set()
+        
+    def initialize_system(self, data_path: str = None) -> bool:
+        """Initialize the system with data.
+        
+        With a snapshot directory and data files, an unchanged data/config pair is
+        restored from its snapshot instead of recomputed; returns True in that case.
+        """
+        if self.snapshot is not None and data_path:
+            self.snapshot_key = snapshot_key(data_path, self._snapshot_config())
+            if self.snapshot.load(self, self.snapshot_key):
+                self.data_processor.record_sources(data_path)
+                self.data_key = self.snapshot_key
+                return True
         
-    def initialize_system(self, data_path: str = None) -> None:
-        """Initialize the system with data."""
-        # Load and preprocess data
+        # Load and preprocess data; a persisted model brings its own scaler
         data = self.data_processor.load_data(data_path)
-        self.data_processor.preprocess_data()
+        model_loaded = self.model_path is not None and self.load_model(self.model_path)
+        self.data_processor.preprocess_data(fit_scaler=not model_loaded)
         
-        # Train anomaly detection model
-        self.anomaly_detector.train(data)
+        # Train anomaly detection model, or keep the persisted one unless the data drifted
+        if model_loaded:
+            self.check_drift()
+        else:
+            self.retrain()
         
         # Initialize equipment status
         for equipment_id in data['equipment_id'].unique():
             self.equipment_status[equipment_id] = "Unknown"
+        
+        self.data_key = self._data_key(data_path)
+        if self.snapshot_key is not None:
+            self.snapshot.save(self, self.snapshot_key)
+        return False
     
-    def process_equipment(self, equipment_id: str) -> Dict:
-        # Get equipment data
-        equipment_data = self.data_processor.get_equipment_data(equipment_id)
+    def _snapshot_config(self) -> Dict:
+        """Settings that change the content of a snapshot."""
+        return {
+            "features": FEATURES,
+            "model": self.anomaly_detector.model.get_params(),
+            "drift": {key: value for key, value in vars(self.drift_monitor).items()
+                      if key not in ("reference", "reference_end", "checked_until")},
+            "signature_tolerances": self.signature_tolerances,
+            "planning": self.planning,
+            "model_path": self.model_path,
+            "rules": self.rules
+        }
+    
+    def _data_key(self, data_path) -> str:
+        """Identity of the loaded data and settings that stored results are computed from.
         
-        # Detect anomalies
-        equipment_data = self.anomaly_detector.detect_anomalies(equipment_data)
+        Files are identified by their metadata (as for snapshots); generated data,
+        which differs on every start, by a hash of its content.
+        """
+        if data_path:
+            return snapshot_key(data_path, self._snapshot_config())
+        data = self.data_processor.data
+        content = pd.util.hash_pandas_object(data[['equipment_id', 'timestamp'] + FEATURES], index=False)
+        return hashlib.sha256(content.to_numpy().tobytes()).hexdigest()[:16]
+    
+    def save_snapshot(self) -> None:
+        """Refresh status, recommendations and plan in the current snapshot, if any,
+        and persist the recommendation index."""
+        self.llm_advisor.save_index()
+        if self.snapshot_key is not None:
+            self.snapshot.save_state(self, self.snapshot_key)
+    
+    def retrain(self) -> None:
+        """Train the anomaly detector on the loaded data and take it as the new drift reference."""
+        data = self.data_processor.data
+        self.anomaly_detector.train(data)
+        scores, _ = self.anomaly_detector.score(data[FEATURES].to_numpy())
+        self.drift_monitor.fit_reference(data, scores)
+        self.retrain_count += 1
+        if self.model_path is not None:
+            self.save_model(self.model_path)
+    
+    def check_drift(self, completed_only: bool = False) -> List[Dict]:
+        """Compare the loaded data with the training reference; retrain only if it drifted.
+        
+        With ``completed_only`` (used while monitoring) nothing is scored until a new
+        window has completed, and each completed window is checked once. Returns the
+        drift events, which are also kept in ``drift_events`` and the results store.
+        """
+        data = self.data_processor.data
+        if completed_only and not self.drift_monitor.window_completed(data['timestamp'].max()):
+            return []
+        data = data[self.drift_monitor.pending(data)]
+        scores, _ = self.anomaly_detector.score(data[FEATURES].to_numpy())
+        events = self.drift_monitor.check(data, scores, completed_only)
+        if events:
+            self.drift_events.extend(events)
+            if self.results_store is not None:
+                self.results_store.save_drift_events(events)
+            self.retrain()
+        return events
+    
+    def save_model(self, path: str) -> None:
+        """Persist the detector, the scaler it was trained with and the drift reference."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        joblib.dump({
+            "model": self.anomaly_detector.model,
+            "scaler": self.data_processor.scaler,
+            "drift_reference": self.drift_monitor.reference,
+            "trained_until": self.drift_monitor.reference_end
+        }, path)
+    
+    def load_model(self, path: str) -> bool:
+        """Restore a model saved by ``save_model``; False if there is none yet."""
+        if not os.path.exists(path):
+            return False
+        bundle = joblib.load(path)
+        self.anomaly_detector.model = bundle["model"]
+        self.anomaly_detector.is_trained = True
+        self.data_processor.scaler = bundle["scaler"]
+        self.drift_monitor.reference = bundle["drift_reference"]
+        self.drift_monitor.reference_end = bundle["trained_until"]
+        return True
+    
+    def ingest_new_data(self) -> List[str]:
+        """Append readings that arrived in the source files since they were read.
         
-        # Analyze with LLM and get recommendations
-        recommendation = self.llm_advisor.analyze_anomaly(equipment_data)
+        Returns the equipment that received readings; new equipment starts as "Unknown".
+        """
+        readings = self.data_processor.read_new_readings()
+        if readings.empty:
+            return []
+        self.data_processor.append_readings(readings)
+        equipment_ids = [str(equipment_id) for equipment_id in pd.unique(readings['equipment_id'])]
+        for equipment_id in equipment_ids:
+            self.equipment_status.setdefault(equipment_id, "Unknown")
+        return equipment_ids
+    
+    def process_equipment(self, equipment_id: str, force: bool = False, allow_analysis: bool = True) -> Dict:
+        """Score one equipment and re-analyse it only if its anomaly signature changed.
         
-        # Calculate anomaly percentage
-        anomaly_percentage = (equipment_data['is_anomaly'].sum() / len(equipment_data)) * 100
+        Set ``force`` to call the LLM even when the signature is within tolerance, or
+        ``allow_analysis=False`` to defer the LLM call (e.g. when a budget is spent);
+        a deferred equipment keeps its previous recommendation or gets a template one.
+        """
+        equipment_data, signature = self._score_equipment(equipment_id)
+        if equipment_data is None:
+            # No readings of this equipment in the loaded data
+            return self.maintenance_recommendations.get(equipment_id)
         
-        # Determine status based on anomaly percentage
-        if anomaly_percentage < 3:
-            status = "low"
-        elif anomaly_percentage < 7:
-            status = "medium"
-        elif anomaly_percentage < 15:
-            status = "high"
+        # Analyze with LLM only when the anomaly signature moved materially
+        if allow_analysis and self._needs_analysis(equipment_id, signature, force):
+            recommendation = self.llm_advisor.analyze_anomaly(equipment_data)
+            self.anomaly_signatures[equipment_id] = signature
+            self.analysis_count += 1
+        elif equipment_id in self.maintenance_recommendations:
+            recommendation = self.maintenance_recommendations[equipment_id]
         else:
-            status = "critical"
-        
-        # Update equipment status and store recommendation
-        self.equipment_status[equipment_id] = status
-        self.maintenance_recommendations[equipment_id] = recommendation
+            recommendation = self.llm_advisor.fallback_recommendation(equipment_data)
         
+        self._record_result(equipment_id, equipment_data, recommendation)
         return recommendation
     
     def process_all_equipment(self) -> Dict:
@@ -62,14 +288,32 @@ class MaintenanceAgent:
         # Get list of all equipment
         all_equipment = list(self.equipment_status.keys())
         
-        # Process each equipment
-        for equipment_id in all_equipment:
-            self.process_equipment(equipment_id)
+        if self.batch_analysis:
+            # Score everything first, then analyse the changed assets several per LLM call
+            scored = {equipment_id: self._score_equipment(equipment_id) for equipment_id in all_equipment}
+            scored = {equipment_id: result for equipment_id, result in scored.items() if result[0] is not None}
+            to_analyze = {equipment_id: equipment_data
+                          for equipment_id, (equipment_data, signature) in scored.items()
+                          if self._needs_analysis(equipment_id, signature)}
+            new_recommendations = self.llm_advisor.analyze_anomalies_batch(to_analyze)
+            self.analysis_count += len(to_analyze)
+            for equipment_id, (equipment_data, signature) in scored.items():
+                if equipment_id in new_recommendations:
+                    self.anomaly_signatures[equipment_id] = signature
+                recommendation = new_recommendations.get(
+                    equipment_id, self.maintenance_recommendations.get(equipment_id)
+                )
+                self._record_result(equipment_id, equipment_data, recommendation)
+        else:
+            # Process each equipment
+            for equipment_id in all_equipment:
+                self.process_equipment(equipment_id)
         
-        # Create maintenance plan
-        self.maintenance_plan = self.llm_advisor.create_maintenance_plan(
-            all_equipment, self.maintenance_recommendations
-        )
+        self.update_maintenance_plan()
+        self.save_snapshot()
+        if self.results_store is not None and self.data_key is not None:
+            # Stored results now belong to this data; see load_results
+            self.results_store.set_metadata("data_key", self.data_key)
         
         return {
             "equipment_status": self.equipment_status,
@@ -77,10 +321,139 @@ class MaintenanceAgent:
             "maintenance_plan": self.maintenance_plan
         }
     
-    def get_equipment_details(self, equipment_id: str) -> Dict:
-        """Get detailed information for a specific equipment."""
+    def update_maintenance_plan(self) -> bool:
+        """Regenerate the maintenance plan only when a recommendation actually changed.
+        
+        Returns True when a new plan was created.
+        """
+        if self.maintenance_plan is not None and not self._changed_recommendations:
+            return False
+        
+        self.maintenance_plan = self.planner.create_maintenance_plan(
+            list(self.equipment_status.keys()), self.maintenance_recommendations
+        )
+        self._changed_recommendations.clear()
+        if self.results_store is not None:
+            self.results_store.save_plan(self.maintenance_plan)
+        return True
+    
+    def _score_equipment(self, equipment_id: str) -> Tuple[pd.DataFrame, Dict[str, float]]:
+        """Detect anomalies for one equipment and compute its anomaly signature; (None, None) without data."""
         equipment_data = self.data_processor.get_equipment_data(equipment_id)
-        anomaly_data = self.anomaly_detector.detect_anomalies(equipment_data)
+        if equipment_data.empty:
+            return None, None
+        equipment_data = self._detect(equipment_data)
+        return equipment_data, anomaly_signature(equipment_data)
+    
+    def _detect(self, equipment_data: pd.DataFrame) -> pd.DataFrame:
+        """Model scores, with rows violating an engineering rule flagged as anomalies too."""
+        scored = self.anomaly_detector.detect_anomalies(equipment_data)
+        if self.rules:
+            scored = self.rule_engine.apply(scored)
+        return scored
+    
+    @property
+    def rule_engine(self) -> RuleEngine:
+        """Rules compiled against the current scaler (recompiled when the scaler is replaced)."""
+        if self._rule_engine is None or self._rule_engine.scaler is not self.data_processor.scaler:
+            self._rule_engine = RuleEngine(self.rules, self.data_processor.scaler)
+        return self._rule_engine
+    
+    def _needs_analysis(self, equipment_id: str, signature: Dict[str, float], force: bool = False) -> bool:
+        return force or equipment_id not in self.maintenance_recommendations or signature_changed(
+            self.anomaly_signatures.get(equipment_id), signature, self.signature_tolerances
+        )
+    
+    def _record_result(self, equipment_id: str, equipment_data: pd.DataFrame, recommendation: Dict) -> None:
+        """Update status and recommendation of one equipment and persist them."""
+        previous_recommendation = self.maintenance_recommendations.get(equipment_id)
+        
+        # Calculate anomaly percentage
+        anomaly_percentage = (equipment_data['is_anomaly'].sum() / len(equipment_data)) * 100
+        
+        # Determine status based on anomaly percentage, raised to the severity of any violated rule
+        status = classify_status(anomaly_percentage)
+        if self.rules:
+            status = more_severe(status, self.rule_engine.worst_severity(equipment_data))
+        
+        # Update equipment status and store recommendation
+        self.equipment_status[equipment_id] = status
+        self.anomaly_percentages[equipment_id] = anomaly_percentage
+        self.incidents[equipment_id] = aggregate_incidents(equipment_data)
+        self.maintenance_recommendations[equipment_id] = recommendation
+        if recommendation != previous_recommendation:
+            self._changed_recommendations.add(equipment_id)
+        
+        # Persist results so the dashboard and CLI can read them without recomputing;
+        # scores and rollups only get the rows past the watermark of the current model
+        since = self._persisted_since(equipment_id)
+        if self.results_store is not None:
+            self.results_store.save_scores(equipment_data if since is None else
+                                           equipment_data[equipment_data['timestamp'] > since])
+            self.results_store.save_incidents(equipment_id, self.incidents[equipment_id],
+                                              equipment_data['timestamp'].min(), equipment_data['timestamp'].max())
+            self.results_store.save_status({equipment_id: status}, {equipment_id: anomaly_percentage})
+            if recommendation != previous_recommendation:
+                self.results_store.save_recommendations({equipment_id: recommendation})
+            if equipment_id in self.anomaly_signatures:
+                self.results_store.save_signatures({equipment_id: self.anomaly_signatures[equipment_id]})
+        if self.rollup_store is not None:
+            # Whole minutes from the watermark on, since the rollup replaces the 1-minute buckets it gets
+            self.rollup_store.append(equipment_data if since is None else
+                                     equipment_data[equipment_data['timestamp'] >= since.floor("1min")])
+        self._persisted[equipment_id] = (self.retrain_count, equipment_data['timestamp'].max())
+    
+    def _persisted_since(self, equipment_id: str) -> Optional[pd.Timestamp]:
+        """Last timestamp persisted for an equipment with the current model, None when all rows must be written.
+        
+        Rows are written in full on the first pass of the process and after every
+        (re)training, since then the scores of already stored rows change too.
+        """
+        generation, watermark = self._persisted.get(equipment_id, (None, None))
+        return watermark if generation == self.retrain_count else None
+    
+    def load_results(self) -> bool:
+        """Load the latest stored status, recommendations and plan instead of recomputing them.
+        
+        Results are only reused when they were computed from the currently loaded
+        data (same data key) and only for equipment present in it. Returns True when
+        the store held such results for at least one equipment.
+        """
+        if self.results_store is None or self.data_key is None:
+            return False
+        if self.results_store.get_metadata("data_key") != self.data_key:
+            return False
+        
+        present = set(self.data_processor.data['equipment_id'].unique())
+        stored_status = {equipment_id: status for equipment_id, status in self.results_store.latest_status().items()
+                         if equipment_id in present}
+        if not stored_status:
+            return False
+        
+        self.equipment_status.update(stored_status)
+        self.maintenance_recommendations.update(
+            {equipment_id: recommendation
+             for equipment_id, recommendation in self.results_store.latest_recommendations().items()
+             if equipment_id in present}
+        )
+        self.anomaly_signatures.update(
+            {equipment_id: signature for equipment_id, signature in self.results_store.latest_signatures().items()
+             if equipment_id in present}
+        )
+        self.maintenance_plan = self.results_store.latest_plan() or self.maintenance_plan
+        return True
+    
+    def get_equipment_details(self, equipment_id: str, max_points: int = 2000) -> Dict:
+        """Get detailed information for a specific equipment.
+        
+        Incidents come from the last analysis (in memory or the results store) when
+        available; ``data`` is downsampled to about ``max_points`` rows for charting.
+        """
+        equipment_data = self.data_processor.get_equipment_data(equipment_id)
+        anomaly_data = self._stored_scores(equipment_data)
+        stored = anomaly_data is not None
+        if not stored:
+            anomaly_data = self._detect(equipment_data)
         
         summary = {
             "equipment_id": equipment_id,
@@ -97,7 +470,40 @@ class MaintenanceAgent:
             "recommendation": self.maintenance_recommendations.get(equipment_id, {})
         }
         
+        incidents = self.incidents.get(equipment_id)
+        if incidents is None and stored:
+            incidents = self.results_store.get_incidents(
+                equipment_id, equipment_data['timestamp'].min(), equipment_data['timestamp'].max()
+            )
+        if incidents is None:
+            incidents = aggregate_incidents(anomaly_data)
+            self.incidents[equipment_id] = incidents
+        summary["incident_count"] = len(incidents)
+        
         return {
             "summary": summary,
-            "data": anomaly_data.to_dict(orient='records')
+            "data": downsample_readings(anomaly_data, max_points).to_dict(orient='records'),
+            "incidents": incidents.to_dict(orient='records')
         }
+    
+    def _stored_scores(self, equipment_data: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """Attach stored scores to equipment data, or return None if any row has not been scored yet.
+        
+        Rule violations are not stored, so the rules are evaluated again on the result.
+        """
+        if self.results_store is None or equipment_data.empty:
+            return None
+        
+        equipment_id = equipment_data['equipment_id'].iloc[0]
+        scores = self.results_store.get_scores(
+            equipment_id, equipment_data['timestamp'].min(), equipment_data['timestamp'].max()
+        )
+        if len(scores) < len(equipment_data):
+            return None
+        
+        result = equipment_data.merge(scores, on='timestamp', how='left')
+        if result['anomaly_score'].isna().any():
+            return None
+        if self.rules:
+            result = self.rule_engine.apply(result)
+        return result
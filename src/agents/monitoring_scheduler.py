@@ -0,0 +1,144 @@
+"""
+Module giám sát thích ứng: quét lại thiết bị rủi ro cao thường xuyên hơn, trong giới hạn CPU và LLM mỗi chu kỳ.
+"""
+import time
+import heapq
+import itertools
+from typing import Callable, Dict, List
+
+from src.agents.maintenance_agent import MaintenanceAgent
+
+# Khoảng thời gian quét lại (giây) theo trạng thái thiết bị
+DEFAULT_RESCAN_INTERVALS = {
+    "critical": 60,
+    "high": 60,
+    "medium": 300,
+    "low": 1800,
+    "Unknown": 0
+}
+
+STATUS_PRIORITY = {"critical": 0, "high": 1, "Unknown": 2, "medium": 3, "low": 4}
+
+
+class AdaptiveMonitor:
+    """Long-running scheduler around MaintenanceAgent.process_equipment.
+
+    A heap keyed by the next due time holds every asset. Each interval, the due
+    assets are processed riskiest first (status, then worsening anomaly trend) until
+    the CPU-seconds or LLM-call budget of the interval is spent; the rest stay due
+    for the next interval. After each rescan an asset is rescheduled according to
+    its status, sooner when its anomaly percentage is rising.
+    """
+
+    def __init__(self, agent: MaintenanceAgent, intervals: Dict[str, float] = None,
+                 interval_seconds: float = 60.0, cpu_budget_seconds: float = 30.0, llm_budget: int = 10,
+                 trend_factor: float = 0.5, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.agent = agent
+        self.intervals = {**DEFAULT_RESCAN_INTERVALS, **(intervals or {})}
+        self.interval_seconds = interval_seconds
+        self.cpu_budget_seconds = cpu_budget_seconds
+        self.llm_budget = llm_budget
+        self.trend_factor = trend_factor
+        self.clock = clock
+        self.sleep = sleep
+
+        self.anomaly_percentages = {}
+        self.trends = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._known = set(agent.equipment_status)
+        now = self.clock()
+        for equipment_id in agent.equipment_status:
+            self._schedule(equipment_id, now)
+
+    def _schedule(self, equipment_id: str, due: float) -> None:
+        heapq.heappush(self._heap, (due, next(self._counter), equipment_id))
+
+    def next_interval(self, equipment_id: str) -> float:
+        """Seconds until the next rescan of an asset, shorter when its anomaly trend is rising."""
+        status = self.agent.equipment_status.get(equipment_id, "Unknown")
+        interval = self.intervals.get(status, self.intervals["low"])
+        if self.trends.get(equipment_id, 0.0) > 0:
+            interval *= self.trend_factor
+        return interval
+
+    def _priority(self, equipment_id: str):
+        status = self.agent.equipment_status.get(equipment_id, "Unknown")
+        return STATUS_PRIORITY.get(status, len(STATUS_PRIORITY)), -self.trends.get(equipment_id, 0.0)
+
+    def run_interval(self) -> Dict:
+        """Pick up new readings, then process the due assets within the CPU and LLM budgets.
+        
+        New readings also trigger a drift check of every window completed since the
+        last one; drift retrains the model before the assets are rescored. The LLM budget is charged with the calls actually made, so recommendations
+        reused from the index or assets without anomalies cost nothing.
+        """
+        now = self.clock()
+        new_readings_for = self.agent.ingest_new_data()
+        for equipment_id in new_readings_for:
+            if equipment_id not in self._known:
+                # New equipment is scanned right away
+                self._known.add(equipment_id)
+                self._schedule(equipment_id, now)
+        drift_events = self.agent.check_drift(completed_only=True) if new_readings_for else []
+        
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap))
+        due.sort(key=lambda entry: (self._priority(entry[2]), entry[0]))
+
+        processed: List[str] = []
+        cpu_used = 0.0
+        llm_calls = 0
+        for index, (due_time, _, equipment_id) in enumerate(due):
+            if cpu_used >= self.cpu_budget_seconds:
+                # Budget spent: keep the remaining assets due for the next interval
+                for deferred_due, _, deferred_id in due[index:]:
+                    self._schedule(deferred_id, deferred_due)
+                break
+
+            cpu_start = time.process_time()
+            calls_before = self.agent.llm_advisor.call_count
+            self.agent.process_equipment(equipment_id, allow_analysis=llm_calls < self.llm_budget)
+            llm_calls += self.agent.llm_advisor.call_count - calls_before
+            cpu_used += time.process_time() - cpu_start
+
+            self._update_trend(equipment_id)
+            self._schedule(equipment_id, self.clock() + self.next_interval(equipment_id))
+            processed.append(equipment_id)
+
+        plan_updated = False
+        if llm_calls < self.llm_budget:
+            calls_before = self.agent.llm_advisor.call_count
+            plan_updated = self.agent.update_maintenance_plan()
+            llm_calls += self.agent.llm_advisor.call_count - calls_before
+        if processed:
+            self.agent.save_snapshot()
+
+        return {
+            "new_readings_for": new_readings_for,
+            "drift_events": len(drift_events),
+            "processed": processed,
+            "deferred": len(due) - len(processed),
+            "cpu_seconds": cpu_used,
+            "llm_calls": llm_calls,
+            "plan_updated": plan_updated
+        }
+
+    def _update_trend(self, equipment_id: str) -> None:
+        percentage = self.agent.anomaly_percentages.get(equipment_id)
+        if percentage is None:
+            return
+        previous = self.anomaly_percentages.get(equipment_id)
+        self.trends[equipment_id] = 0.0 if previous is None else percentage - previous
+        self.anomaly_percentages[equipment_id] = percentage
+
+    def run_forever(self, max_intervals: int = None) -> None:
+        """Run intervals back to back, sleeping for the rest of each interval."""
+        for count in itertools.count():
+            if max_intervals is not None and count >= max_intervals:
+                break
+            started = self.clock()
+            self.run_interval()
+            self.sleep(max(0.0, self.interval_seconds - (self.clock() - started)))
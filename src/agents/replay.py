@@ -0,0 +1,293 @@
+"""
+Module phát lại dữ liệu lịch sử qua toàn bộ agent theo thứ tự thời gian với tốc độ tăng tốc, dùng LLM giả lập,
+để đo thông lượng, độ trễ, thời gian phát hiện lỗi và tài nguyên trước khi triển khai ở hiện trường mới.
+"""
+import json
+import time
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, List, Union
+from langchain_core.runnables import RunnableLambda
+
+from src.advisors.llm_advisor import LLMAdvisor
+from src.advisors.resilience import ResilientCaller
+from src.agents.maintenance_agent import MaintenanceAgent
+from src.models.anomaly_detector import FEATURES
+from src.models.rule_engine import DEFAULT_RULES_PATH
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Lỗi được tiêm trong data/sample_sensor_data.py: (thiết bị, kiểu lỗi, cảm biến, vị trí bắt đầu trong chuỗi)
+SAMPLE_FAULTS = [
+    ("PUMP-102", "cooling_failure", "temperature", 0.0),
+    ("COMPRESSOR-A1", "vibration_ramp", "vibration", 0.7),
+    ("VALVE-S22", "stuck_valve", "flow_rate", 0.6)
+]
+
+FAKE_RECOMMENDATION = {
+    "issue": "Bất thường phát hiện trong quá trình phát lại",
+    "recommendation": "Kiểm tra thiết bị theo quy trình tiêu chuẩn",
+    "severity": "medium",
+    "consequences": "Không áp dụng (LLM giả lập)",
+    "estimated_downtime_hours": 2,
+    "parts_needed": ["công cụ kiểm tra"]
+}
+
+
+class FakeLLM:
+    """Deterministic stand-in for the LLM backend that counts calls and can simulate latency.
+
+    Analysis prompts get a fixed JSON recommendation, any other prompt a short
+    text, so the agent runs its normal parsing paths without network access.
+    """
+
+    def __init__(self, latency: float = 0.0, sleep: Callable[[float], None] = time.sleep):
+        self.latency = latency
+        self.sleep = sleep
+        self.calls = 0
+        self.prompt_characters = 0
+
+    def __call__(self, prompt) -> str:
+        text = prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+        self.calls += 1
+        self.prompt_characters += len(text)
+        if self.latency > 0:
+            self.sleep(self.latency)
+        if '"issue"' in text:
+            return json.dumps(FAKE_RECOMMENDATION, ensure_ascii=False)
+        return "Kế hoạch được sắp xếp theo mức độ nghiêm trọng (LLM giả lập)."
+
+    def as_runnable(self) -> RunnableLambda:
+        return RunnableLambda(self)
+
+
+def sample_fault_labels(data: pd.DataFrame) -> pd.DataFrame:
+    """Onsets of the faults injected by data/sample_sensor_data.py, for the equipment present in ``data``."""
+    rows = []
+    for equipment_id, pattern, sensor, position in SAMPLE_FAULTS:
+        timestamps = np.sort(data.loc[data['equipment_id'] == equipment_id, 'timestamp'].to_numpy())
+        if len(timestamps):
+            rows.append({"equipment_id": equipment_id, "pattern": pattern, "sensor": sensor,
+                         "onset_timestamp": timestamps[int(len(timestamps) * position)]})
+    return pd.DataFrame(rows, columns=["equipment_id", "pattern", "sensor", "onset_timestamp"])
+
+
+def load_fault_labels(path: str) -> pd.DataFrame:
+    """Fault labels as written by ``pm-agent generate --labels``."""
+    return pd.read_csv(path, parse_dates=['onset_timestamp'])
+
+
+def peak_memory_mb() -> float:
+    """Peak resident memory of this process in MB (NaN where ``resource`` is unavailable)."""
+    if resource is None:
+        return float("nan")
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class ReplayHarness:
+    """Feed a historical dataset through MaintenanceAgent in timestamp order at ``speedup`` × real time.
+
+    The first ``warmup`` fraction of the time span trains the scaler and the
+    detector, like the history available before go-live. The rest is replayed in
+    ticks of simulated time: readings become visible when the clock passes their
+    timestamp, every equipment that received readings is processed on a window of
+    the last ``history`` of data, and the plan is updated. Each tick is due at the
+    wall time its last reading would arrive at the given speedup; lag is how late
+    its results are relative to that. ``speedup=None`` replays as fast as possible.
+    """
+
+    def __init__(self, data_paths: Union[str, List[str]], speedup: float = 1000.0, tick: str = "1h",
+                 history: str = "1D", warmup: float = 0.2, fault_labels: pd.DataFrame = None,
+                 llm_latency: float = 0.0, rules_path: str = DEFAULT_RULES_PATH,
+                 detect_statuses: tuple = ("high", "critical"),
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        if not 0 < warmup < 1:
+            raise ValueError("warmup phải nằm trong khoảng (0, 1)")
+        self.data_paths = data_paths
+        self.speedup = speedup or None
+        self.tick = pd.Timedelta(tick)
+        self.history = pd.Timedelta(history)
+        self.warmup = warmup
+        self.fault_labels = fault_labels
+        self.detect_statuses = set(detect_statuses)
+        self.clock = clock
+        self.sleep = sleep
+
+        self.fake_llm = FakeLLM(llm_latency, sleep)
+        # The fake backend is not rate limited; real provider limits are not part of the measurement
+        caller = ResilientCaller(requests_per_minute=1e9, tokens_per_minute=1e12)
+        self.agent = MaintenanceAgent(
+            planning="scheduler", rules_path=rules_path,
+            llm_advisor=LLMAdvisor(caller=caller, llm=self.fake_llm.as_runnable())
+        )
+        self.data = None
+        self.replay_start = None
+
+    def prepare(self) -> pd.DataFrame:
+        """Load and sort the readings, then fit scaler and detector on the warm-up period."""
+        processor = self.agent.data_processor
+        data = processor.load_data(self.data_paths)
+        data['timestamp'] = pd.to_datetime(data['timestamp'])
+        data = data.sort_values('timestamp', kind="stable", ignore_index=True)
+        if self.fault_labels is None:
+            self.fault_labels = sample_fault_labels(data)
+
+        start, end = data['timestamp'].iloc[0], data['timestamp'].iloc[-1]
+        self.replay_start = start + (end - start) * self.warmup
+        warm = (data['timestamp'] <= self.replay_start).to_numpy()
+
+        processor.scaler.fit(data.loc[warm, FEATURES])
+        processor.data = data
+        self.data = processor.preprocess_data(fit_scaler=False)
+        self.agent.anomaly_detector.train(self.data[warm])
+        for equipment_id in pd.unique(self.data['equipment_id']):
+            self.agent.equipment_status[equipment_id] = "Unknown"
+        return self.data
+
+    def run(self) -> Dict:
+        """Replay the dataset and return the throughput, lag, detection and resource report."""
+        if self.data is None:
+            self.prepare()
+        agent = self.agent
+        data = self.data
+        timestamps = data['timestamp'].to_numpy()
+        end = data['timestamp'].iloc[-1]
+        onsets = {row.equipment_id: row for row in self.fault_labels.itertuples(index=False)}
+
+        detections = {}
+        false_alarms = {}
+        lags = []
+        tick_seconds = []
+        busy = 0.0
+        readings = 0
+        cpu_start = time.process_time()
+        wall_start = self.clock()
+
+        tick_start = self.replay_start
+        while tick_start < end:
+            tick_end = min(tick_start + self.tick, end)
+            first = np.searchsorted(timestamps, tick_start.to_datetime64(), side="right")
+            last = np.searchsorted(timestamps, tick_end.to_datetime64(), side="right")
+            arrived = pd.unique(data['equipment_id'].iloc[first:last])
+            readings += last - first
+
+            due = None
+            if self.speedup is not None:
+                due = wall_start + (tick_end - self.replay_start).total_seconds() / self.speedup
+                self.sleep(max(0.0, due - self.clock()))
+
+            started = self.clock()
+            window_start = np.searchsorted(timestamps, (tick_end - self.history).to_datetime64(), side="right")
+            agent.data_processor.data = data.iloc[window_start:last]
+            for equipment_id in arrived:
+                was_alerting = agent.equipment_status[equipment_id] in self.detect_statuses
+                agent.process_equipment(equipment_id)
+                if agent.equipment_status[equipment_id] in self.detect_statuses:
+                    self._record_alert(equipment_id, tick_end, was_alerting, onsets, detections, false_alarms)
+            agent.update_maintenance_plan()
+            finished = self.clock()
+
+            busy += finished - started
+            tick_seconds.append(finished - started)
+            if due is not None:
+                lags.append(finished - due)
+            tick_start = tick_end
+
+        wall = self.clock() - wall_start
+        simulated = (end - self.replay_start).total_seconds()
+        agent.data_processor.data = data
+        return {
+            "readings": int(readings),
+            "equipment": len(agent.equipment_status),
+            "ticks": len(tick_seconds),
+            "simulated_seconds": simulated,
+            "wall_seconds": wall,
+            "busy_seconds": busy,
+            "target_speedup": self.speedup,
+            "achieved_speedup": simulated / wall if wall > 0 else float("inf"),
+            "max_speedup": simulated / busy if busy > 0 else float("inf"),
+            "readings_per_second": readings / wall if wall > 0 else float("inf"),
+            "capacity_readings_per_second": readings / busy if busy > 0 else float("inf"),
+            "tick_seconds": _distribution(tick_seconds),
+            "lag_seconds": _distribution(lags) if lags else None,
+            "detections": self._detection_report(onsets, detections),
+            "false_alarms": [{"equipment_id": equipment_id, "first_alert": at.isoformat()}
+                             for equipment_id, at in sorted(false_alarms.items())],
+            "llm_calls": self.fake_llm.calls,
+            "cpu_seconds": time.process_time() - cpu_start,
+            "peak_memory_mb": peak_memory_mb()
+        }
+
+    def _record_alert(self, equipment_id: str, at: pd.Timestamp, was_alerting: bool, onsets: Dict,
+                      detections: Dict, false_alarms: Dict) -> None:
+        label = onsets.get(equipment_id)
+        if label is not None and at >= pd.Timestamp(label.onset_timestamp):
+            if equipment_id not in detections:
+                incidents = self.agent.incidents.get(equipment_id)
+                sensor = incidents['dominant_sensor'].iloc[-1] if incidents is not None and len(incidents) else None
+                detections[equipment_id] = (at, sensor, was_alerting)
+        elif equipment_id not in false_alarms:
+            false_alarms[equipment_id] = at
+
+    def _detection_report(self, onsets: Dict, detections: Dict) -> List[Dict]:
+        report = []
+        for equipment_id, label in sorted(onsets.items()):
+            onset = pd.Timestamp(label.onset_timestamp)
+            detected_at, sensor, was_alerting = detections.get(equipment_id, (None, None, None))
+            report.append({
+                "equipment_id": equipment_id,
+                "pattern": label.pattern,
+                "sensor": label.sensor,
+                "onset": onset.isoformat(),
+                # A fault that starts in the warm-up period can only be detected from the replay start
+                "replayed_from_onset": onset >= self.replay_start,
+                "detected_at": detected_at.isoformat() if detected_at is not None else None,
+                "time_to_detect_minutes": ((detected_at - max(onset, self.replay_start)).total_seconds() / 60
+                                           if detected_at is not None else None),
+                # Already alerting before the onset: the time to detect says nothing about this fault
+                "alerting_before_onset": was_alerting,
+                "dominant_sensor": sensor,
+                "sensor_matched": sensor == label.sensor if detected_at is not None else None
+            })
+        return report
+
+
+def _distribution(values: List[float]) -> Dict[str, float]:
+    array = np.asarray(values, dtype=float)
+    return {"mean": float(array.mean()), "p95": float(np.percentile(array, 95)), "max": float(array.max())}
+
+
+def format_report(report: Dict) -> str:
+    """Human-readable summary of a replay report."""
+    lines = [
+        f"Đã phát lại {report['readings']} lần đọc của {report['equipment']} thiết bị "
+        f"trong {report['ticks']} nhịp ({report['simulated_seconds'] / 3600:.1f} giờ mô phỏng, "
+        f"{report['wall_seconds']:.1f} giây thực)",
+        f"Thông lượng duy trì: {report['readings_per_second']:.0f} lần đọc/giây "
+        f"(năng lực xử lý {report['capacity_readings_per_second']:.0f} lần đọc/giây)",
+        f"Tăng tốc đạt được: {report['achieved_speedup']:.0f}× (tối đa {report['max_speedup']:.0f}×)",
+        f"Thời gian xử lý mỗi nhịp: trung bình {report['tick_seconds']['mean']:.3f}s, "
+        f"p95 {report['tick_seconds']['p95']:.3f}s, tối đa {report['tick_seconds']['max']:.3f}s"
+    ]
+    if report["lag_seconds"] is not None:
+        lag = report["lag_seconds"]
+        lines.append(f"Độ trễ so với thời gian thực ({report['target_speedup']:.0f}×): trung bình {lag['mean']:.3f}s, "
+                     f"p95 {lag['p95']:.3f}s, tối đa {lag['max']:.3f}s")
+    for detection in report["detections"]:
+        if detection["detected_at"] is None:
+            lines.append(f"  {detection['equipment_id']} ({detection['pattern']}): không phát hiện")
+        else:
+            line = (f"  {detection['equipment_id']} ({detection['pattern']}): phát hiện sau "
+                    f"{detection['time_to_detect_minutes']:.0f} phút, cảm biến chính "
+                    f"{detection['dominant_sensor']} (kỳ vọng {detection['sensor']})")
+            if detection["alerting_before_onset"]:
+                line += ", đã cảnh báo từ trước khi lỗi bắt đầu"
+            lines.append(line)
+    lines.append(f"Cảnh báo sai: {len(report['false_alarms'])} thiết bị")
+    lines.append(f"LLM giả lập: {report['llm_calls']} lần gọi; CPU {report['cpu_seconds']:.1f}s; "
+                 f"bộ nhớ đỉnh {report['peak_memory_mb']:.0f} MB")
+    return "\n".join(lines)
@@ -0,0 +1,150 @@
+"""
+Module lưu và khôi phục nhanh toàn bộ trạng thái của agent (dữ liệu đã tiền xử lý, mô hình, kết quả) khi khởi động lại.
+"""
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Union
+
+from src.models.anomaly_detector import FEATURES
+
+# Tăng khi định dạng snapshot thay đổi để bỏ qua các snapshot cũ
+SNAPSHOT_VERSION = 1
+
+
+def snapshot_key(data_paths: Union[str, List[str]], config: Dict) -> str:
+    """Hash of the source files (path, size, modification time) and the agent configuration.
+
+    File metadata is hashed instead of the contents so computing the key of
+    gigabytes of sensor data stays instantaneous.
+    """
+    paths = [data_paths] if isinstance(data_paths, str) else list(data_paths)
+    sources = []
+    for path in paths:
+        stat = os.stat(path)
+        sources.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+    payload = json.dumps({"version": SNAPSHOT_VERSION, "sources": sources, "config": config},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class AgentSnapshot:
+    """Directory of one agent snapshot per key.
+
+    The feature columns are stored as one ``.npy`` block and loaded memory-mapped
+    (copy-on-write), so restoring them costs no parsing and no up-front reads;
+    datetime columns are stored as int64 and text columns as integer codes plus
+    their categories. The scaler, model and drift reference go through
+    ``MaintenanceAgent.save_model``; status, recommendations and plan are JSON.
+    """
+
+    def __init__(self, directory: str = "data/snapshots"):
+        self.directory = directory
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(os.path.join(self.path(key), "columns.json"))
+
+    def save(self, agent, key: str) -> None:
+        """Write data, model and state of the agent; the snapshot appears atomically."""
+        target = self.path(key)
+        staging = target + ".tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+        self._save_data(agent.data_processor.data, staging)
+        agent.save_model(os.path.join(staging, "model.joblib"))
+        self._write_state(agent, staging)
+
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(staging, target)
+
+    def save_state(self, agent, key: str) -> None:
+        """Refresh only status, recommendations and plan of an existing snapshot."""
+        if self.exists(key):
+            self._write_state(agent, self.path(key))
+
+    def load(self, agent, key: str) -> bool:
+        """Restore the agent from the snapshot of ``key``; False if there is none."""
+        if not self.exists(key):
+            return False
+        directory = self.path(key)
+
+        agent.data_processor.data = self._load_data(directory)
+        agent.load_model(os.path.join(directory, "model.joblib"))
+
+        with open(os.path.join(directory, "state.json"), "r", encoding="utf-8") as f:
+            state = json.load(f)
+        agent.equipment_status.update(state["equipment_status"])
+        agent.maintenance_recommendations.update(state["maintenance_recommendations"])
+        agent.maintenance_plan = state["maintenance_plan"]
+        agent.anomaly_signatures.update(state["anomaly_signatures"])
+        agent.anomaly_percentages.update(state["anomaly_percentages"])
+        return True
+
+    @staticmethod
+    def _write_state(agent, directory: str) -> None:
+        state = {
+            "equipment_status": agent.equipment_status,
+            "maintenance_recommendations": agent.maintenance_recommendations,
+            "maintenance_plan": agent.maintenance_plan,
+            "anomaly_signatures": agent.anomaly_signatures,
+            "anomaly_percentages": {k: float(v) for k, v in agent.anomaly_percentages.items()}
+        }
+        path = os.path.join(directory, "state.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, default=str)
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def _save_data(data: pd.DataFrame, directory: str) -> None:
+        columns = []
+        # Features as one (features, rows) block: its transpose is the column-major layout pandas keeps
+        np.save(os.path.join(directory, "features.npy"),
+                np.ascontiguousarray(data[FEATURES].to_numpy(dtype=np.float64).T))
+
+        for index, column in enumerate(data.columns):
+            if column in FEATURES:
+                columns.append({"name": column, "kind": "feature"})
+                continue
+            values = data[column]
+            file_name = f"column_{index}.npy"
+            if pd.api.types.is_datetime64_any_dtype(values):
+                np.save(os.path.join(directory, file_name),
+                        values.to_numpy(dtype="datetime64[ns]").view(np.int64))
+                columns.append({"name": column, "kind": "datetime", "file": file_name})
+            elif pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+                np.save(os.path.join(directory, file_name), values.to_numpy())
+                columns.append({"name": column, "kind": "numeric", "file": file_name})
+            else:
+                codes, categories = pd.factorize(values.astype(str))
+                np.save(os.path.join(directory, file_name), codes.astype(np.int32))
+                columns.append({"name": column, "kind": "text", "file": file_name,
+                                "categories": categories.tolist()})
+
+        with open(os.path.join(directory, "columns.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": SNAPSHOT_VERSION, "columns": columns}, f, ensure_ascii=False)
+
+    @staticmethod
+    def _load_data(directory: str) -> pd.DataFrame:
+        with open(os.path.join(directory, "columns.json"), "r", encoding="utf-8") as f:
+            layout = json.load(f)
+
+        features = np.load(os.path.join(directory, "features.npy"), mmap_mode="c")
+        data = pd.DataFrame(features.T, columns=FEATURES, copy=False)
+        for column in layout["columns"]:
+            if column["kind"] == "feature":
+                continue
+            values = np.load(os.path.join(directory, column["file"]), mmap_mode="c")
+            if column["kind"] == "datetime":
+                values = values.view("datetime64[ns]")
+            elif column["kind"] == "text":
+                values = np.asarray(column["categories"], dtype=object)[values]
+            data[column["name"]] = values
+        # Feature columns come first; reordering them would copy the mapped block
+        return data
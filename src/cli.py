@@ -0,0 +1,221 @@
+"""
+Giao diện dòng lệnh (không cần UI) cho hệ thống bảo trì dự đoán.
+"""
+import os
+import argparse
+from typing import List
+from dotenv import load_dotenv
+
+MODEL_PATH_HELP = ("File mô hình đã huấn luyện: dùng lại khi dữ liệu không trôi, "
+                   "huấn luyện lại và ghi đè khi phát hiện drift")
+
+
+def _run_batch(args: argparse.Namespace) -> None:
+    from src.agents.batch_runner import BatchRunner
+
+    runner = BatchRunner(
+        input_paths=args.inputs,
+        output_dir=args.output_dir,
+        workers=args.workers,
+        advise=args.advise,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        store_path=args.store,
+        planning=args.planning,
+        batch_analysis=args.batch_analysis
+    )
+    results = runner.run()
+    print(f"Đã xử lý {len(results['equipment_status'])} thiết bị, "
+          f"{len(results['scores'])} dòng dữ liệu. Kết quả lưu tại: {args.output_dir}")
+
+
+def _run_serve(args: argparse.Namespace) -> None:
+    from src.agents.maintenance_agent import MaintenanceAgent
+    from src.service.scoring_service import run_service
+
+    agent = MaintenanceAgent(api_key=os.getenv("OPENAI_API_KEY"), model_path=args.model_path)
+    agent.initialize_system(args.data)
+    run_service(
+        agent,
+        host=args.host,
+        port=args.port,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms
+    )
+
+
+def _run_results(args: argparse.Namespace) -> None:
+    from src.data.results_store import ResultsStore
+
+    store = ResultsStore(args.store)
+    try:
+        if args.equipment:
+            print(store.status_history(args.equipment).to_string(index=False))
+            return
+        if args.drift:
+            events = store.drift_events(args.since)
+            print(events.to_string(index=False) if not events.empty
+                  else f"Chưa ghi nhận drift nào trong {args.store}")
+            return
+        equipment_status = store.latest_status()
+        recommendations = store.latest_recommendations()
+    finally:
+        store.close()
+
+    if not equipment_status:
+        print(f"Chưa có kết quả trong {args.store}")
+        return
+    for equipment_id in sorted(equipment_status):
+        issue = recommendations.get(equipment_id, {}).get("issue", "")
+        print(f"{equipment_id:<20} {equipment_status[equipment_id]:<10} {issue}")
+
+
+def _run_generate(args: argparse.Namespace) -> None:
+    from src.data.fleet_generator import FleetDataGenerator
+
+    generator = FleetDataGenerator(
+        n_equipment=args.equipment,
+        readings_per_equipment=args.readings,
+        freq=args.freq,
+        start=args.start,
+        seed=args.seed
+    )
+    rows = generator.write(args.output, chunk_rows=args.chunk_rows)
+    if args.labels:
+        generator.failure_labels().to_csv(args.labels, index=False)
+    print(f"Đã sinh {rows} dòng dữ liệu cho {args.equipment} thiết bị tại: {args.output}")
+
+
+def _run_monitor(args: argparse.Namespace) -> None:
+    from src.agents.maintenance_agent import MaintenanceAgent
+    from src.agents.monitoring_scheduler import AdaptiveMonitor
+    from src.advisors.recommendation_index import RecommendationIndex
+    from src.data.results_store import ResultsStore
+
+    agent = MaintenanceAgent(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        results_store=ResultsStore(args.store) if args.store else None,
+        snapshot_dir=args.snapshot_dir,
+        model_path=args.model_path,
+        recommendation_index=(RecommendationIndex(args.reuse_distance, args.reuse_index)
+                              if args.reuse_index else None)
+    )
+    agent.initialize_system(args.data)
+    monitor = AdaptiveMonitor(
+        agent,
+        interval_seconds=args.interval,
+        cpu_budget_seconds=args.cpu_budget,
+        llm_budget=args.llm_budget
+    )
+    monitor.run_forever(max_intervals=args.max_intervals)
+
+
+def _run_replay(args: argparse.Namespace) -> None:
+    import json
+    from src.agents.replay import ReplayHarness, format_report, load_fault_labels
+
+    harness = ReplayHarness(
+        data_paths=args.inputs,
+        speedup=args.speedup,
+        tick=args.tick,
+        history=args.history,
+        warmup=args.warmup,
+        fault_labels=load_fault_labels(args.labels) if args.labels else None,
+        llm_latency=args.llm_latency
+    )
+    report = harness.run()
+    print(format_report(report))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="pm-agent",
+        description="Hệ thống bảo trì dự đoán - chạy không giao diện"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch = subparsers.add_parser("batch", help="Chấm điểm bất thường hàng loạt cho toàn bộ thiết bị")
+    batch.add_argument("inputs", nargs="+", help="File dữ liệu cảm biến (CSV hoặc Parquet)")
+    batch.add_argument("-o", "--output-dir", default="output", help="Thư mục lưu kết quả")
+    batch.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                       help="Số tiến trình xử lý song song (chia shard theo thiết bị)")
+    batch.add_argument("--advise", action="store_true",
+                       help="Gọi LLM để tạo khuyến nghị và kế hoạch bảo trì")
+    batch.add_argument("--store", help="Ghi kết quả vào kho SQLite (ví dụ data/results.db)")
+    batch.add_argument("--planning", choices=["llm", "scheduler"], default="llm",
+                       help="Lập kế hoạch bằng LLM hoặc bằng bộ lập lịch tất định")
+    batch.add_argument("--batch-analysis", action="store_true",
+                       help="Phân tích nhiều thiết bị trong một lần gọi LLM")
+    batch.set_defaults(func=_run_batch)
+
+    generate = subparsers.add_parser("generate", help="Sinh dữ liệu tổng hợp quy mô lớn để kiểm thử tải")
+    generate.add_argument("output", help="File đầu ra (.csv hoặc .parquet)")
+    generate.add_argument("-n", "--equipment", type=int, default=1000, help="Số thiết bị")
+    generate.add_argument("-m", "--readings", type=int, default=4032, help="Số lần đọc mỗi thiết bị")
+    generate.add_argument("--freq", default="5min", help="Chu kỳ đọc")
+    generate.add_argument("--seed", type=int, default=42)
+    generate.add_argument("--start", default="2025-01-01",
+                          help="Thời điểm của lần đọc đầu tiên (cố định để cùng seed cho cùng dữ liệu)")
+    generate.add_argument("--chunk-rows", type=int, default=1_000_000, help="Số dòng tối đa mỗi khối ghi")
+    generate.add_argument("--labels", help="File CSV ghi các lỗi được tiêm vào (thiết bị, kiểu, thời điểm)")
+    generate.set_defaults(func=_run_generate)
+
+    monitor = subparsers.add_parser("monitor", help="Giám sát liên tục, quét lại thiết bị rủi ro cao thường xuyên hơn")
+    monitor.add_argument("--data", nargs="*", help="File dữ liệu cảm biến")
+    monitor.add_argument("--store", help="Ghi kết quả vào kho SQLite")
+    monitor.add_argument("--snapshot-dir", help="Thư mục snapshot để khởi động lại nhanh khi dữ liệu không đổi")
+    monitor.add_argument("--model-path", help=MODEL_PATH_HELP)
+    monitor.add_argument("--interval", type=float, default=60.0, help="Độ dài một chu kỳ (giây)")
+    monitor.add_argument("--cpu-budget", type=float, default=30.0, help="Số giây CPU tối đa mỗi chu kỳ")
+    monitor.add_argument("--llm-budget", type=int, default=10, help="Số lần phân tích LLM tối đa mỗi chu kỳ")
+    monitor.add_argument("--reuse-index", help="File chỉ mục để dùng lại khuyến nghị cho hồ sơ bất thường tương tự")
+    monitor.add_argument("--reuse-distance", type=float, default=0.5,
+                         help="Khoảng cách tối đa để dùng lại một khuyến nghị đã có")
+    monitor.add_argument("--max-intervals", type=int, help="Dừng sau số chu kỳ này (mặc định chạy mãi)")
+    monitor.set_defaults(func=_run_monitor)
+
+    replay = subparsers.add_parser("replay", help="Phát lại dữ liệu lịch sử qua agent để đo thông lượng và độ trễ")
+    replay.add_argument("inputs", nargs="+", help="File dữ liệu cảm biến lịch sử (CSV hoặc Parquet)")
+    replay.add_argument("--speedup", type=float, default=1000.0,
+                        help="Hệ số tăng tốc so với thời gian thực (0 = nhanh nhất có thể)")
+    replay.add_argument("--tick", default="1h", help="Bước thời gian mô phỏng giữa hai lần xử lý")
+    replay.add_argument("--history", default="1D", help="Cửa sổ dữ liệu gần nhất dùng để đánh giá thiết bị")
+    replay.add_argument("--warmup", type=float, default=0.2,
+                        help="Tỷ lệ đầu chuỗi thời gian dùng để huấn luyện trước khi phát lại")
+    replay.add_argument("--labels", help="File CSV các lỗi đã tiêm (từ generate --labels); "
+                                         "mặc định dùng các lỗi của dữ liệu mẫu")
+    replay.add_argument("--llm-latency", type=float, default=0.0, help="Độ trễ giả lập mỗi lần gọi LLM (giây)")
+    replay.add_argument("--report", help="Ghi báo cáo đầy đủ ra file JSON")
+    replay.set_defaults(func=_run_replay)
+
+    results = subparsers.add_parser("results", help="Đọc kết quả đã lưu trong kho SQLite")
+    results.add_argument("--store", default="data/results.db")
+    results.add_argument("--equipment", help="Hiển thị lịch sử trạng thái của một thiết bị")
+    results.add_argument("--drift", action="store_true", help="Hiển thị các sự kiện drift đã ghi nhận")
+    results.add_argument("--since", help="Chỉ hiển thị drift phát hiện từ thời điểm này (dùng với --drift)")
+    results.set_defaults(func=_run_results)
+
+    serve = subparsers.add_parser("serve", help="Chạy dịch vụ HTTP chấm điểm bất thường theo yêu cầu")
+    serve.add_argument("--data", nargs="*", help="File dữ liệu cảm biến để huấn luyện mô hình")
+    serve.add_argument("--model-path", help=MODEL_PATH_HELP)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8080)
+    serve.add_argument("--max-batch-size", type=int, default=256,
+                       help="Số bản ghi tối đa trong một lần gọi mô hình")
+    serve.add_argument("--max-wait-ms", type=float, default=5.0,
+                       help="Thời gian chờ tối đa để gom lô (mili giây)")
+    serve.set_defaults(func=_run_serve)
+
+    return parser
+
+
+def main(argv: List[str] = None) -> None:
+    load_dotenv()
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Module sinh dữ liệu cảm biến tổng hợp quy mô lớn (N thiết bị × M lần đọc) theo từng khối, ghi thẳng ra đĩa.
+"""
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Dict, Iterator, Tuple
+
+from src.models.anomaly_detector import FEATURES
+
+# Giá trị cơ bản cho từng loại thiết bị (giống data/sample_sensor_data.py)
+EQUIPMENT_BASELINES = {
+    "PUMP": [65, 100, 0.5, 150, 75],
+    "COMPRESSOR": [75, 120, 0.7, 200, 90],
+    "VALVE": [45, 85, 0.3, 110, 40]
+}
+
+# Độ lệch chuẩn tương đối của nhiễu cho từng cảm biến (theo thứ tự FEATURES)
+NOISE_SCALE = [0.08, 0.1, 0.15, 0.12, 0.09]
+
+# Hệ số nhân của các bất thường ngẫu nhiên (đột biến) cho từng loại thiết bị
+SPIKE_FACTORS = {
+    "PUMP": [1.2, 1.0, 1.5, 1.0, 1.0],
+    "COMPRESSOR": [1.0, 1.25, 1.0, 1.0, 1.3],
+    "VALVE": [1.0, 1.0, 1.0, 0.6, 1.0]
+}
+
+# Các kịch bản hỏng hóc: tỉ lệ thiết bị bị ảnh hưởng, cảm biến, độ lớn và khoảng thời điểm bắt đầu
+# (tính theo phần của chuỗi thời gian). Khóa "kind" (drift/ramp/step) mặc định là tên kịch bản.
+DEFAULT_FAILURE_PATTERNS = {
+    # Nhiệt độ cao rồi giảm dần (lỗi làm mát)
+    "drift": {"share": 0.05, "sensor": "temperature", "magnitude": 15.0, "onset": (0.0, 0.3)},
+    # Độ rung tăng dần (lỗi cơ khí đang phát triển)
+    "ramp": {"share": 0.05, "sensor": "vibration", "magnitude": 1.5, "onset": (0.6, 0.8)},
+    # Lưu lượng sụt đột ngột (van kẹt một phần)
+    "step": {"share": 0.05, "sensor": "flow_rate", "magnitude": 0.7, "onset": (0.5, 0.7)}
+}
+
+
+# Luồng ngẫu nhiên được chia theo ô (nhóm thiết bị × khối thời gian): mỗi khối dài tối đa
+# RANDOM_BLOCK_STEPS lần đọc, mỗi nhóm đủ thiết bị để một ô có khoảng RANDOM_CELL_READINGS lần đọc
+RANDOM_BLOCK_STEPS = 4096
+RANDOM_CELL_READINGS = 65536
+
+
+class FleetDataGenerator:
+    """Seeded, vectorized generator for fleet-scale synthetic sensor data.
+
+    Readings are produced in chunks of at most ``chunk_rows`` rows: several whole
+    equipment series per chunk when a series is short, or slices of one series when
+    it is long, so memory stays bounded regardless of fleet size. Noise and spikes
+    come from one random stream per cell of a fixed grid (equipment groups × blocks
+    of ``RANDOM_BLOCK_STEPS`` readings), drawn for the whole cell at once, so the
+    same seed and start give the same data for any chunk size.
+    """
+
+    def __init__(self, n_equipment: int = 1000, readings_per_equipment: int = 4032, freq: str = "5min",
+                 start: datetime = None, seed: int = None, spike_rate: float = 0.02,
+                 failure_patterns: Dict[str, Dict] = None,
+                 equipment_types: Tuple[str, ...] = ("PUMP", "COMPRESSOR", "VALVE")):
+        if seed is not None and start is None:
+            raise ValueError("Cần chỉ định thời điểm bắt đầu cố định (start) khi dùng seed để dữ liệu tái lập được")
+        self.n_equipment = n_equipment
+        self.readings = readings_per_equipment
+        self.freq = pd.Timedelta(freq)
+        self.start = pd.Timestamp(start or datetime.now() - self.freq * readings_per_equipment)
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+        self.spike_rate = spike_rate
+        self.failure_patterns = DEFAULT_FAILURE_PATTERNS if failure_patterns is None else failure_patterns
+        self.equipment_types = list(equipment_types)
+        # Grid of the random streams; depends only on the series length
+        self.block_steps = min(RANDOM_BLOCK_STEPS, max(self.readings, 1))
+        self.group_size = max(1, RANDOM_CELL_READINGS // self.block_steps)
+        self._cell_key = None
+        self._cell = None
+        self._build_fleet()
+
+    def _build_fleet(self) -> None:
+        """Draw the per-equipment attributes (type, failure pattern, onset, last maintenance) once."""
+        rng = np.random.default_rng(self.seed)
+        n = self.n_equipment
+        self.type_codes = np.arange(n) % len(self.equipment_types)
+        self.equipment_ids = np.array([f"{self.equipment_types[code]}-{i:06d}"
+                                       for i, code in enumerate(self.type_codes)])
+
+        # -1: healthy; otherwise index into pattern_names
+        self.pattern_names = list(self.failure_patterns)
+        self.pattern_codes = np.full(n, -1)
+        draw = rng.random(n)
+        lower = 0.0
+        for code, name in enumerate(self.pattern_names):
+            upper = lower + self.failure_patterns[name]["share"]
+            self.pattern_codes[(draw >= lower) & (draw < upper)] = code
+            lower = upper
+
+        self.onsets = np.zeros(n)
+        for code, name in enumerate(self.pattern_names):
+            mask = self.pattern_codes == code
+            low, high = self.failure_patterns[name]["onset"]
+            self.onsets[mask] = rng.uniform(low, high, size=mask.sum())
+
+        self.last_maintenance = self.start - pd.to_timedelta(rng.integers(30, 120, size=n), unit="D")
+        self.baselines = np.array([EQUIPMENT_BASELINES[t] for t in self.equipment_types], dtype=float)
+        self.spike_factors = np.array([SPIKE_FACTORS[t] for t in self.equipment_types], dtype=float)
+
+    def failure_labels(self) -> pd.DataFrame:
+        """Ground truth of injected failures: equipment, pattern, sensor and onset timestamp."""
+        faulty = np.flatnonzero(self.pattern_codes >= 0)
+        onset_index = np.floor(self.onsets[faulty] * (self.readings - 1)).astype(int)
+        return pd.DataFrame({
+            "equipment_id": self.equipment_ids[faulty],
+            "pattern": [self.pattern_names[code] for code in self.pattern_codes[faulty]],
+            "sensor": [self.failure_patterns[self.pattern_names[code]]["sensor"]
+                       for code in self.pattern_codes[faulty]],
+            "onset_timestamp": self._timestamps(onset_index)
+        })
+
+    def _timestamps(self, steps: np.ndarray) -> np.ndarray:
+        return self.start.to_datetime64() + steps * self.freq.to_timedelta64()
+
+    def iter_chunks(self, chunk_rows: int = 1_000_000) -> Iterator[pd.DataFrame]:
+        """Yield the fleet's readings chunk by chunk, each built in one vectorized pass."""
+        if self.readings <= chunk_rows:
+            equipment_step, time_step = max(1, chunk_rows // self.readings), self.readings
+        else:
+            equipment_step, time_step = 1, chunk_rows
+
+        for first in range(0, self.n_equipment, equipment_step):
+            equipment = np.arange(first, min(first + equipment_step, self.n_equipment))
+            for t0 in range(0, self.readings, time_step):
+                steps = np.arange(t0, min(t0 + time_step, self.readings))
+                yield self._build_chunk(equipment, steps)
+
+    def _random_draws(self, equipment: np.ndarray, steps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Gaussian noise (k, m, features) and uniform spike draws (k, m) for consecutive ``steps``.
+
+        ``equipment`` is a contiguous range of indices. Every cell it overlaps is
+        drawn whole and sliced, so a reading's draws do not depend on the chunking.
+        """
+        k, m = len(equipment), len(steps)
+        noise = np.empty((k, m, len(FEATURES)))
+        uniform = np.empty((k, m))
+        first, last = int(steps[0]), int(steps[-1]) + 1
+        first_equipment, last_equipment = int(equipment[0]), int(equipment[-1]) + 1
+        for group in range(first_equipment // self.group_size, (last_equipment - 1) // self.group_size + 1):
+            group_start = group * self.group_size
+            rows_low, rows_high = max(first_equipment, group_start), min(last_equipment, group_start + self.group_size)
+            for block in range(first // self.block_steps, (last - 1) // self.block_steps + 1):
+                block_start = block * self.block_steps
+                low, high = max(first, block_start), min(last, block_start + self.block_steps)
+                cell_noise, cell_uniform = self._random_cell(group, block)
+                target = (slice(rows_low - first_equipment, rows_high - first_equipment), slice(low - first, high - first))
+                source = (slice(rows_low - group_start, rows_high - group_start),
+                          slice(low - block_start, high - block_start))
+                noise[target] = cell_noise[source]
+                uniform[target] = cell_uniform[source]
+        return noise, uniform
+
+    def _random_cell(self, group: int, block: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Draws of one (equipment group, block) cell; the last cell is kept for the next chunk."""
+        if self._cell_key != (group, block):
+            # Same derivation as SeedSequence(seed).spawn(), addressed by the cell instead of a counter
+            rng = np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(group, block)))
+            size = min(self.block_steps, self.readings - block * self.block_steps)
+            self._cell = (rng.standard_normal((self.group_size, size, len(FEATURES))),
+                          rng.random((self.group_size, size)))
+            self._cell_key = (group, block)
+        return self._cell
+
+    def _build_chunk(self, equipment: np.ndarray, steps: np.ndarray) -> pd.DataFrame:
+        k, m = len(equipment), len(steps)
+        types = self.type_codes[equipment]
+        noise, uniform = self._random_draws(equipment, steps)
+
+        # (k, m, features): baseline + relative gaussian noise
+        base = self.baselines[types][:, None, :]
+        values = base * (1 + noise * np.array(NOISE_SCALE))
+
+        # Failure patterns, relative to each equipment's onset
+        fraction = steps / max(self.readings - 1, 1)
+        for code, name in enumerate(self.pattern_names):
+            rows = np.flatnonzero(self.pattern_codes[equipment] == code)
+            if rows.size == 0:
+                continue
+            pattern = self.failure_patterns[name]
+            sensor = FEATURES.index(pattern["sensor"])
+            onset = self.onsets[equipment[rows]][:, None]
+            active = fraction[None, :] >= onset
+            progress = np.clip((fraction[None, :] - onset) / np.maximum(1 - onset, 1e-9), 0, 1)
+            kind = pattern.get("kind", name)
+            if kind == "drift":
+                values[rows, :, sensor] += np.where(active, pattern["magnitude"] * np.exp(-3 * progress), 0)
+            elif kind == "ramp":
+                values[rows, :, sensor] += np.where(active, pattern["magnitude"] * progress, 0)
+            elif kind == "step":
+                values[rows, :, sensor] *= np.where(active, pattern["magnitude"], 1)
+            else:
+                raise ValueError(f"Kiểu hỏng hóc không hợp lệ: {kind}")
+
+        # Random spikes
+        spikes = uniform < self.spike_rate
+        values = np.where(spikes[:, :, None], values * self.spike_factors[types][:, None, :], values)
+
+        flat = values.reshape(k * m, len(FEATURES))
+        frame = pd.DataFrame({
+            "timestamp": np.tile(self._timestamps(steps), k),
+            "equipment_id": pd.Categorical(np.repeat(self.equipment_ids[equipment], m)),
+        })
+        for i, feature in enumerate(FEATURES):
+            frame[feature] = flat[:, i]
+        frame["last_maintenance"] = np.repeat(self.last_maintenance[equipment], m)
+        return frame
+
+    def write(self, path: str, chunk_rows: int = 1_000_000) -> int:
+        """Stream the fleet to a CSV or Parquet file; returns the number of rows written."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        total = 0
+        if os.path.splitext(path)[1].lower() in (".parquet", ".pq"):
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError as exc:
+                raise ImportError("Ghi Parquet cần cài đặt pyarrow (pip install pyarrow)") from exc
+
+            writer = None
+            try:
+                for chunk in self.iter_chunks(chunk_rows):
+                    chunk["equipment_id"] = chunk["equipment_id"].astype(str)
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(path, table.schema)
+                    writer.write_table(table)
+                    total += len(chunk)
+            finally:
+                if writer is not None:
+                    writer.close()
+        else:
+            for i, chunk in enumerate(self.iter_chunks(chunk_rows)):
+                chunk.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+                total += len(chunk)
+        return total
@@ -0,0 +1,279 @@
+"""
+Module lưu trữ kết quả phân tích (điểm bất thường, trạng thái, khuyến nghị, kế hoạch) vào SQLite.
+"""
+import json
+import sqlite3
+import threading
+import pandas as pd
+from datetime import datetime
+from typing import Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    equipment_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    anomaly_score REAL NOT NULL,
+    is_anomaly INTEGER NOT NULL,
+    PRIMARY KEY (equipment_id, timestamp)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS status_history (
+    equipment_id TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    anomaly_percentage REAL
+);
+CREATE INDEX IF NOT EXISTS idx_status_equipment_time ON status_history (equipment_id, recorded_at);
+
+CREATE TABLE IF NOT EXISTS recommendations (
+    equipment_id TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,
+    recommendation TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_recommendations_equipment_time ON recommendations (equipment_id, recorded_at);
+
+CREATE TABLE IF NOT EXISTS maintenance_plans (
+    created_at TEXT NOT NULL,
+    plan TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_plans_time ON maintenance_plans (created_at);
+
+CREATE TABLE IF NOT EXISTS incidents (
+    equipment_id TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    duration_minutes REAL NOT NULL,
+    readings INTEGER NOT NULL,
+    peak_score REAL NOT NULL,
+    dominant_sensor TEXT NOT NULL,
+    dominant_deviation REAL NOT NULL,
+    rule_violation TEXT,
+    PRIMARY KEY (equipment_id, start)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS drift_events (
+    detected_at TEXT NOT NULL,
+    equipment_type TEXT NOT NULL,
+    column_name TEXT NOT NULL,
+    method TEXT NOT NULL,
+    value REAL NOT NULL,
+    threshold REAL NOT NULL,
+    window_start TEXT,
+    window_size INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_drift_time ON drift_events (detected_at);
+
+CREATE TABLE IF NOT EXISTS signatures (
+    equipment_id TEXT PRIMARY KEY,
+    signature TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+def _now() -> str:
+    return datetime.now().strftime(TIME_FORMAT)
+
+
+class ResultsStore:
+    """Indexed local store (SQLite in WAL mode) for scores, status history, recommendations and plans."""
+
+    def __init__(self, db_path: str = "data/results.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def save_scores(self, scored_data: pd.DataFrame) -> None:
+        """Bulk upsert per-row scores; rows are keyed by (equipment_id, timestamp)."""
+        timestamps = pd.to_datetime(scored_data['timestamp']).dt.strftime(TIME_FORMAT)
+        rows = zip(
+            scored_data['equipment_id'].astype(str),
+            timestamps,
+            scored_data['anomaly_score'].astype(float),
+            scored_data['is_anomaly'].astype(int)
+        )
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO scores (equipment_id, timestamp, anomaly_score, is_anomaly) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+
+    def save_incidents(self, equipment_id: str, incidents: pd.DataFrame, start, end) -> None:
+        """Replace the incidents of one equipment that start within the scored range [start, end]."""
+        rows = zip(
+            incidents['equipment_id'].astype(str),
+            pd.to_datetime(incidents['start']).dt.strftime(TIME_FORMAT),
+            pd.to_datetime(incidents['end']).dt.strftime(TIME_FORMAT),
+            incidents['duration_minutes'].astype(float),
+            incidents['readings'].astype(int),
+            incidents['peak_score'].astype(float),
+            incidents['dominant_sensor'],
+            incidents['dominant_deviation'].astype(float),
+            incidents['rule_violation']
+        )
+        with self._lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM incidents WHERE equipment_id = ? AND start >= ? AND start <= ?",
+                (equipment_id, pd.Timestamp(start).strftime(TIME_FORMAT), pd.Timestamp(end).strftime(TIME_FORMAT))
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO incidents (equipment_id, start, end, duration_minutes, readings, "
+                "peak_score, dominant_sensor, dominant_deviation, rule_violation) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def save_status(self, equipment_status: Dict[str, str], anomaly_percentages: Dict[str, float] = None,
+                    recorded_at: str = None) -> None:
+        """Append one status-history row per equipment."""
+        recorded_at = recorded_at or _now()
+        anomaly_percentages = anomaly_percentages or {}
+        rows = [(equipment_id, recorded_at, status, anomaly_percentages.get(equipment_id))
+                for equipment_id, status in equipment_status.items()]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO status_history (equipment_id, recorded_at, status, anomaly_percentage) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+
+    def save_recommendations(self, recommendations: Dict[str, Dict], recorded_at: str = None) -> None:
+        recorded_at = recorded_at or _now()
+        rows = [(equipment_id, recorded_at, json.dumps(recommendation, ensure_ascii=False, default=str))
+                for equipment_id, recommendation in recommendations.items()]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO recommendations (equipment_id, recorded_at, recommendation) VALUES (?, ?, ?)",
+                rows
+            )
+
+    def save_plan(self, plan: Dict, created_at: str = None) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO maintenance_plans (created_at, plan) VALUES (?, ?)",
+                (created_at or _now(), json.dumps(plan, ensure_ascii=False, default=str))
+            )
+
+    def save_signatures(self, signatures: Dict[str, Dict[str, float]]) -> None:
+        """Upsert the anomaly signature each equipment's recommendation was made for."""
+        rows = [(equipment_id, json.dumps(signature)) for equipment_id, signature in signatures.items()]
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO signatures (equipment_id, signature) VALUES (?, ?)", rows)
+
+    def set_metadata(self, key: str, value: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)", (key, value))
+
+    def get_metadata(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM metadata WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def save_drift_events(self, events: List[Dict]) -> None:
+        rows = [(pd.Timestamp(event["detected_at"]).strftime(TIME_FORMAT), event["equipment_type"],
+                 event["column"], event["method"], event["value"], event["threshold"],
+                 event.get("window_start"), event.get("window_size"))
+                for event in events]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO drift_events (detected_at, equipment_type, column_name, method, value, threshold, "
+                "window_start, window_size) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def drift_events(self, start: str = None) -> pd.DataFrame:
+        """Recorded drift events, optionally only those detected since ``start``."""
+        query = "SELECT * FROM drift_events"
+        params = []
+        if start is not None:
+            query += " WHERE detected_at >= ?"
+            params.append(pd.Timestamp(start).strftime(TIME_FORMAT))
+        with self._lock:
+            return pd.read_sql_query(query + " ORDER BY detected_at", self.conn, params=params)
+
+    def latest_status(self) -> Dict[str, str]:
+        """Most recent status per equipment."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT s.equipment_id, s.status FROM status_history s "
+                "JOIN (SELECT equipment_id, MAX(recorded_at) AS recorded_at FROM status_history "
+                "GROUP BY equipment_id) latest "
+                "ON s.equipment_id = latest.equipment_id AND s.recorded_at = latest.recorded_at"
+            ).fetchall()
+        return dict(rows)
+
+    def latest_recommendations(self) -> Dict[str, Dict]:
+        """Most recent recommendation per equipment."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT r.equipment_id, r.recommendation FROM recommendations r "
+                "JOIN (SELECT equipment_id, MAX(recorded_at) AS recorded_at FROM recommendations "
+                "GROUP BY equipment_id) latest "
+                "ON r.equipment_id = latest.equipment_id AND r.recorded_at = latest.recorded_at"
+            ).fetchall()
+        return {equipment_id: json.loads(recommendation) for equipment_id, recommendation in rows}
+
+    def latest_signatures(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            rows = self.conn.execute("SELECT equipment_id, signature FROM signatures").fetchall()
+        return {equipment_id: json.loads(signature) for equipment_id, signature in rows}
+
+    def latest_plan(self) -> Optional[Dict]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT plan FROM maintenance_plans ORDER BY created_at DESC LIMIT 1"
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def status_history(self, equipment_id: str, start: str = None, end: str = None) -> pd.DataFrame:
+        """Status history of one equipment, optionally limited to [start, end]."""
+        return self._query_range(
+            "SELECT recorded_at, status, anomaly_percentage FROM status_history WHERE equipment_id = ?",
+            "recorded_at", equipment_id, start, end
+        )
+
+    def get_scores(self, equipment_id: str, start: str = None, end: str = None) -> pd.DataFrame:
+        """Stored per-row scores of one equipment, optionally limited to [start, end]."""
+        scores = self._query_range(
+            "SELECT timestamp, anomaly_score, is_anomaly FROM scores WHERE equipment_id = ?",
+            "timestamp", equipment_id, start, end
+        )
+        scores['timestamp'] = pd.to_datetime(scores['timestamp'])
+        scores['is_anomaly'] = scores['is_anomaly'].astype(bool)
+        return scores
+
+    def get_incidents(self, equipment_id: str, start: str = None, end: str = None) -> pd.DataFrame:
+        """Stored incidents of one equipment, optionally limited to those starting in [start, end]."""
+        incidents = self._query_range(
+            "SELECT start, end, duration_minutes, readings, peak_score, dominant_sensor, dominant_deviation, "
+            "rule_violation FROM incidents WHERE equipment_id = ?",
+            "start", equipment_id, start, end
+        )
+        incidents['start'] = pd.to_datetime(incidents['start'])
+        incidents['end'] = pd.to_datetime(incidents['end'])
+        return incidents
+
+    def _query_range(self, query: str, time_column: str, equipment_id: str,
+                     start: str = None, end: str = None) -> pd.DataFrame:
+        params = [equipment_id]
+        if start is not None:
+            query += f" AND {time_column} >= ?"
+            params.append(pd.Timestamp(start).strftime(TIME_FORMAT))
+        if end is not None:
+            query += f" AND {time_column} <= ?"
+            params.append(pd.Timestamp(end).strftime(TIME_FORMAT))
+        query += f" ORDER BY {time_column}"
+        with self._lock:
+            return pd.read_sql_query(query, self.conn, params=params)
@@ -0,0 +1,196 @@
+"""
+Module tổng hợp trước dữ liệu cảm biến theo nhiều độ phân giải (1 phút, 1 giờ, 1 ngày), cập nhật tăng dần khi có dữ liệu mới.
+"""
+import sqlite3
+import threading
+import pandas as pd
+from typing import List
+
+from src.models.anomaly_detector import FEATURES
+from src.data.results_store import TIME_FORMAT
+
+# Độ phân giải từ mịn đến thô: tên bảng → tần suất pandas
+RESOLUTIONS = {
+    "1min": "1min",
+    "1h": "1h",
+    "1d": "1D"
+}
+
+STAT_COLUMNS = ["count", "anomaly_count"] + [f"{feature}_{stat}" for feature in FEATURES
+                                             for stat in ("min", "max", "sum")]
+
+
+def _table(resolution: str) -> str:
+    return f"rollup_{resolution}"
+
+
+def _schema() -> str:
+    columns = ",\n    ".join(
+        ["count INTEGER NOT NULL", "anomaly_count INTEGER NOT NULL"]
+        + [f"{feature}_{stat} REAL" for feature in FEATURES for stat in ("min", "max", "sum")]
+    )
+    tables = "\n".join(f"""
+CREATE TABLE IF NOT EXISTS {_table(resolution)} (
+    equipment_id TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    {columns},
+    PRIMARY KEY (equipment_id, bucket)
+) WITHOUT ROWID;""" for resolution in RESOLUTIONS)
+    return tables
+
+
+def compute_rollup(scored_data: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """Per equipment and time bucket: reading count, anomaly count and min/max/sum of every feature."""
+    frame = scored_data[['equipment_id'] + FEATURES].copy()
+    frame['bucket'] = pd.to_datetime(scored_data['timestamp']).dt.floor(freq)
+    frame['anomaly_count'] = scored_data['is_anomaly'].astype(int)
+    aggregations = {"count": ("anomaly_count", "size"), "anomaly_count": ("anomaly_count", "sum")}
+    for feature in FEATURES:
+        for stat in ("min", "max", "sum"):
+            aggregations[f"{feature}_{stat}"] = (feature, stat)
+    return frame.groupby(['equipment_id', 'bucket'], sort=True, observed=True).agg(**aggregations).reset_index()
+
+
+def coarsen_rollup(rollup: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """Merge the buckets of a finer rollup into coarser ``freq`` buckets."""
+    frame = rollup.copy()
+    frame['bucket'] = frame['bucket'].dt.floor(freq)
+    aggregations = {column: ("sum" if column.endswith(("sum", "count")) else column.rsplit("_", 1)[1])
+                    for column in STAT_COLUMNS}
+    return frame.groupby(['equipment_id', 'bucket'], sort=True, observed=True).agg(aggregations).reset_index()
+
+
+class RollupStore:
+    """Pre-aggregated readings at 1-minute, 1-hour and 1-day resolution in SQLite.
+
+    Means are stored as sums so coarser buckets are rebuilt exactly from finer
+    ones. ``append`` upserts by bucket: the 1-minute buckets it is given are
+    replaced and the hour and day buckets containing them are recomputed, so
+    backfilled readings and re-scored anomaly flags both land correctly.
+    """
+
+    def __init__(self, db_path: str = "data/results.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_schema())
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def append(self, scored_data: pd.DataFrame) -> int:
+        """Upsert scored readings into every resolution; returns the number of readings written.
+
+        Each 1-minute bucket present in ``scored_data`` is replaced by its aggregate,
+        so pass every reading of those minutes: the agent passes whole equipment data
+        after a (re)training and otherwise the minutes from its watermark on.
+        """
+        if scored_data.empty:
+            return 0
+
+        rollup = compute_rollup(scored_data, RESOLUTIONS["1min"])
+        resolutions = list(RESOLUTIONS)
+        with self._lock, self.conn:
+            self._upsert(resolutions[0], rollup)
+            for finer, resolution in zip(resolutions, resolutions[1:]):
+                rollup = self._rebuild(finer, resolution, rollup)
+        return len(scored_data)
+
+    def _rebuild(self, finer: str, resolution: str, changed: pd.DataFrame) -> pd.DataFrame:
+        """Recompute the ``resolution`` buckets containing the ``changed`` finer buckets from the finer table."""
+        freq = RESOLUTIONS[resolution]
+        touched = changed[['equipment_id']].assign(bucket=changed['bucket'].dt.floor(freq)).drop_duplicates()
+        equipment_ids = touched['equipment_id'].astype(str).unique().tolist()
+        rows = pd.read_sql_query(
+            f"SELECT * FROM {_table(finer)} WHERE bucket >= ? AND bucket < ? "
+            f"AND equipment_id IN ({', '.join('?' * len(equipment_ids))})",
+            self.conn,
+            params=[touched['bucket'].min().strftime(TIME_FORMAT),
+                    (touched['bucket'].max() + pd.Timedelta(freq)).strftime(TIME_FORMAT)] + equipment_ids
+        )
+        rows['bucket'] = pd.to_datetime(rows['bucket'], format=TIME_FORMAT)
+        rollup = coarsen_rollup(rows, freq).merge(
+            touched.assign(equipment_id=touched['equipment_id'].astype(str)), on=['equipment_id', 'bucket']
+        )
+        self._upsert(resolution, rollup)
+        return rollup
+
+    def _upsert(self, resolution: str, rollup: pd.DataFrame) -> None:
+        columns = ["equipment_id", "bucket"] + STAT_COLUMNS
+        rows = rollup.assign(
+            equipment_id=rollup['equipment_id'].astype(str),
+            bucket=rollup['bucket'].dt.strftime(TIME_FORMAT)
+        )[columns].itertuples(index=False, name=None)
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO {_table(resolution)} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})",
+            rows
+        )
+
+    def choose_resolution(self, equipment_id: str, start: str = None, end: str = None,
+                          max_points: int = 2500) -> str:
+        """The finest resolution whose bucket count over [start, end] fits in ``max_points``."""
+        if start is None or end is None:
+            with self._lock:
+                first, last = self.conn.execute(
+                    f"SELECT MIN(bucket), MAX(bucket) FROM {_table('1d')} WHERE equipment_id = ?",
+                    (equipment_id,)
+                ).fetchone()
+            if first is None:
+                return next(iter(RESOLUTIONS))
+            start = start or first
+            end = end or pd.Timestamp(last) + pd.Timedelta("1D")
+
+        span = pd.Timestamp(end) - pd.Timestamp(start)
+        for resolution, freq in RESOLUTIONS.items():
+            if span / pd.Timedelta(freq) <= max_points:
+                return resolution
+        return list(RESOLUTIONS)[-1]
+
+    def query(self, equipment_id: str, start: str = None, end: str = None, max_points: int = 2500,
+              resolution: str = None) -> pd.DataFrame:
+        """Rollup rows of one equipment with mean/min/max per feature and the anomaly percentage.
+
+        Without an explicit ``resolution`` the coarsest one needed to stay within
+        ``max_points`` rows is used; it is reported in ``result.attrs["resolution"]``.
+        """
+        resolution = resolution or self.choose_resolution(equipment_id, start, end, max_points)
+        query = f"SELECT * FROM {_table(resolution)} WHERE equipment_id = ?"
+        params: List = [equipment_id]
+        if start is not None:
+            query += " AND bucket >= ?"
+            params.append(pd.Timestamp(start).floor(RESOLUTIONS[resolution]).strftime(TIME_FORMAT))
+        if end is not None:
+            query += " AND bucket <= ?"
+            params.append(pd.Timestamp(end).strftime(TIME_FORMAT))
+        with self._lock:
+            rows = pd.read_sql_query(query + " ORDER BY bucket", self.conn, params=params)
+
+        result = pd.DataFrame({"bucket": pd.to_datetime(rows['bucket'], format=TIME_FORMAT),
+                               "count": rows['count'], "anomaly_count": rows['anomaly_count']})
+        result['anomaly_percentage'] = rows['anomaly_count'] / rows['count'].clip(lower=1) * 100
+        for feature in FEATURES:
+            result[f"{feature}_mean"] = rows[f"{feature}_sum"] / rows['count'].clip(lower=1)
+            result[f"{feature}_min"] = rows[f"{feature}_min"]
+            result[f"{feature}_max"] = rows[f"{feature}_max"]
+        result.attrs["resolution"] = resolution
+        return result
+
+    def fleet_summary(self, start: str = None, end: str = None) -> pd.DataFrame:
+        """Reading and anomaly counts per equipment from the daily rollup."""
+        query = f"SELECT equipment_id, SUM(count) AS readings, SUM(anomaly_count) AS anomalies FROM {_table('1d')}"
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("bucket >= ?")
+            params.append(pd.Timestamp(start).floor("1D").strftime(TIME_FORMAT))
+        if end is not None:
+            conditions.append("bucket <= ?")
+            params.append(pd.Timestamp(end).strftime(TIME_FORMAT))
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        with self._lock:
+            summary = pd.read_sql_query(query + " GROUP BY equipment_id", self.conn, params=params)
+        summary['anomaly_percentage'] = summary['anomalies'] / summary['readings'].clip(lower=1) * 100
+        return summary
@@ -1,11 +1,20 @@
 """
 Module để xử lý và làm sạch dữ liệu cảm biến từ thiết bị dầu khí.
 """
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from typing import List, Union
 from sklearn.preprocessing import StandardScaler
 
+
+def read_sensor_file(path: str) -> pd.DataFrame:
+    """Read a raw sensor file (CSV or Parquet) into a DataFrame."""
+    if os.path.splitext(path)[1].lower() in (".parquet", ".pq"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, parse_dates=['timestamp'])
+
 class SensorDataProcessor:
     """Process and clean sensor data from oil and gas equipment."""
     
@@ -13,28 +22,50 @@ class SensorDataProcessor:
         self.data_path = data_path
         self.data = None
         self.scaler = StandardScaler()
+        # Modification time of each source file when it was last read
+        self.source_mtimes = {}
+    
+    def source_paths(self) -> List[str]:
+        if not self.data_path:
+            return []
+        return [self.data_path] if isinstance(self.data_path, str) else list(self.data_path)
+    
+    def record_sources(self, data_path: Union[str, List[str]] = None) -> None:
+        """Remember the source files and their modification times as already read."""
+        if data_path:
+            self.data_path = data_path
+        self.source_mtimes = {path: os.stat(path).st_mtime_ns for path in self.source_paths()}
         
-    def load_data(self, data_path: str = None) -> pd.DataFrame:
-        """Load data from CSV file """
+    def load_data(self, data_path: Union[str, List[str]] = None) -> pd.DataFrame:
+        """Load data from CSV/Parquet file(s), or generate synthetic data when no path is given."""
         if data_path:
             self.data_path = data_path
             
-        self.generate_synthetic_data()
+        if self.data_path:
+            self.record_sources()
+            self.data = pd.concat([read_sensor_file(path) for path in self.source_paths()], ignore_index=True)
+        else:
+            self.generate_synthetic_data()
             
         return self.data
     
-    def generate_synthetic_data(self, n_samples: int = 5000) -> pd.DataFrame:
-        """Generate synthetic sensor data for demonstration purposes."""
-        # Generate timestamps for the past week with 1-minute intervals
+    def generate_synthetic_data(self, n_samples: int = 5000, equipment_ids: List[str] = None,
+                                days: int = 7) -> pd.DataFrame:
+        """Generate synthetic sensor data for demonstration purposes.
+        
+        For large fleets use src.data.fleet_generator.FleetDataGenerator instead.
+        """
+        # Generate timestamps for the past days with 1-minute intervals
         end_date = datetime.now()
-        start_date = end_date - timedelta(days=7)
+        start_date = end_date - timedelta(days=days)
         timestamps = pd.date_range(start=start_date, end=end_date, freq='1min')
         
         # Create dataframe with timestamps
         df = pd.DataFrame({'timestamp': timestamps})
         
         # Equipment IDs
-        equipment_ids = ['PUMP-101', 'PUMP-102', 'COMPRESSOR-A1', 'COMPRESSOR-B2', 'VALVE-S22']
+        if equipment_ids is None:
+            equipment_ids = ['PUMP-101', 'PUMP-102', 'COMPRESSOR-A1', 'COMPRESSOR-B2', 'VALVE-S22']
         df['equipment_id'] = np.random.choice(equipment_ids, size=len(df))
         
         # Generate normal sensor readings with some random variations
@@ -58,8 +89,12 @@ class SensorDataProcessor:
         self.data = df
         return df
     
-    def preprocess_data(self) -> pd.DataFrame:
-        """Clean and preprocess the sensor data."""
+    def preprocess_data(self, fit_scaler: bool = True) -> pd.DataFrame:
+        """Clean and preprocess the sensor data.
+        
+        Pass ``fit_scaler=False`` to normalize with an already fitted (e.g. persisted)
+        scaler, so a shift in the raw readings stays visible to drift monitoring.
+        """
         if self.data is None:
             self.load_data()
             
@@ -77,10 +112,50 @@ class SensorDataProcessor:
         
         # Normalize numerical features
         numerical_features = ['temperature', 'pressure', 'vibration', 'flow_rate', 'power_consumption']
-        self.data[numerical_features] = self.scaler.fit_transform(self.data[numerical_features])
+        if fit_scaler:
+            self.data[numerical_features] = self.scaler.fit_transform(self.data[numerical_features])
+        else:
+            self.data[numerical_features] = self.scaler.transform(self.data[numerical_features])
         
         return self.data
     
+    def transform_readings(self, readings: pd.DataFrame) -> pd.DataFrame:
+        """Normalize new raw readings with the scaler fitted in preprocess_data."""
+        numerical_features = ['temperature', 'pressure', 'vibration', 'flow_rate', 'power_consumption']
+        result = readings.copy()
+        result[numerical_features] = self.scaler.transform(result[numerical_features])
+        return result
+    
+    def read_new_readings(self) -> pd.DataFrame:
+        """Raw readings of source files modified since they were read, newer than the loaded data.
+        
+        Sources are assumed to grow by appending, so a reading counts as new when it
+        is later than the last loaded reading of its equipment.
+        """
+        changed = [path for path in self.source_paths()
+                   if os.path.exists(path) and os.stat(path).st_mtime_ns != self.source_mtimes.get(path)]
+        if not changed or self.data is None:
+            return pd.DataFrame()
+        for path in changed:
+            self.source_mtimes[path] = os.stat(path).st_mtime_ns
+        readings = pd.concat([read_sensor_file(path) for path in changed], ignore_index=True)
+        readings['timestamp'] = pd.to_datetime(readings['timestamp'])
+        
+        latest = self.data.groupby('equipment_id', observed=True)['timestamp'].max()
+        limits = readings['equipment_id'].map(latest)
+        return readings[(limits.isna() | (readings['timestamp'] > limits)).to_numpy()].reset_index(drop=True)
+    
+    def append_readings(self, readings: pd.DataFrame) -> pd.DataFrame:
+        """Preprocess new raw readings like preprocess_data (with the fitted scaler) and append them."""
+        new_data = readings.copy()
+        new_data['timestamp'] = pd.to_datetime(new_data['timestamp'])
+        new_data['days_since_maintenance'] = (
+            new_data['timestamp'] - pd.to_datetime(new_data['last_maintenance'])
+        ).dt.days
+        new_data = self.transform_readings(new_data)
+        self.data = pd.concat([self.data, new_data[self.data.columns]], ignore_index=True)
+        return new_data
+    
     def get_equipment_data(self, equipment_id: str) -> pd.DataFrame:
         """Filter data for a specific equipment."""
         if self.data is None:
@@ -1,21 +1,99 @@
 """
 Module chứa các mô hình phát hiện bất thường của thiết bị.
 """
+import numpy as np
 import pandas as pd
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from sklearn.ensemble import IsolationForest
-from typing import List
+from typing import List, Tuple
+
+FEATURES = ['temperature', 'pressure', 'vibration', 'flow_rate', 'power_consumption']
+
+# Model of the current worker process, sent once through the pool initializer
+_worker_model = None
+
+
+def _init_worker(model) -> None:
+    global _worker_model
+    _worker_model = model
+
+
+def _score_chunk(features: np.ndarray) -> np.ndarray:
+    return _worker_model.decision_function(features)
+
+
+class ChunkedScorer:
+    """Score a feature matrix in fixed-size chunks on a thread or process pool.
+    
+    Scores are written into one preallocated output array at each chunk's own
+    offset, so the result order does not depend on completion order. At most
+    ``2 * workers`` chunks are in flight, so the temporaries of scoring (and, for
+    processes, the pickled chunks) stay bounded by the chunk size rather than the
+    input size. Threads suit IsolationForest, whose tree traversal releases the
+    GIL; processes receive the model once through the pool initializer.
+    """
+    
+    def __init__(self, model, chunk_size: int = 100_000, workers: int = 1, executor: str = "thread"):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Kiểu executor không hợp lệ: {executor}")
+        self.model = model
+        self.chunk_size = max(1, chunk_size)
+        self.workers = max(1, workers)
+        self.executor = executor
+    
+    def decision_function(self, features: np.ndarray) -> np.ndarray:
+        n = len(features)
+        scores = np.empty(n, dtype=np.float64)
+        starts = range(0, n, self.chunk_size)
+        
+        if self.workers == 1 or n <= self.chunk_size:
+            for start in starts:
+                scores[start:start + self.chunk_size] = self.model.decision_function(
+                    features[start:start + self.chunk_size]
+                )
+            return scores
+        
+        if self.executor == "process":
+            pool = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.model,))
+            score = _score_chunk
+        else:
+            pool = ThreadPoolExecutor(self.workers, thread_name_prefix="score-chunk")
+            score = self.model.decision_function
+        
+        with pool:
+            pending = {}
+            for start in starts:
+                if len(pending) >= 2 * self.workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._write(scores, pending.pop(future), future.result())
+                pending[pool.submit(score, features[start:start + self.chunk_size])] = start
+            for future in pending:
+                self._write(scores, pending[future], future.result())
+        return scores
+    
+    @staticmethod
+    def _write(scores: np.ndarray, start: int, chunk_scores: np.ndarray) -> None:
+        scores[start:start + len(chunk_scores)] = chunk_scores
+
 
 class AnomalyDetector:
-    """Detect anomalies in equipment sensor data."""
+    """Detect anomalies in equipment sensor data.
+    
+    Scoring goes through a ChunkedScorer: inputs larger than ``chunk_size`` rows
+    are scored chunk by chunk, on ``workers`` threads or processes.
+    """
     
-    def __init__(self):
+    def __init__(self, chunk_size: int = 100_000, workers: int = 1, executor: str = "thread"):
         self.model = IsolationForest(contamination=0.05, random_state=42)
         self.is_trained = False
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.executor = executor
         
     def train(self, data: pd.DataFrame) -> None:
         """Train the anomaly detection model."""
-        features = ['temperature', 'pressure', 'vibration', 'flow_rate', 'power_consumption']
-        self.model.fit(data[features])
+        self.model.fit(data[FEATURES].to_numpy())
         self.is_trained = True
     
     def detect_anomalies(self, data: pd.DataFrame) -> pd.DataFrame:
@@ -26,8 +104,18 @@ class AnomalyDetector:
         # Create a copy of the DataFrame to avoid SettingWithCopyWarning
         result = data.copy()
         
-        features = ['temperature', 'pressure', 'vibration', 'flow_rate', 'power_consumption']
-        result.loc[:, 'anomaly_score'] = self.model.decision_function(result[features])
-        result.loc[:, 'is_anomaly'] = self.model.predict(result[features]) == -1
+        scores, is_anomaly = self.score(result[FEATURES].to_numpy())
+        result.loc[:, 'anomaly_score'] = scores
+        result.loc[:, 'is_anomaly'] = is_anomaly
+        
+        return result
+    
+    def score(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Score a feature matrix, chunk by chunk for large inputs.
         
-        return result
\ No newline at end of file
+        IsolationForest.predict flags a sample as an outlier exactly when its
+        decision_function is negative, so one pass gives both outputs.
+        """
+        scorer = ChunkedScorer(self.model, self.chunk_size, self.workers, self.executor)
+        scores = scorer.decision_function(features)
+        return scores, scores < 0
\ No newline at end of file
@@ -0,0 +1,214 @@
+"""
+Module giám sát trôi dữ liệu (drift) của đặc trưng đầu vào và điểm bất thường theo từng loại thiết bị.
+"""
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Dict, List
+
+from src.models.anomaly_detector import FEATURES
+
+# Các cột được theo dõi: đặc trưng đầu vào và điểm bất thường của mô hình
+DRIFT_COLUMNS = FEATURES + ["anomaly_score"]
+
+
+def population_stability_index(reference: np.ndarray, current: np.ndarray, bins: int = 10) -> np.ndarray:
+    """PSI of every column of ``current`` (m, k) against ``reference`` (n, k), in one vectorized pass.
+
+    Bins are the reference deciles (for ``bins=10``), so each holds ~1/bins of the
+    reference; empty bins are floored at a small probability to keep the log finite.
+    """
+    k = reference.shape[1]
+    # Interior bin edges per column, shape (bins - 1, k)
+    edges = np.quantile(reference, np.linspace(0, 1, bins + 1)[1:-1], axis=0)
+
+    def proportions(sample: np.ndarray) -> np.ndarray:
+        bin_index = (sample[:, None, :] > edges[None, :, :]).sum(axis=1)
+        counts = np.bincount((bin_index + np.arange(k) * bins).ravel(), minlength=k * bins)
+        return np.maximum(counts.reshape(k, bins) / max(len(sample), 1), 1e-4)
+
+    expected, actual = proportions(reference), proportions(current)
+    return ((actual - expected) * np.log(actual / expected)).sum(axis=1)
+
+
+def ks_statistic(reference: np.ndarray, current: np.ndarray) -> np.ndarray:
+    """Two-sample Kolmogorov-Smirnov statistic of every column of ``current`` against ``reference``."""
+    reference = np.sort(reference, axis=0)
+    current = np.sort(current, axis=0)
+    statistics = np.empty(reference.shape[1])
+    for column in range(reference.shape[1]):
+        points = np.concatenate([reference[:, column], current[:, column]])
+        reference_cdf = np.searchsorted(reference[:, column], points, side="right") / len(reference)
+        current_cdf = np.searchsorted(current[:, column], points, side="right") / len(current)
+        statistics[column] = np.abs(reference_cdf - current_cdf).max()
+    return statistics
+
+
+class DriftMonitor:
+    """Compare recent windows of features and anomaly scores with the training reference.
+
+    The reference is a sample of the normal (non-anomalous) training readings per
+    equipment type. ``check`` only looks at readings newer than the training data,
+    splits them into fixed windows (``window``, e.g. one day) per type and computes
+    PSI or KS for every monitored column of the last ``n_windows`` windows; a
+    column above the threshold is a drift event.
+
+    A developing fault is not drift: an equipment whose window has more than
+    ``max_anomaly_share`` anomalous readings is left out of that window, and the
+    remaining anomalous readings are dropped, so only normal operation is compared.
+    Drift is a fleet-wide shift: a window is only checked when at least
+    ``min_fleet_equipment`` equipment remain in it, and when that many equipment
+    and more than half of the type are anomalous together all their readings are kept.
+    A drifted column must also stay above the threshold without the equipment that
+    moved most in it, so a shift carried by one machine is not reported.
+
+    A long-running process calls ``check(..., completed_only=True)`` whenever new
+    readings arrive: only windows that have completed since the previous check are
+    evaluated (``checked_until``), so each window is checked at most once.
+    """
+
+    def __init__(self, method: str = "psi", threshold: float = None, window: str = "1D",
+                 n_windows: int = 3, min_window_size: int = 200, bins: int = 10,
+                 max_reference_size: int = 20000, max_anomaly_share: float = 0.2,
+                 min_fleet_equipment: int = 2, seed: int = 42):
+        if method not in ("psi", "ks"):
+            raise ValueError(f"Phương pháp đo drift không hợp lệ: {method}")
+        self.method = method
+        # 0.25 is the usual "significant shift" level for PSI
+        self.threshold = threshold if threshold is not None else (0.25 if method == "psi" else 0.2)
+        self.window = window
+        self.n_windows = n_windows
+        self.min_window_size = min_window_size
+        self.bins = bins
+        self.max_reference_size = max_reference_size
+        self.max_anomaly_share = max_anomaly_share
+        self.min_fleet_equipment = min_fleet_equipment
+        self.seed = seed
+        self.reference = {}
+        self.reference_end = None
+        self.checked_until = None
+
+    def fit_reference(self, data: pd.DataFrame, scores: np.ndarray) -> None:
+        """Keep a sample of the normal training features and scores for each equipment type."""
+        rng = np.random.default_rng(self.seed)
+        values = self._values(data, scores)
+        types = self._types(data)
+        normal = np.asarray(scores) >= 0
+        self.reference = {}
+        self.reference_end = pd.to_datetime(data['timestamp']).max()
+        self.checked_until = None
+        for equipment_type in np.unique(types):
+            rows = np.flatnonzero((types == equipment_type) & normal)
+            if len(rows) == 0:
+                continue
+            if len(rows) > self.max_reference_size:
+                rows = rng.choice(rows, self.max_reference_size, replace=False)
+            self.reference[equipment_type] = values[rows]
+
+    def pending(self, data: pd.DataFrame) -> np.ndarray:
+        """Mask of the rows ``check`` looks at: newer than the training data and the last checked window."""
+        timestamps = pd.to_datetime(data['timestamp'])
+        mask = np.ones(len(data), dtype=bool)
+        if self.reference_end is not None:
+            mask &= (timestamps > self.reference_end).to_numpy()
+        if self.checked_until is not None:
+            mask &= (timestamps >= self.checked_until).to_numpy()
+        return mask
+
+    def window_completed(self, latest: pd.Timestamp) -> bool:
+        """Whether a window has completed after the last check, given the latest reading time."""
+        if not self.reference:
+            return False
+        since = self.checked_until if self.checked_until is not None else self.reference_end
+        return since is None or pd.Timestamp(since).floor(self.window) + pd.Timedelta(self.window) <= latest
+
+    def check(self, data: pd.DataFrame, scores: np.ndarray, completed_only: bool = False) -> List[Dict]:
+        """Drift events of the most recent windows; an empty list means no retraining is needed.
+
+        With ``completed_only`` the window still receiving readings is left for a later check.
+        """
+        if not self.reference:
+            return []
+
+        timestamps = pd.to_datetime(data['timestamp'])
+        unseen = self.pending(data)
+        if completed_only and unseen.any():
+            # The window of the latest reading is still open
+            unseen &= (timestamps < timestamps.max().floor(self.window)).to_numpy()
+        if not unseen.any():
+            return []
+
+        values = self._values(data, scores)[unseen]
+        frame = pd.DataFrame({
+            "equipment_type": self._types(data)[unseen],
+            "equipment_id": data['equipment_id'].astype(str).to_numpy()[unseen],
+            "window_start": timestamps[unseen].dt.floor(self.window).to_numpy(),
+            # IsolationForest flags a reading as an outlier exactly when its score is negative
+            "is_anomaly": np.asarray(scores)[unseen] < 0
+        })
+        detected_at = datetime.now().isoformat()
+
+        events = []
+        for equipment_type, type_rows in frame.groupby("equipment_type").groups.items():
+            reference = self.reference.get(equipment_type)
+            if reference is None:
+                continue
+            windows = frame.loc[type_rows].groupby("window_start").indices
+            for window_start in sorted(windows)[-self.n_windows:]:
+                rows = self._normal_rows(frame, np.asarray(type_rows)[windows[window_start]])
+                if len(rows) < self.min_window_size or \
+                        frame["equipment_id"].iloc[rows].nunique() < self.min_fleet_equipment:
+                    continue
+                drift = self._measure(reference, values[rows])
+                for column in self._shared(frame, values, reference, rows, np.flatnonzero(drift > self.threshold)):
+                    events.append({
+                        "detected_at": detected_at,
+                        "equipment_type": equipment_type,
+                        "column": DRIFT_COLUMNS[column],
+                        "method": self.method,
+                        "value": float(drift[column]),
+                        "threshold": self.threshold,
+                        "window_start": pd.Timestamp(window_start).isoformat(),
+                        "window_size": int(len(rows))
+                    })
+        if completed_only:
+            self.checked_until = pd.Timestamp(frame["window_start"].max()) + pd.Timedelta(self.window)
+        return events
+
+    def _measure(self, reference: np.ndarray, current: np.ndarray) -> np.ndarray:
+        if self.method == "psi":
+            return population_stability_index(reference, current, self.bins)
+        return ks_statistic(reference, current)
+
+    def _shared(self, frame: pd.DataFrame, values: np.ndarray, reference: np.ndarray, rows: np.ndarray,
+                columns: np.ndarray) -> List[int]:
+        """Drifted columns that still drift without the equipment whose mean moved most in them."""
+        equipment_ids = frame["equipment_id"].to_numpy()[rows]
+        shared = []
+        for column in columns:
+            means = pd.Series(values[rows, column]).groupby(equipment_ids).mean()
+            outlier = (means - reference[:, column].mean()).abs().idxmax()
+            kept = rows[equipment_ids != outlier]
+            # A shift carried by a single equipment is that equipment's condition
+            if len(kept) and self._measure(reference[:, [column]], values[kept][:, [column]])[0] > self.threshold:
+                shared.append(column)
+        return shared
+
+    def _normal_rows(self, frame: pd.DataFrame, rows: np.ndarray) -> np.ndarray:
+        """Rows of one type and window that reflect normal operation rather than equipment faults."""
+        window = frame.iloc[rows]
+        anomaly_share = window.groupby("equipment_id", observed=True)["is_anomaly"].mean()
+        faulty = anomaly_share.index[anomaly_share > self.max_anomaly_share]
+        if len(faulty) >= self.min_fleet_equipment and len(faulty) > len(anomaly_share) / 2:
+            # Most of the type shifted together: that is drift, not a fault
+            return rows
+        keep = ~window["equipment_id"].isin(faulty).to_numpy() & ~window["is_anomaly"].to_numpy()
+        return rows[keep]
+
+    @staticmethod
+    def _values(data: pd.DataFrame, scores: np.ndarray) -> np.ndarray:
+        return np.column_stack([data[FEATURES].to_numpy(dtype=float), scores])
+
+    @staticmethod
+    def _types(data: pd.DataFrame) -> np.ndarray:
+        return data['equipment_id'].astype(str).str.split('-').str[0].str.upper().to_numpy()
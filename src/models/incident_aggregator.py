@@ -0,0 +1,84 @@
+"""
+Module gộp các lần đọc bất thường liên tiếp của từng thiết bị thành sự cố (incident) có thời điểm bắt đầu/kết thúc.
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+from src.models.anomaly_detector import FEATURES
+
+INCIDENT_COLUMNS = ['equipment_id', 'start', 'end', 'duration_minutes', 'readings', 'peak_score',
+                    'dominant_sensor', 'dominant_deviation', 'rule_violation']
+
+
+def aggregate_incidents(scored_data: pd.DataFrame, max_gap: str = "15min", min_readings: int = 1) -> pd.DataFrame:
+    """Collapse anomalous readings into incidents, one row per incident.
+
+    Anomalous readings of the same equipment belong to one incident while the
+    time between consecutive anomalous readings is at most ``max_gap``; this
+    run-length pass with gap merging is a single vectorized ``cumsum`` over the
+    sorted readings. Per incident: start/end, duration, number of readings, peak
+    (lowest) anomaly score and the dominant sensor, i.e. the one with the largest
+    mean absolute (normalized) deviation, with its signed mean deviation.
+    """
+    anomalies = scored_data[scored_data['is_anomaly']]
+    if anomalies.empty:
+        return pd.DataFrame(columns=INCIDENT_COLUMNS)
+
+    anomalies = anomalies.sort_values(['equipment_id', 'timestamp'], kind="stable")
+    equipment = anomalies['equipment_id'].to_numpy()
+    timestamps = pd.to_datetime(anomalies['timestamp']).to_numpy()
+
+    # A new incident starts at every equipment change or gap longer than max_gap
+    new_incident = np.ones(len(anomalies), dtype=bool)
+    gap = pd.Timedelta(max_gap).to_timedelta64()
+    new_incident[1:] = (equipment[1:] != equipment[:-1]) | (np.diff(timestamps) > gap)
+    incident_ids = np.cumsum(new_incident) - 1
+
+    starts = np.flatnonzero(new_incident)
+    counts = np.diff(np.append(starts, len(anomalies)))
+    deviations = anomalies[FEATURES].to_numpy(dtype=float)
+    signed_means = np.add.reduceat(deviations, starts, axis=0) / counts[:, None]
+    dominant = (np.add.reduceat(np.abs(deviations), starts, axis=0) / counts[:, None]).argmax(axis=1)
+
+    ends = np.append(starts[1:], len(anomalies)) - 1
+    incidents = pd.DataFrame({
+        'equipment_id': equipment[starts],
+        'start': timestamps[starts],
+        'end': timestamps[ends],
+        'readings': counts,
+        'peak_score': np.minimum.reduceat(anomalies['anomaly_score'].to_numpy(dtype=float), starts),
+        'dominant_sensor': np.array(FEATURES)[dominant],
+        'dominant_deviation': signed_means[np.arange(len(starts)), dominant]
+    })
+    incidents.insert(3, 'duration_minutes', (incidents['end'] - incidents['start']).dt.total_seconds() / 60)
+
+    # Most frequent engineering rule violated during the incident, if rules were applied
+    if 'rule_violation' in anomalies.columns:
+        pairs = pd.DataFrame({'incident': incident_ids, 'rule': anomalies['rule_violation'].to_numpy()})
+        frequent = (pairs[pairs['rule'] != ""].value_counts().reset_index()
+                    .drop_duplicates('incident').set_index('incident')['rule'])
+        incidents['rule_violation'] = frequent.reindex(range(len(starts))).fillna("").to_numpy()
+    else:
+        incidents['rule_violation'] = ""
+
+    return incidents[incidents['readings'] >= min_readings].reset_index(drop=True)
+
+
+def top_incidents(incidents: pd.DataFrame, limit: int = 5) -> List[Dict]:
+    """The ``limit`` largest incidents (most readings, then lowest peak score) in time order, as dicts."""
+    top = incidents.sort_values(['readings', 'peak_score'], ascending=[False, True]).head(limit)
+    top = top.sort_values('start')
+    return [
+        {
+            "start": row.start.isoformat(),
+            "end": row.end.isoformat(),
+            "duration_minutes": float(row.duration_minutes),
+            "readings": int(row.readings),
+            "peak_score": float(row.peak_score),
+            "dominant_sensor": row.dominant_sensor,
+            "dominant_deviation": float(row.dominant_deviation),
+            "rule_violation": row.rule_violation
+        }
+        for row in top.itertuples(index=False)
+    ]
@@ -0,0 +1,159 @@
+"""
+Module luật ngưỡng kỹ thuật theo loại thiết bị (ví dụ độ rung máy nén > X), biên dịch một lần thành phép so sánh vector hóa.
+"""
+import os
+import json
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+from src.models.anomaly_detector import FEATURES
+
+DEFAULT_RULES_PATH = "models/configs/rules.json"
+
+OPERATORS = (">", ">=", "<", "<=")
+SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2, "critical": 3}
+
+
+def load_rules(path: str = DEFAULT_RULES_PATH) -> Dict[str, List[Dict]]:
+    """Load rule definitions per equipment type (empty dict if the file is missing)."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def rule_threshold(rule: Dict) -> float:
+    """Threshold of a rule in engineering units: ``threshold``, or ``percent`` of ``nominal``."""
+    if "threshold" in rule:
+        return float(rule["threshold"])
+    return float(rule["nominal"]) * float(rule["percent"]) / 100.0
+
+
+def more_severe(first: str, second: Optional[str]) -> str:
+    """The more severe of two severities/statuses; unknown values never win."""
+    if second is None or SEVERITY_RANK.get(second, -1) <= SEVERITY_RANK.get(first, -1):
+        return first
+    return second
+
+
+class RuleEngine:
+    """Hard engineering limits per equipment type, evaluated over whole batches.
+
+    Rules are compiled once into groups of (equipment type, column, operator),
+    each holding its thresholds sorted. A row violates the first ``k`` rules of
+    a group, where ``k`` comes from one ``np.searchsorted`` over the group's
+    thresholds, and a prefix table gives the most severe of those rules. The
+    cost is therefore one binary search per row and group, however many rules
+    a group holds.
+
+    Thresholds are written in engineering units; when the data is normalized,
+    pass the fitted scaler and thresholds of scaled features are mapped into
+    the normalized space instead of inverse-transforming every row.
+    """
+
+    def __init__(self, rules: Dict[str, List[Dict]], scaler=None):
+        self.scaler = scaler
+        self.rules = [dict(rule, equipment_type=equipment_type.upper())
+                      for equipment_type, type_rules in rules.items() for rule in type_rules]
+        for rule in self.rules:
+            if rule.get("op") not in OPERATORS:
+                raise ValueError(f"Toán tử không hợp lệ trong luật {rule.get('name')}: {rule.get('op')}")
+            if rule.get("severity", "high") not in SEVERITY_RANK:
+                raise ValueError(f"Mức độ không hợp lệ trong luật {rule.get('name')}: {rule.get('severity')}")
+
+        # Index -1 (no violation) maps to the empty name
+        self.rule_names = np.array([rule["name"] for rule in self.rules] + [""], dtype=object)
+        self.rule_severity = {rule["name"]: rule.get("severity", "high") for rule in self.rules}
+        self._ranks = np.array([SEVERITY_RANK[rule.get("severity", "high")] for rule in self.rules] + [-1])
+        self.groups = self._compile()
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_RULES_PATH, scaler=None) -> "RuleEngine":
+        return cls(load_rules(path), scaler)
+
+    def _compile(self) -> Dict[Tuple[str, str, str], Tuple[np.ndarray, np.ndarray, bool]]:
+        grouped = {}
+        for index, rule in enumerate(self.rules):
+            op = rule["op"]
+            grouped.setdefault((rule["equipment_type"], rule["sensor"], op), []).append(
+                (self._data_threshold(rule), index)
+            )
+
+        groups = {}
+        for key, entries in grouped.items():
+            # "<" / "<=" are evaluated as ">" / ">=" on negated values
+            sign = -1.0 if key[2].startswith("<") else 1.0
+            entries.sort(key=lambda entry: sign * entry[0])
+            thresholds = np.array([sign * threshold for threshold, _ in entries])
+            rule_ids = np.array([index for _, index in entries])
+            # best[i]: most severe rule among the i + 1 lowest thresholds
+            best = rule_ids.copy()
+            for i in range(1, len(best)):
+                if self._ranks[best[i - 1]] > self._ranks[best[i]]:
+                    best[i] = best[i - 1]
+            groups[key] = (thresholds, best, key[2].endswith("="))
+        return groups
+
+    def _data_threshold(self, rule: Dict) -> float:
+        threshold = rule_threshold(rule)
+        if self.scaler is not None and rule["sensor"] in FEATURES:
+            column = FEATURES.index(rule["sensor"])
+            threshold = (threshold - self.scaler.mean_[column]) / self.scaler.scale_[column]
+        return threshold
+
+    def evaluate(self, data: pd.DataFrame) -> np.ndarray:
+        """Index of the most severe violated rule per row, -1 where no rule is violated."""
+        fired = np.full(len(data), -1)
+        if not self.groups or data.empty:
+            return fired
+
+        # Equipment type per row through the (few) distinct equipment IDs
+        codes, equipment_ids = pd.factorize(data['equipment_id'])
+        types = np.array([str(eid).split('-')[0].upper() for eid in equipment_ids])[codes]
+        type_rows = {}
+        type_values = {}
+        type_fired = {}
+
+        for (equipment_type, column, op), (thresholds, best, inclusive) in self.groups.items():
+            if equipment_type not in type_rows:
+                type_rows[equipment_type] = np.flatnonzero(types == equipment_type)
+                type_fired[equipment_type] = np.full(len(type_rows[equipment_type]), -1)
+            rows = type_rows[equipment_type]
+            if rows.size == 0 or column not in data.columns:
+                continue
+            if (equipment_type, column) not in type_values:
+                type_values[equipment_type, column] = data[column].to_numpy(dtype=float)[rows]
+            values = type_values[equipment_type, column]
+            if op.startswith("<"):
+                values = -values
+            # Number of thresholds strictly below (or at, for >=) each value
+            count = np.searchsorted(thresholds, values, side="right" if inclusive else "left")
+            # NaN sorts after every threshold; a missing reading violates nothing
+            count[np.isnan(values)] = 0
+            candidate = np.where(count > 0, best[np.maximum(count - 1, 0)], -1)
+            current = type_fired[equipment_type]
+            better = self._ranks[candidate] > self._ranks[current]
+            current[better] = candidate[better]
+
+        for equipment_type, rows in type_rows.items():
+            fired[rows] = type_fired[equipment_type]
+        return fired
+
+    def apply(self, scored_data: pd.DataFrame) -> pd.DataFrame:
+        """Add a ``rule_violation`` column and flag violating rows in ``is_anomaly`` (in place)."""
+        fired = self.evaluate(scored_data)
+        scored_data['rule_violation'] = self.rule_names[fired]
+        if 'is_anomaly' in scored_data.columns:
+            scored_data['is_anomaly'] = scored_data['is_anomaly'].to_numpy() | (fired >= 0)
+        return scored_data
+
+    def worst_severity(self, scored_data: pd.DataFrame) -> Optional[str]:
+        """Highest severity among the rules violated in already evaluated data, None if none fired."""
+        if 'rule_violation' not in scored_data.columns:
+            return None
+        severity = None
+        for name in pd.unique(scored_data['rule_violation']):
+            if name:
+                severity = more_severe(self.rule_severity[name], severity)
+        return severity
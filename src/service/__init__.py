@@ -0,0 +1,3 @@
+"""
+HTTP services exposing the maintenance agent
+"""
\ No newline at end of file
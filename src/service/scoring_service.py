@@ -0,0 +1,208 @@
+"""
+Dịch vụ HTTP (asyncio) chấm điểm bất thường theo yêu cầu, gom các yêu cầu đồng thời thành lô.
+"""
+import math
+import time
+import asyncio
+import numpy as np
+import pandas as pd
+from collections import deque
+from typing import Dict, List
+from aiohttp import web
+
+from src.agents.maintenance_agent import MaintenanceAgent
+from src.models.anomaly_detector import FEATURES
+
+
+class RequestBatcher:
+    """Coalesce concurrent scoring requests into one vectorized model call.
+
+    The first queued request opens a batching window of ``max_wait_ms``; every
+    request that arrives before the window closes (or until ``max_batch_size``
+    readings are collected) is scored together.
+    """
+
+    def __init__(self, agent: MaintenanceAgent, max_batch_size: int = 256, max_wait_ms: float = 5.0):
+        self.agent = agent
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = None
+        self.in_flight = 0
+        self.latencies = deque(maxlen=10000)
+        self.batch_sizes = deque(maxlen=1000)
+        self._worker = None
+
+    async def start(self) -> None:
+        self.queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, readings: List[Dict]) -> List[Dict]:
+        """Queue readings for scoring and wait for their results."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((readings, future, time.perf_counter()))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            n_readings = len(items[0][0])
+            deadline = loop.time() + self.max_wait
+
+            # Keep collecting until the window closes or the batch is full
+            while n_readings < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                items.append(item)
+                n_readings += len(item[0])
+
+            self.in_flight = n_readings
+            try:
+                results = await loop.run_in_executor(None, self._score_batch, [item[0] for item in items])
+            except Exception as exc:
+                for _, future, _ in items:
+                    if not future.done():
+                        future.set_exception(exc)
+            else:
+                now = time.perf_counter()
+                for (_, future, started), result in zip(items, results):
+                    if not future.done():
+                        future.set_result(result)
+                    self.latencies.append(now - started)
+                self.batch_sizes.append(n_readings)
+            finally:
+                self.in_flight = 0
+
+    def _score_batch(self, batches: List[List[Dict]]) -> List[List[Dict]]:
+        """Score all readings of all requests in one model call, then split per request.
+
+        Readings violating an engineering rule are flagged as anomalies, as in batch detection.
+        """
+        frame = pd.DataFrame([reading for readings in batches for reading in readings])
+        # Readings without an equipment ID match no rule
+        frame['equipment_id'] = frame['equipment_id'].fillna("") if 'equipment_id' in frame.columns else ""
+        normalized = self.agent.data_processor.transform_readings(frame)
+        normalized['anomaly_score'], normalized['is_anomaly'] = \
+            self.agent.anomaly_detector.score(normalized[FEATURES].to_numpy())
+        if self.agent.rules:
+            normalized = self.agent.rule_engine.apply(normalized)
+        scores = normalized['anomaly_score'].to_numpy()
+        is_anomaly = normalized['is_anomaly'].to_numpy()
+        violations = normalized['rule_violation'].to_numpy() if 'rule_violation' in normalized.columns \
+            else np.full(len(normalized), "", dtype=object)
+
+        results = []
+        offset = 0
+        for readings in batches:
+            request_results = []
+            for i, reading in enumerate(readings, start=offset):
+                equipment_id = reading.get("equipment_id")
+                request_results.append({
+                    "equipment_id": equipment_id,
+                    "anomaly_score": float(scores[i]),
+                    "is_anomaly": bool(is_anomaly[i]),
+                    "rule_violation": violations[i] or None
+                })
+            results.append(request_results)
+            offset += len(readings)
+        return results
+
+    def latency_stats(self) -> Dict:
+        """Latency percentiles (milliseconds) over the most recent requests."""
+        if not self.latencies:
+            return {"count": 0}
+        latencies_ms = np.fromiter(self.latencies, dtype=float) * 1000
+        p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+        return {
+            "count": len(latencies_ms),
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+            "max_ms": float(latencies_ms.max()),
+            "mean_batch_size": float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0
+        }
+
+
+def _is_sensor_value(value) -> bool:
+    """A finite number; JSON booleans are ints to Python and are rejected explicitly."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _parse_readings(payload) -> List[Dict]:
+    """Accept a single reading object or ``{"readings": [...]}``."""
+    readings = payload.get("readings", [payload]) if isinstance(payload, dict) else payload
+    if not isinstance(readings, list) or not readings:
+        raise ValueError("Yêu cầu phải chứa ít nhất một bản ghi cảm biến")
+    for reading in readings:
+        if not isinstance(reading, dict):
+            raise ValueError("Mỗi bản ghi cảm biến phải là một đối tượng JSON")
+        missing = [feature for feature in FEATURES if not _is_sensor_value(reading.get(feature))]
+        if missing:
+            raise ValueError(f"Thiếu hoặc sai kiểu giá trị cảm biến: {', '.join(missing)}")
+    return readings
+
+
+def create_app(agent: MaintenanceAgent, max_batch_size: int = 256, max_wait_ms: float = 5.0) -> web.Application:
+    """Build the aiohttp application for the scoring service."""
+    batcher = RequestBatcher(agent, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    app = web.Application()
+    app["batcher"] = batcher
+
+    async def score(request: web.Request) -> web.Response:
+        try:
+            readings = _parse_readings(await request.json())
+        except ValueError as exc:
+            return web.json_response({"error": str(exc)}, status=400)
+        results = await batcher.submit(readings)
+        return web.json_response({"results": results})
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response({
+            "status": "ok" if agent.anomaly_detector.is_trained else "not_ready",
+            "equipment_count": len(agent.equipment_status)
+        })
+
+    async def latency(request: web.Request) -> web.Response:
+        return web.json_response(batcher.latency_stats())
+
+    async def queue_depth(request: web.Request) -> web.Response:
+        return web.json_response({
+            "queue_depth": batcher.queue.qsize() if batcher.queue is not None else 0,
+            "in_flight_readings": batcher.in_flight
+        })
+
+    async def on_startup(app: web.Application) -> None:
+        await batcher.start()
+
+    async def on_cleanup(app: web.Application) -> None:
+        await batcher.stop()
+
+    app.router.add_post("/score", score)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics/latency", latency)
+    app.router.add_get("/metrics/queue", queue_depth)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+
+    return app
+
+
+def run_service(agent: MaintenanceAgent, host: str = "127.0.0.1", port: int = 8080,
+                max_batch_size: int = 256, max_wait_ms: float = 5.0) -> None:
+    """Run the scoring service until interrupted."""
+    app = create_app(agent, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    web.run_app(app, host=host, port=port)
@@ -2,8 +2,92 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from collections import Counter
 from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
 from src.agents.maintenance_agent import MaintenanceAgent
+from src.advisors.maintenance_scheduler import DEFAULT_CREWS
+from src.models.anomaly_detector import FEATURES
+
+VIEWS = ["Trạng Thái Thiết Bị", "Khuyến Nghị Bảo Trì", "Tổng Quan Hệ Thống"]
+
+STATUS_NAMES = {
+    "low": "Thấp",
+    "medium": "Trung bình",
+    "high": "Cao",
+    "critical": "Nguy cấp",
+    "Unknown": "Không xác định"
+}
+
+# Số thiết bị tối đa hiển thị trong ô chọn thiết bị, và số dòng mỗi trang của bảng thiết bị
+MAX_SELECTOR_OPTIONS = 200
+PAGE_SIZE = 50
+# Số sự cố lớn nhất được tô trên biểu đồ cảm biến
+MAX_CHART_INCIDENTS = 50
+# Cột % bất thường tính từ dữ liệu tổng hợp (rollup) của toàn bộ lịch sử
+HISTORY_COLUMN = "% Bất Thường (lịch sử)"
+
+STATUS_STYLES = {
+    'low': 'background-color: #c6efce',
+    'medium': 'background-color: #ffeb9c',
+    'high': 'background-color: #ffc7ce',
+    'critical': 'background-color: #9c0006; color: white',
+    'Unknown': 'background-color: #d9d9d9'
+}
+
+
+def search_equipment(equipment_ids: List[str], query: str, limit: int = MAX_SELECTOR_OPTIONS) -> Tuple[List[str], int]:
+    """Case-insensitive substring search; returns at most ``limit`` matches and the total match count."""
+    query = query.strip().lower()
+    matches = [eid for eid in equipment_ids if query in eid.lower()] if query else list(equipment_ids)
+    return matches[:limit], len(matches)
+
+
+def build_fleet_table(equipment_status: Dict[str, str], recommendations: Dict[str, Dict],
+                      history: pd.DataFrame = None) -> pd.DataFrame:
+    """One row per asset with the columns of the fleet table (status kept as its code for filtering).
+
+    ``history`` is a rollup fleet summary; when given, its anomaly percentage over
+    all stored readings becomes an extra column.
+    """
+    ids = list(equipment_status)
+    recs = [recommendations.get(eid, {}) for eid in ids]
+    actions = pd.Series([rec.get("recommendation") or "Không có khuyến nghị" for rec in recs], dtype=object)
+    actions = actions.where(actions.str.len() <= 100, actions.str[:100] + "...")
+    table = pd.DataFrame({
+        "Mã Thiết Bị": ids,
+        "status": [equipment_status[eid] for eid in ids],
+        "Vấn Đề": [rec.get("issue", "Không xác định") for rec in recs],
+        "Hành Động Khuyến Nghị": actions.to_numpy(),
+        "Thời Gian Ngừng (giờ)": pd.to_numeric(
+            pd.Series([rec.get("estimated_downtime_hours") for rec in recs], dtype=object), errors="coerce"
+        ).to_numpy()
+    })
+    if history is not None:
+        table[HISTORY_COLUMN] = table["Mã Thiết Bị"].map(
+            history.set_index("equipment_id")["anomaly_percentage"]
+        ).round(2)
+    return table
+
+
+def query_fleet_table(table: pd.DataFrame, statuses: List[str] = None, search: str = "",
+                      sort_by: str = "status", ascending: bool = True) -> pd.DataFrame:
+    """Filter and sort the fleet table (most severe first when sorting by status)."""
+    mask = pd.Series(True, index=table.index)
+    if statuses:
+        mask &= table["status"].isin(statuses)
+    if search.strip():
+        mask &= table["Mã Thiết Bị"].str.contains(search.strip(), case=False, regex=False)
+    filtered = table[mask]
+
+    if sort_by == "status":
+        order = {status: rank for rank, status in enumerate(["critical", "high", "medium", "low", "Unknown"])}
+        filtered = filtered.sort_values("status", key=lambda col: col.map(order).fillna(len(order)),
+                                        ascending=ascending, kind="stable")
+    else:
+        filtered = filtered.sort_values(sort_by, ascending=ascending, kind="stable", na_position="last")
+    return filtered
+
 
 class MaintenanceDashboard:
     """Interactive dashboard for the predictive maintenance system."""
@@ -28,12 +112,16 @@ class MaintenanceDashboard:
         # Sidebar for controls
         st.sidebar.header("Điều Khiển")
         
-        # Equipment selection
+        # Equipment selection: filter first so the selectbox never holds the whole fleet
         equipment_list = list(self.agent.equipment_status.keys())
-        selected_equipment = st.sidebar.selectbox("Chọn Thiết Bị", equipment_list)
+        query = st.sidebar.text_input("Tìm Thiết Bị", placeholder="Nhập mã thiết bị, ví dụ PUMP-1")
+        options, total_matches = search_equipment(equipment_list, query)
+        if total_matches > len(options):
+            st.sidebar.caption(f"Hiển thị {len(options)}/{total_matches} thiết bị khớp, hãy nhập cụ thể hơn")
+        selected_equipment = st.sidebar.selectbox("Chọn Thiết Bị", options)
         
         # Refresh button
-        if st.sidebar.button("Làm Mới Dữ Liệu"):
+        if st.sidebar.button("Làm Mới Dữ Liệu", disabled=selected_equipment is None):
             self.agent.process_equipment(selected_equipment)
         
         # Process all button
@@ -42,17 +130,17 @@ class MaintenanceDashboard:
                 self.agent.process_all_equipment()
             st.success("Đã xử lý tất cả thiết bị!")
         
-        # Main content area with tabs
-        tab1, tab2, tab3 = st.tabs(["Trạng Thái Thiết Bị", "Khuyến Nghị Bảo Trì", "Tổng Quan Hệ Thống"])
+        # Only the active view is rendered (st.tabs would run all three on every rerun)
+        view = st.radio("Chế độ xem", VIEWS, horizontal=True, label_visibility="collapsed")
         
-        with tab1:
+        if view == VIEWS[2]:
+            self._render_system_overview()
+        elif selected_equipment is None:
+            st.info("Không có thiết bị nào khớp với từ khóa tìm kiếm.")
+        elif view == VIEWS[0]:
             self._render_equipment_status(selected_equipment)
-        
-        with tab2:
+        else:
             self._render_maintenance_recommendations(selected_equipment)
-        
-        with tab3:
-            self._render_system_overview()
     
     def _render_equipment_status(self, equipment_id: str):
         """Render the equipment status tab."""
@@ -109,9 +197,42 @@ class MaintenanceDashboard:
         with col4:
             st.metric("Tổng số đọc", summary["total_readings"])
         
+        # Status history read from the results store
+        if self.agent.results_store is not None:
+            history = self.agent.results_store.status_history(equipment_id)
+            if not history.empty:
+                st.subheader("Lịch sử trạng thái")
+                fig = px.line(history, x='recorded_at', y='anomaly_percentage', markers=True,
+                              hover_data=['status'], title='% Bất thường qua các lần phân tích')
+                fig.update_layout(xaxis_title="Thời gian", yaxis_title="% Bất thường")
+                st.plotly_chart(fig, use_container_width=True)
+        
+        # Long-range trend read from the pre-aggregated rollups
+        if self.agent.rollup_store is not None:
+            self._render_trend(equipment_id)
+        
+        # Incidents: consecutive anomalous readings collapsed into episodes
+        incidents = pd.DataFrame(details["incidents"])
+        st.subheader(f"Sự cố bất thường ({len(incidents)})")
+        if incidents.empty:
+            st.write("Không có sự cố nào.")
+        else:
+            st.dataframe(
+                incidents.drop(columns=['equipment_id'], errors='ignore').rename(columns={
+                    'start': 'Bắt đầu', 'end': 'Kết thúc', 'duration_minutes': 'Thời lượng (phút)',
+                    'readings': 'Số lần đọc', 'peak_score': 'Điểm thấp nhất',
+                    'dominant_sensor': 'Cảm biến chính', 'dominant_deviation': 'Độ lệch (chuẩn hóa)',
+                    'rule_violation': 'Luật vi phạm'
+                }).sort_values('Bắt đầu', ascending=False),
+                hide_index=True, use_container_width=True
+            )
+        
         # Create sensor data plots
         st.subheader("Đọc dữ liệu cảm biến")
         data = pd.DataFrame(details["data"])
+        if len(data) < summary["total_readings"]:
+            st.caption(f"Hiển thị {len(data)} điểm gộp theo thời gian từ {summary['total_readings']} lần đọc")
+        chart_incidents = incidents.nlargest(MAX_CHART_INCIDENTS, 'readings') if not incidents.empty else incidents
         
         # Convert timestamp to datetime if needed
         if 'timestamp' in data.columns and not pd.api.types.is_datetime64_any_dtype(data['timestamp']):
@@ -126,8 +247,9 @@ class MaintenanceDashboard:
             fig.update_layout(xaxis_title="Thời gian", yaxis_title="Giá trị")
             st.plotly_chart(fig, use_container_width=True)
             
-            fig = px.line(data, x='timestamp', y='vibration', 
-                         title='Độ rung', color=data['is_anomaly'].astype(str))
+            fig = px.line(data, x='timestamp', y='vibration', title='Độ rung (vùng đỏ: sự cố)')
+            for incident in chart_incidents.itertuples(index=False):
+                fig.add_vrect(x0=incident.start, x1=incident.end, fillcolor="red", opacity=0.2, line_width=0)
             fig.update_layout(xaxis_title="Thời gian", yaxis_title="Giá trị")
             st.plotly_chart(fig, use_container_width=True)
         
@@ -143,6 +265,32 @@ class MaintenanceDashboard:
             fig.update_layout(xaxis_title="Độ rung", yaxis_title="Nhiệt độ")
             st.plotly_chart(fig, use_container_width=True)
     
+    def _render_trend(self, equipment_id: str):
+        """Render the long-range trend of one sensor from the coarsest sufficient rollup."""
+        st.subheader("Xu hướng dài hạn")
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            days = st.selectbox("Khoảng thời gian", [1, 7, 30, 90], index=1, format_func=lambda d: f"{d} ngày")
+            sensor = st.selectbox("Cảm biến", FEATURES)
+        
+        bounds = self.agent.rollup_store.query(equipment_id, resolution="1d")
+        if bounds.empty:
+            st.write("Chưa có dữ liệu tổng hợp.")
+            return
+        end = bounds['bucket'].max() + pd.Timedelta("1D")
+        trend = self.agent.rollup_store.query(equipment_id, start=end - pd.Timedelta(days=days), end=end)
+        
+        with col2:
+            fig = go.Figure([
+                go.Scatter(x=trend['bucket'], y=trend[f"{sensor}_max"], line=dict(width=0), showlegend=False),
+                go.Scatter(x=trend['bucket'], y=trend[f"{sensor}_min"], fill='tonexty', line=dict(width=0),
+                           name="Min–Max"),
+                go.Scatter(x=trend['bucket'], y=trend[f"{sensor}_mean"], name="Trung bình")
+            ])
+            fig.update_layout(title=f"{sensor} ({len(trend)} điểm, độ phân giải {trend.attrs['resolution']})",
+                              xaxis_title="Thời gian", yaxis_title="Giá trị (chuẩn hóa)")
+            st.plotly_chart(fig, use_container_width=True)
+    
     def _render_maintenance_recommendations(self, equipment_id: str):
         """Render the maintenance recommendations tab."""
         st.header("Khuyến Nghị Bảo Trì")
@@ -202,33 +350,31 @@ class MaintenanceDashboard:
         )
         maintenance_team = st.selectbox(
             "Chỉ định đội bảo trì",
-            ["Đội Alpha", "Đội Beta", "Đội Gamma", "Nhà thầu bên ngoài"]
+            list(DEFAULT_CREWS)
         )
         
         if st.button("Lên Lịch Bảo Trì"):
             st.success(f"Bảo trì cho {equipment_id} được lên lịch vào ngày {maintenance_date} với {maintenance_team}")
     
+    @staticmethod
+    def _paginate(frame: pd.DataFrame, unit: str, key: str) -> pd.DataFrame:
+        """Page selector for a large table; only the selected ``PAGE_SIZE`` rows are sent to the browser."""
+        n_pages = max(1, -(-len(frame) // PAGE_SIZE))
+        page = st.number_input(f"Trang (1–{n_pages}, {len(frame)} {unit})",
+                               min_value=1, max_value=n_pages, value=1, key=key)
+        return frame.iloc[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+    
     def _render_system_overview(self):
         """Render the system overview tab."""
         st.header("Tổng Quan Hệ Thống")
         
         # Create status summary
         status_counts = {"low": 0, "medium": 0, "high": 0, "critical": 0, "Unknown": 0}
-        for equipment, status in self.agent.equipment_status.items():
-            status_counts[status] = status_counts.get(status, 0) + 1
-        
-        # Dịch tên trạng thái để hiển thị trên biểu đồ
-        status_names = {
-            "low": "Thấp",
-            "medium": "Trung bình", 
-            "high": "Cao", 
-            "critical": "Nguy cấp", 
-            "Unknown": "Không xác định"
-        }
+        status_counts.update(Counter(self.agent.equipment_status.values()))
         
         # Create pie chart for status
         fig = go.Figure(data=[go.Pie(
-            labels=[status_names.get(key, key) for key in status_counts.keys()],
+            labels=[STATUS_NAMES.get(key, key) for key in status_counts.keys()],
             values=list(status_counts.values()),
             hole=.3,
             marker=dict(colors=['green', 'orange', 'red', 'darkred', 'gray'])
@@ -236,55 +382,51 @@ class MaintenanceDashboard:
         fig.update_layout(title_text="Phân Bố Trạng Thái Thiết Bị")
         st.plotly_chart(fig, use_container_width=True)
         
-        # Show all equipment status in a table
+        # Equipment table: filtered, sorted and paginated here, only one page is sent to the browser
         st.subheader("Trạng Thái Tất Cả Thiết Bị")
         
-        equipment_data = []
-        for equipment_id, status in self.agent.equipment_status.items():
-            recommendation = self.agent.maintenance_recommendations.get(equipment_id, {})
-            equipment_data.append({
-                "Mã Thiết Bị": equipment_id,
-                "Trạng Thái": status_names.get(status, status),
-                "Vấn Đề": recommendation.get("issue", "Không xác định"),
-                "Hành Động Khuyến Nghị": recommendation.get("recommendation", "Không có khuyến nghị")[:100] + "..." 
-                                     if recommendation.get("recommendation") and len(recommendation.get("recommendation")) > 100 
-                                     else recommendation.get("recommendation", "Không có khuyến nghị"),
-                "Thời Gian Ngừng (giờ)": recommendation.get("estimated_downtime_hours", "Không xác định")
-            })
-        
-        df = pd.DataFrame(equipment_data)
-        
-        # Color-code the table based on status
-        def color_status(val):
-            status_to_code = {
-                'Thấp': 'low',
-                'Trung bình': 'medium',
-                'Cao': 'high',
-                'Nguy cấp': 'critical',
-                'Không xác định': 'Unknown'
-            }
-            status_code = status_to_code.get(val, val)
-            
-            colors = {
-                'low': 'background-color: #c6efce',
-                'medium': 'background-color: #ffeb9c',
-                'high': 'background-color: #ffc7ce',
-                'critical': 'background-color: #9c0006; color: white',
-                'Unknown': 'background-color: #d9d9d9'
-            }
-            return colors.get(status_code, '')
+        history = self.agent.rollup_store.fleet_summary() if self.agent.rollup_store is not None else None
+        table = build_fleet_table(self.agent.equipment_status, self.agent.maintenance_recommendations, history)
+        
+        col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
+        with col1:
+            statuses = st.multiselect("Lọc theo trạng thái", list(STATUS_NAMES),
+                                      format_func=lambda status: STATUS_NAMES[status])
+        with col2:
+            search = st.text_input("Lọc theo mã thiết bị")
+        with col3:
+            sort_columns = {"status": "Trạng Thái", "Mã Thiết Bị": "Mã Thiết Bị",
+                            "Thời Gian Ngừng (giờ)": "Thời Gian Ngừng (giờ)"}
+            if HISTORY_COLUMN in table.columns:
+                sort_columns[HISTORY_COLUMN] = HISTORY_COLUMN
+            sort_by = st.selectbox("Sắp xếp theo", list(sort_columns), format_func=sort_columns.get)
+        with col4:
+            ascending = st.checkbox("Tăng dần", value=True)
         
-        st.dataframe(df.style.applymap(color_status, subset=['Trạng Thái']))
+        filtered = query_fleet_table(table, statuses, search, sort_by, ascending)
+        page_df = self._paginate(filtered, "thiết bị", key="fleet_page").rename(columns={"status": "Trạng Thái"})
+        styled = page_df.style.map(lambda status: STATUS_STYLES.get(status, ''), subset=['Trạng Thái'])
+        styled = styled.format({"Trạng Thái": lambda status: STATUS_NAMES.get(status, status)})
+        st.dataframe(styled, hide_index=True, use_container_width=True)
         
         # Maintenance plan if available
         if hasattr(self.agent, 'maintenance_plan') and self.agent.maintenance_plan:
             st.subheader("Kế Hoạch Bảo Trì")
             plan = self.agent.maintenance_plan
             
-            st.write(f"**Lịch trình:** {plan.get('schedule', 'Không có thông tin')}")
+            schedule = plan.get('schedule', 'Không có thông tin')
+            if isinstance(schedule, list) and schedule and isinstance(schedule[0], dict):
+                st.write("**Lịch trình:**")
+                st.dataframe(self._paginate(pd.DataFrame(schedule), "công việc", key="plan_page"),
+                             hide_index=True, use_container_width=True)
+            else:
+                st.write(f"**Lịch trình:** {schedule}")
             st.write(f"**Lý do:** {plan.get('justification', 'Không có thông tin')}")
             st.write(f"**Tổng thời gian ngừng hoạt động:** {plan.get('total_downtime_hours', 'Không xác định')} giờ")
-            st.write(f"**Yêu cầu nhân sự:** {plan.get('crew_requirements', 'Không có thông tin cụ thể')}")
+            crew_requirements = plan.get('crew_requirements', 'Không có thông tin cụ thể')
+            if isinstance(crew_requirements, dict):
+                crew_requirements = ", ".join(f"{crew}: {hours:g} giờ" for crew, hours in crew_requirements.items())
+            st.write(f"**Yêu cầu nhân sự:** {crew_requirements}")
             
             st.write("**Danh sách phụ tùng:**")
             for part in plan.get('parts_list', ['Không có thông tin']):
@@ -0,0 +1,46 @@
+"""
+Kiểm thử chấm điểm theo khối của bộ phát hiện bất thường.
+"""
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
+
+from src.models.anomaly_detector import AnomalyDetector, ChunkedScorer, FEATURES
+
+
+@pytest.fixture(scope="module")
+def model_and_features():
+    features = np.random.default_rng(0).normal(0, 1, (5000, len(FEATURES)))
+    model = IsolationForest(n_estimators=20, contamination=0.05, random_state=42).fit(features)
+    return model, features
+
+
+def test_invalid_executor():
+    with pytest.raises(ValueError):
+        ChunkedScorer(None, executor="gpu")
+
+
+@pytest.mark.parametrize("chunk_size, workers, executor", [
+    (5000, 1, "thread"),
+    (777, 1, "thread"),
+    (500, 3, "thread"),
+    (1200, 2, "process"),
+])
+def test_chunked_scores_match_a_single_call(model_and_features, chunk_size, workers, executor):
+    model, features = model_and_features
+
+    scores = ChunkedScorer(model, chunk_size, workers, executor).decision_function(features)
+
+    np.testing.assert_array_equal(scores, model.decision_function(features))
+
+
+def test_detector_flags_negative_scores(readings):
+    detector = AnomalyDetector(chunk_size=128, workers=2)
+
+    result = detector.detect_anomalies(readings)
+
+    assert detector.is_trained
+    assert len(result) == len(readings) and 'anomaly_score' not in readings.columns
+    np.testing.assert_array_equal(result['is_anomaly'].to_numpy(),
+                                  detector.model.predict(readings[FEATURES].to_numpy()) == -1)
+    assert 0 < result['is_anomaly'].mean() < 0.2
@@ -0,0 +1,92 @@
+"""
+Kiểm thử phân tích nhiều thiết bị trong một lần gọi LLM.
+"""
+import json
+import re
+
+import numpy as np
+import pandas as pd
+from langchain_core.runnables import RunnableLambda
+
+from src.advisors.llm_advisor import (LLMAdvisor, NO_ANOMALY_RECOMMENDATION, RECOMMENDATION_OUTPUT_TOKENS,
+                                      format_data_summary, estimate_tokens, pack_summaries,
+                                      parse_json_array, summarize_anomalies)
+from src.models.anomaly_detector import FEATURES
+
+
+def scored_frame(equipment_id, n_anomalies, n=50, seed=0):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({feature: rng.normal(0, 1, n) for feature in FEATURES})
+    data['timestamp'] = pd.date_range("2025-01-01", periods=n, freq="5min")
+    data['equipment_id'] = equipment_id
+    data['days_since_maintenance'] = 30
+    data['anomaly_score'] = 0.1
+    data.loc[:n_anomalies - 1, 'anomaly_score'] = -0.1
+    data['is_anomaly'] = data['anomaly_score'] < 0
+    return data
+
+
+class ScriptedLLM:
+    """Answers batch prompts for at most ``answer_limit`` assets and single prompts in full."""
+
+    def __init__(self, answer_limit=None):
+        self.answer_limit = answer_limit
+        self.prompts = []
+
+    def __call__(self, prompt):
+        text = prompt.to_string()
+        self.prompts.append(text)
+        equipment_ids = re.findall(r"Mã thiết bị: (\S+)", text)
+        answer = {"issue": "Rung bất thường", "recommendation": "Kiểm tra", "severity": "high",
+                  "consequences": "Hỏng ổ trục", "estimated_downtime_hours": 2, "parts_needed": ["Ổ trục"]}
+        if "mảng JSON" not in text:
+            return json.dumps(answer, ensure_ascii=False)
+        answered = equipment_ids[:self.answer_limit] if self.answer_limit else equipment_ids
+        return "```json\n" + json.dumps([dict(answer, equipment_id=e) for e in answered]) + "\n```"
+
+
+def test_parse_json_array():
+    assert parse_json_array('```json\n[{"a": 1}]\n```') == [{"a": 1}]
+    assert parse_json_array('Kết quả: [{"a": 1}, {"a": 2}] xong') == [{"a": 1}, {"a": 2}]
+    assert parse_json_array('{"a": 1}') == [{"a": 1}]
+    assert parse_json_array("không phải JSON") == []
+
+
+def test_pack_summaries_respects_budget():
+    summaries = {f"PUMP-{i}": summarize_anomalies(scored_frame(f"PUMP-{i}", 5)) for i in range(6)}
+    per_asset = estimate_tokens(format_data_summary(summaries["PUMP-0"])) + RECOMMENDATION_OUTPUT_TOKENS
+
+    batches = pack_summaries(sorted(summaries), summaries, token_budget=int(per_asset * 2.5))
+
+    assert [len(batch) for batch in batches] == [2, 2, 2]
+    assert [e for batch in batches for e in batch] == sorted(summaries)
+    assert pack_summaries(["PUMP-0"], summaries, token_budget=1) == [["PUMP-0"]]
+
+
+def test_batch_analysis_uses_one_call_for_the_fleet():
+    llm = ScriptedLLM()
+    advisor = LLMAdvisor(llm=RunnableLambda(llm))
+    frames = {f"PUMP-{i}": scored_frame(f"PUMP-{i}", 5, seed=i) for i in range(3)}
+    frames["VALVE-S22"] = scored_frame("VALVE-S22", 0)
+
+    recommendations = advisor.analyze_anomalies_batch(frames)
+
+    assert len(llm.prompts) == 1
+    assert set(recommendations) == set(frames)
+    assert recommendations["VALVE-S22"] == NO_ANOMALY_RECOMMENDATION
+    assert recommendations["PUMP-0"]["severity"] == "high"
+    assert "equipment_id" not in recommendations["PUMP-0"]
+
+
+def test_assets_missing_from_a_partial_response_are_retried():
+    llm = ScriptedLLM(answer_limit=1)
+    advisor = LLMAdvisor(llm=RunnableLambda(llm))
+    frames = {f"PUMP-{i}": scored_frame(f"PUMP-{i}", 5, seed=i) for i in range(4)}
+
+    recommendations = advisor.analyze_anomalies_batch(frames, max_batch_retries=1)
+
+    assert set(recommendations) == set(frames)
+    # Batch of 4 answers one asset, the retry batch of 3 answers one more, the last two go one by one
+    assert len(llm.prompts) == 4
+    assert sum("mảng JSON" in prompt for prompt in llm.prompts) == 2
+    assert advisor.call_count == 4
@@ -0,0 +1,53 @@
+"""
+Kiểm thử chạy hàng loạt chia shard theo thiết bị.
+"""
+import json
+import os
+
+import pandas as pd
+
+from src.agents.batch_runner import BatchRunner, shard_equipment
+from src.data.results_store import ResultsStore
+
+
+def test_shard_equipment_round_robin():
+    shards = shard_equipment(['C', 'A', 'B', 'D', 'E'], 2)
+    assert shards == [['A', 'C', 'E'], ['B', 'D']]
+
+
+def test_shard_equipment_never_returns_empty_shards():
+    assert shard_equipment(['A', 'B'], 8) == [['A'], ['B']]
+    assert shard_equipment(['A'], 0) == [['A']]
+
+
+def test_run_writes_scores_and_status(tmp_path, readings_csv, readings):
+    output_dir = tmp_path / "out"
+    store_path = str(tmp_path / "results.db")
+    result = BatchRunner([readings_csv], str(output_dir), store_path=store_path).run()
+
+    assert len(result["scores"]) == len(readings)
+    assert set(result["equipment_status"]) == set(readings['equipment_id'])
+    assert result["maintenance_plan"] is None
+
+    scores = pd.read_csv(output_dir / "scores.csv")
+    assert list(scores.columns) == ['timestamp', 'equipment_id', 'anomaly_score', 'is_anomaly']
+    assert len(scores) == len(readings)
+    with open(output_dir / "equipment_status.json", encoding="utf-8") as f:
+        assert json.load(f).keys() == result["equipment_status"].keys()
+    assert not os.path.exists(output_dir / "recommendations.json")
+
+    store = ResultsStore(store_path)
+    try:
+        for equipment_id, group in readings.groupby('equipment_id'):
+            assert len(store.get_scores(equipment_id)) == len(group)
+        assert set(store.latest_status()) == set(readings['equipment_id'])
+    finally:
+        store.close()
+
+
+def test_sharded_run_matches_single_process(tmp_path, readings_csv):
+    single = BatchRunner([readings_csv], str(tmp_path / "single")).run()
+    sharded = BatchRunner([readings_csv], str(tmp_path / "sharded"), workers=2).run()
+
+    pd.testing.assert_frame_equal(single["scores"], sharded["scores"])
+    assert single["equipment_status"] == sharded["equipment_status"]
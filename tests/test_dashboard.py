@@ -0,0 +1,54 @@
+"""
+Kiểm thử các hàm tra cứu bảng thiết bị của bảng điều khiển cho đội thiết bị lớn.
+"""
+import pandas as pd
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("plotly")
+
+from src.ui.maintenance_dashboard import (HISTORY_COLUMN, build_fleet_table,  # noqa: E402
+                                          query_fleet_table, search_equipment)
+
+
+@pytest.fixture
+def table():
+    status = {"PUMP-101": "low", "PUMP-102": "critical", "VALVE-S22": "medium", "COMPRESSOR-A1": "Unknown"}
+    recommendations = {
+        "PUMP-102": {"issue": "Quá nhiệt", "recommendation": "x" * 150, "estimated_downtime_hours": "6"},
+        "VALVE-S22": {"issue": "Kẹt van", "recommendation": "Thay gioăng", "estimated_downtime_hours": "khoảng 2"},
+    }
+    history = pd.DataFrame({"equipment_id": ["PUMP-101", "PUMP-102"], "anomaly_percentage": [1.234, 20.0]})
+    return build_fleet_table(status, recommendations, history)
+
+
+def test_search_equipment_limits_options():
+    ids = [f"PUMP-{i:04d}" for i in range(500)] + ["VALVE-0001"]
+
+    assert search_equipment(ids, " valve ") == (["VALVE-0001"], 1)
+    matches, total = search_equipment(ids, "pump", limit=10)
+    assert len(matches) == 10 and total == 500
+    assert search_equipment(ids, "", limit=3) == (ids[:3], len(ids))
+
+
+def test_build_fleet_table(table):
+    rows = table.set_index("Mã Thiết Bị")
+
+    assert rows.loc["PUMP-101", "Vấn Đề"] == "Không xác định"
+    assert rows.loc["PUMP-101", "Hành Động Khuyến Nghị"] == "Không có khuyến nghị"
+    assert rows.loc["PUMP-102", "Hành Động Khuyến Nghị"] == "x" * 100 + "..."
+    assert rows.loc["PUMP-102", "Thời Gian Ngừng (giờ)"] == 6
+    assert pd.isna(rows.loc["VALVE-S22", "Thời Gian Ngừng (giờ)"])
+    assert rows.loc["PUMP-101", HISTORY_COLUMN] == 1.23
+    assert pd.isna(rows.loc["COMPRESSOR-A1", HISTORY_COLUMN])
+
+
+def test_query_fleet_table_filters_and_sorts(table):
+    by_status = query_fleet_table(table)
+    assert by_status["Mã Thiết Bị"].tolist() == ["PUMP-102", "VALVE-S22", "PUMP-101", "COMPRESSOR-A1"]
+
+    filtered = query_fleet_table(table, statuses=["low", "critical"], search="pump")
+    assert filtered["Mã Thiết Bị"].tolist() == ["PUMP-102", "PUMP-101"]
+
+    by_downtime = query_fleet_table(table, sort_by="Thời Gian Ngừng (giờ)", ascending=False)
+    assert by_downtime["Mã Thiết Bị"].iloc[0] == "PUMP-102"
@@ -0,0 +1,139 @@
+"""
+Kiểm thử giám sát trôi dữ liệu (PSI/KS) theo loại thiết bị và cửa sổ thời gian.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.agents.maintenance_agent import MaintenanceAgent
+from src.models.anomaly_detector import FEATURES
+from src.models.drift_monitor import DriftMonitor, ks_statistic, population_stability_index
+
+PUMPS = ["PUMP-101", "PUMP-102", "PUMP-103"]
+
+
+def readings(start, days, shifts=None, anomalous=(), seed=0):
+    """Standard-normal features every 5 minutes for three pumps; ``shifts`` moves one equipment's temperature."""
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range(start, periods=days * 288, freq="5min")
+    frames = []
+    for equipment_id in PUMPS:
+        frame = pd.DataFrame({feature: rng.normal(0, 1, len(timestamps)) for feature in FEATURES})
+        frame['temperature'] += (shifts or {}).get(equipment_id, 0.0)
+        frame['timestamp'] = timestamps
+        frame['equipment_id'] = equipment_id
+        frame['score'] = -0.1 if equipment_id in anomalous else rng.uniform(0.01, 0.2, len(timestamps))
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def fitted_monitor(**kwargs):
+    monitor = DriftMonitor(**kwargs)
+    reference = readings("2025-01-01", 3, seed=1)
+    monitor.fit_reference(reference, reference['score'].to_numpy())
+    return monitor
+
+
+def check(monitor, data, completed_only=False):
+    return monitor.check(data, data['score'].to_numpy(), completed_only)
+
+
+def test_psi_and_ks_statistics():
+    rng = np.random.default_rng(0)
+    reference = rng.normal(0, 1, (5000, 2))
+    same = rng.normal(0, 1, (5000, 2))
+    shifted = same + np.array([0.0, 2.0])
+
+    assert population_stability_index(reference, same).max() < 0.05
+    psi = population_stability_index(reference, shifted)
+    assert psi[0] < 0.05 and psi[1] > 1.0
+
+    assert ks_statistic(reference, reference).max() == 0
+    assert ks_statistic(reference, same).max() < 0.05
+    assert ks_statistic(reference, reference + 100).min() == 1.0
+
+
+def test_invalid_method():
+    with pytest.raises(ValueError):
+        DriftMonitor(method="chi2")
+
+
+def test_reference_keeps_only_normal_readings():
+    monitor = DriftMonitor(max_reference_size=500)
+    data = readings("2025-01-01", 1, anomalous={"PUMP-101"})
+    monitor.fit_reference(data, data['score'].to_numpy())
+
+    assert set(monitor.reference) == {"PUMP"}
+    assert monitor.reference["PUMP"].shape == (500, len(FEATURES) + 1)
+    assert (monitor.reference["PUMP"][:, -1] >= 0).all()
+    assert monitor.reference_end == data['timestamp'].max()
+
+
+@pytest.mark.parametrize("method", ["psi", "ks"])
+def test_fleet_wide_shift_is_drift(method):
+    monitor = fitted_monitor(method=method)
+    stable = readings("2025-01-04", 2, seed=2)
+    shifted = readings("2025-01-04", 2, shifts={equipment_id: 2.0 for equipment_id in PUMPS}, seed=2)
+
+    assert check(monitor, stable) == []
+    events = check(monitor, shifted)
+    assert {event["column"] for event in events} == {"temperature"}
+    assert {event["equipment_type"] for event in events} == {"PUMP"}
+    assert all(event["value"] > event["threshold"] for event in events)
+
+
+def test_shift_of_a_single_equipment_is_not_drift():
+    monitor = fitted_monitor()
+    data = readings("2025-01-04", 2, shifts={"PUMP-101": 4.0}, seed=2)
+
+    assert check(monitor, data) == []
+
+
+def test_faulty_equipment_is_left_out():
+    monitor = fitted_monitor()
+    data = readings("2025-01-04", 2, shifts={"PUMP-101": 4.0, "PUMP-102": 0.0}, anomalous={"PUMP-101"}, seed=2)
+
+    assert check(monitor, data) == []
+
+
+def test_training_readings_are_not_checked():
+    monitor = fitted_monitor()
+    training = readings("2025-01-01", 3, shifts={equipment_id: 2.0 for equipment_id in PUMPS}, seed=1)
+
+    assert not monitor.pending(training).any()
+    assert check(monitor, training) == []
+
+
+def test_completed_windows_are_checked_once():
+    monitor = fitted_monitor()
+    shifted = readings("2025-01-04", 4, shifts={equipment_id: 2.0 for equipment_id in PUMPS}, seed=2)
+    # Two full days and the first hours of the third
+    data = shifted[shifted['timestamp'] < "2025-01-06 06:00"]
+
+    assert monitor.window_completed(data['timestamp'].max())
+    events = check(monitor, data, completed_only=True)
+    assert sorted({event["window_start"] for event in events}) == ["2025-01-04T00:00:00", "2025-01-05T00:00:00"]
+    assert monitor.checked_until == pd.Timestamp("2025-01-06")
+
+    # The open window is neither complete nor checked
+    assert not monitor.window_completed(data['timestamp'].max())
+    assert check(monitor, data, completed_only=True) == []
+
+    # Once the third day has completed it is checked, alone
+    data = shifted[shifted['timestamp'] < "2025-01-07 01:00"]
+    assert monitor.window_completed(data['timestamp'].max())
+    events = check(monitor, data, completed_only=True)
+    assert {event["window_start"] for event in events} == {"2025-01-06T00:00:00"}
+
+
+def test_persisted_model_is_reused_without_drift(tmp_path, readings_csv):
+    model_path = str(tmp_path / "models" / "detector.joblib")
+    first = MaintenanceAgent(model_path=model_path)
+    first.initialize_system(readings_csv)
+    assert first.retrain_count == 1
+
+    second = MaintenanceAgent(model_path=model_path)
+    second.initialize_system(readings_csv)
+    assert second.retrain_count == 0
+    assert second.drift_events == []
+    assert second.drift_monitor.reference_end == first.drift_monitor.reference_end
@@ -0,0 +1,79 @@
+"""
+Kiểm thử bộ sinh dữ liệu đội thiết bị quy mô lớn theo khối.
+"""
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from src.data.fleet_generator import FleetDataGenerator
+from src.models.anomaly_detector import FEATURES
+
+START = datetime(2025, 1, 1)
+
+
+def generate(chunk_rows, **kwargs):
+    options = dict(n_equipment=7, readings_per_equipment=300, start=START, seed=7)
+    options.update(kwargs)
+    chunks = list(FleetDataGenerator(**options).iter_chunks(chunk_rows))
+    data = pd.concat(chunks, ignore_index=True)
+    data['equipment_id'] = data['equipment_id'].astype(str)
+    return chunks, data.sort_values(['equipment_id', 'timestamp'], kind='stable').reset_index(drop=True)
+
+
+def test_seed_requires_fixed_start():
+    with pytest.raises(ValueError):
+        FleetDataGenerator(n_equipment=1, readings_per_equipment=10, seed=1)
+
+
+def test_chunks_are_bounded_and_complete():
+    chunks, data = generate(chunk_rows=128)
+
+    assert max(len(chunk) for chunk in chunks) <= 128
+    assert len(data) == 7 * 300
+    assert data.groupby('equipment_id').size().eq(300).all()
+    assert list(data.columns) == ['timestamp', 'equipment_id'] + FEATURES + ['last_maintenance']
+
+
+@pytest.mark.parametrize("chunk_rows", [128, 300, 1000])
+def test_data_does_not_depend_on_chunk_size(chunk_rows):
+    _, reference = generate(chunk_rows=7 * 300)
+    _, data = generate(chunk_rows=chunk_rows)
+
+    pd.testing.assert_frame_equal(reference, data)
+
+
+def test_seed_reproducibility():
+    _, first = generate(chunk_rows=500)
+    _, second = generate(chunk_rows=500)
+    _, other = generate(chunk_rows=500, seed=8)
+
+    pd.testing.assert_frame_equal(first, second)
+    assert not first[FEATURES].equals(other[FEATURES])
+
+
+def test_failure_labels_match_injected_faults():
+    generator = FleetDataGenerator(
+        n_equipment=3, readings_per_equipment=400, start=START, seed=1, spike_rate=0.0,
+        failure_patterns={"ramp": {"share": 1.0, "sensor": "vibration", "magnitude": 5.0, "onset": (0.5, 0.6)}}
+    )
+    labels = generator.failure_labels()
+    data = pd.concat(generator.iter_chunks(), ignore_index=True)
+
+    assert sorted(labels['equipment_id']) == sorted(data['equipment_id'].astype(str).unique())
+    assert (labels['pattern'] == "ramp").all() and (labels['sensor'] == "vibration").all()
+    for label in labels.itertuples():
+        series = data[data['equipment_id'] == label.equipment_id]
+        before = series.loc[series['timestamp'] < label.onset_timestamp, 'vibration']
+        last = series['vibration'].tail(20)
+        assert last.mean() > before.mean() + 3
+
+
+def test_write_csv(tmp_path):
+    path = tmp_path / "fleet" / "sensor_data.csv"
+    generator = FleetDataGenerator(n_equipment=4, readings_per_equipment=50, start=START, seed=3)
+
+    assert generator.write(str(path), chunk_rows=60) == 200
+    written = pd.read_csv(path, parse_dates=['timestamp'])
+    assert len(written) == 200
+    assert written['equipment_id'].nunique() == 4
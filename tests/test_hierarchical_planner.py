@@ -0,0 +1,103 @@
+"""
+Kiểm thử lập kế hoạch bảo trì phân cấp (map-reduce) trong giới hạn token.
+"""
+import threading
+
+import pytest
+
+from src.advisors.hierarchical_planner import HierarchicalPlanner, equipment_type
+
+
+class RecordingAdvisor:
+    """Advisor double that records which planning step received which assets."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.full_plans = []
+        self.chunks = []
+        self.merges = []
+
+    def create_maintenance_plan(self, equipment_list, recommendations):
+        self.full_plans.append(list(equipment_list))
+        return {"schedule": [{"equipment_id": equipment} for equipment in equipment_list]}
+
+    def plan_from_summary(self, equipment_data, recommendations):
+        with self.lock:
+            self.chunks.append(sorted(recommendations))
+        return {"schedule": [{"equipment_id": equipment} for equipment in sorted(recommendations)]}
+
+    def merge_maintenance_plans(self, partial_plans, compact_summary=""):
+        with self.lock:
+            self.merges.append((len(partial_plans), compact_summary))
+        return {"schedule": [entry for plan in partial_plans for entry in plan["schedule"]]}
+
+
+def recommendation(severity="high", downtime=4):
+    return {"issue": "Rung bất thường", "severity": severity, "recommendation": "Kiểm tra ổ trục",
+            "estimated_downtime_hours": downtime, "parts_needed": ["Ổ trục"]}
+
+
+def fleet(n_per_type, severity="high"):
+    return {f"{prefix}-{i:03d}": recommendation(severity)
+            for prefix in ("PUMP", "COMPRESSOR") for i in range(n_per_type)}
+
+
+def test_equipment_type():
+    assert equipment_type("compressor-a1") == "COMPRESSOR"
+
+
+def test_invalid_group_by():
+    with pytest.raises(ValueError):
+        HierarchicalPlanner(RecordingAdvisor(), group_by="region")
+
+
+def test_small_fleet_is_planned_in_one_call_without_healthy_assets():
+    advisor = RecordingAdvisor()
+    recommendations = fleet(2)
+    recommendations["VALVE-S22"] = {"recommendation": "Hoạt động bình thường.", "severity": "low"}
+
+    HierarchicalPlanner(advisor).create_maintenance_plan(sorted(recommendations), recommendations)
+
+    assert advisor.full_plans == [sorted(set(recommendations) - {"VALVE-S22"})]
+    assert not advisor.chunks and not advisor.merges
+
+
+def test_large_fleet_is_chunked_by_type_within_budget():
+    advisor = RecordingAdvisor()
+    recommendations = fleet(20)
+    planner = HierarchicalPlanner(advisor, token_budget=400, max_workers=2)
+
+    plan = planner.create_maintenance_plan(sorted(recommendations), recommendations)
+
+    assert not advisor.full_plans
+    assert len(advisor.chunks) > 2
+    assert all(len({equipment_type(equipment) for equipment in chunk}) == 1 for chunk in advisor.chunks)
+    assert sorted(equipment for chunk in advisor.chunks for equipment in chunk) == sorted(recommendations)
+    assert sorted(entry["equipment_id"] for entry in plan["schedule"]) == sorted(recommendations)
+
+
+def test_low_severity_assets_are_only_summarized():
+    advisor = RecordingAdvisor()
+    recommendations = fleet(20)
+    recommendations.update({f"VALVE-{i:03d}": recommendation("low", downtime=1.5) for i in range(7)})
+    planner = HierarchicalPlanner(advisor, token_budget=400)
+
+    planner.create_maintenance_plan(sorted(recommendations), recommendations)
+
+    assert not any(equipment.startswith("VALVE") for chunk in advisor.chunks for equipment in chunk)
+    compact_summary = advisor.merges[-1][1]
+    assert "VALVE: 7 thiết bị" in compact_summary
+    assert "(+2)" in compact_summary
+    assert "10.5 giờ" in compact_summary
+
+
+def test_summarize_compact_tolerates_malformed_downtime():
+    planner = HierarchicalPlanner(RecordingAdvisor())
+    summary = planner.summarize_compact({
+        "PUMP-101": recommendation(downtime="4 giờ"),
+        "PUMP-102": recommendation(downtime=None),
+        "PUMP-103": recommendation(downtime=3),
+    })
+
+    # Unparseable downtimes count with the scheduler's default of 4 hours
+    assert summary == "- PUMP: 3 thiết bị (PUMP-101, PUMP-102, PUMP-103), tổng thời gian ngừng ước tính 11 giờ"
@@ -0,0 +1,67 @@
+"""
+Kiểm thử gộp các lần đọc bất thường liên tiếp thành sự cố.
+"""
+import pandas as pd
+
+from src.models.anomaly_detector import FEATURES
+from src.models.incident_aggregator import INCIDENT_COLUMNS, aggregate_incidents, top_incidents
+
+
+def scored(equipment_id, minutes, anomalous, scores=None, **sensors):
+    """Readings at the given minute offsets; ``sensors`` overrides deviations of all rows."""
+    n = len(minutes)
+    data = pd.DataFrame({feature: sensors.get(feature, [0.0] * n) for feature in FEATURES})
+    data['timestamp'] = pd.Timestamp("2025-01-01") + pd.to_timedelta(minutes, unit="min")
+    data['equipment_id'] = equipment_id
+    data['anomaly_score'] = scores if scores is not None else [-0.1 if flag else 0.1 for flag in anomalous]
+    data['is_anomaly'] = anomalous
+    return data
+
+
+def test_no_anomalies_gives_empty_frame():
+    incidents = aggregate_incidents(scored("PUMP-101", [0, 5], [False, False]))
+
+    assert incidents.empty
+    assert list(incidents.columns) == INCIDENT_COLUMNS
+
+
+def test_gaps_split_incidents_per_equipment():
+    data = pd.concat([
+        # 0-10 one incident (5 min apart), 30 a new one (20 min gap), 40 a normal reading
+        scored("PUMP-101", [0, 5, 10, 30, 40], [True, True, True, True, False],
+               scores=[-0.1, -0.3, -0.2, -0.05, 0.2]),
+        scored("VALVE-S22", [5, 10], [True, True]),
+    ]).sample(frac=1, random_state=0)
+
+    incidents = aggregate_incidents(data, max_gap="15min")
+
+    assert incidents[['equipment_id', 'readings', 'duration_minutes']].values.tolist() == [
+        ["PUMP-101", 3, 10.0], ["PUMP-101", 1, 0.0], ["VALVE-S22", 2, 5.0]
+    ]
+    assert incidents['peak_score'].tolist() == [-0.3, -0.05, -0.1]
+    assert incidents['start'].iloc[1] == pd.Timestamp("2025-01-01 00:30")
+
+    assert len(aggregate_incidents(data, max_gap="30min")) == 2
+    assert len(aggregate_incidents(data, min_readings=2)) == 2
+
+
+def test_dominant_sensor_and_rule_violation():
+    data = scored("COMPRESSOR-A1", [0, 5, 10], [True, True, True],
+                  vibration=[3.0, 2.5, 2.0], temperature=[-1.0, 1.0, -1.0])
+    data['rule_violation'] = ["compressor_vibration_trip", "compressor_high_vibration", "compressor_high_vibration"]
+
+    [incident] = top_incidents(aggregate_incidents(data))
+
+    assert incident["dominant_sensor"] == "vibration"
+    assert incident["dominant_deviation"] == 2.5
+    assert incident["rule_violation"] == "compressor_high_vibration"
+    assert incident["start"] == "2025-01-01T00:00:00"
+
+
+def test_top_incidents_are_largest_in_time_order():
+    data = scored("PUMP-101", [0, 60, 65, 70, 120, 125], [True] * 6)
+
+    top = top_incidents(aggregate_incidents(data), limit=2)
+
+    assert [incident["readings"] for incident in top] == [3, 2]
+    assert top[0]["start"] < top[1]["start"]
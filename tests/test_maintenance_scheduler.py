@@ -0,0 +1,86 @@
+"""
+Kiểm thử bộ lập lịch bảo trì xác định (không gọi LLM) và việc phân công đội.
+"""
+from src.advisors.maintenance_scheduler import MaintenanceScheduler, needs_work_order
+
+
+def recommendation(severity, downtime, parts=("Ổ trục",)):
+    return {"issue": "Bất thường", "severity": severity, "estimated_downtime_hours": downtime,
+            "parts_needed": list(parts)}
+
+
+class JustifyingAdvisor:
+    def __init__(self):
+        self.plans = []
+
+    def justify_schedule(self, plan):
+        self.plans.append(plan)
+        return "Lý do từ LLM"
+
+
+def test_needs_work_order():
+    assert needs_work_order({"issue": "Rung", "severity": "high"})
+    assert not needs_work_order({"recommendation": "Hoạt động bình thường.", "severity": "low"})
+    assert not needs_work_order(None)
+
+
+def test_orders_by_severity_then_shortest_downtime_on_earliest_free_crew():
+    scheduler = MaintenanceScheduler(crews={"Alpha": 0, "Beta": 0})
+    recommendations = {
+        "PUMP-101": recommendation("medium", 1),
+        "PUMP-102": recommendation("critical", 6),
+        "COMPRESSOR-A1": recommendation("critical", 2),
+        "VALVE-S22": recommendation("high", 3),
+    }
+
+    plan = scheduler.create_maintenance_plan(sorted(recommendations), recommendations)
+
+    schedule = [(item["equipment_id"], item["crew"], item["start_hour"], item["end_hour"])
+                for item in plan["schedule"]]
+    assert schedule == [
+        ("COMPRESSOR-A1", "Alpha", 0.0, 2.0),
+        ("PUMP-102", "Beta", 0.0, 6.0),
+        ("VALVE-S22", "Alpha", 2.0, 5.0),
+        ("PUMP-101", "Alpha", 5.0, 6.0),
+    ]
+    assert plan["total_downtime_hours"] == 12
+    assert plan["makespan_hours"] == 6.0
+    assert plan["crew_requirements"] == {"Alpha": 6.0, "Beta": 6.0}
+
+
+def test_crew_availability_offsets_assignment():
+    scheduler = MaintenanceScheduler(crews={"Alpha": 8, "Beta": 0})
+    recommendations = {"PUMP-101": recommendation("high", 2), "PUMP-102": recommendation("high", 3)}
+
+    plan = scheduler.create_maintenance_plan(sorted(recommendations), recommendations)
+
+    assert [(item["crew"], item["start_hour"]) for item in plan["schedule"]] == [("Beta", 0.0), ("Beta", 2.0)]
+    assert plan["crew_requirements"] == {"Beta": 5.0}
+
+
+def test_healthy_assets_and_bad_downtimes():
+    scheduler = MaintenanceScheduler(crews={"Alpha": 0})
+    recommendations = {
+        "PUMP-101": recommendation("high", "không rõ", parts=()),
+        "PUMP-102": {"recommendation": "Hoạt động bình thường.", "severity": "low"},
+        "VALVE-S22": recommendation("medium", -3, parts=("Gioăng", "Ổ trục")),
+    }
+
+    plan = scheduler.create_maintenance_plan(sorted(recommendations), recommendations)
+
+    assert [item["equipment_id"] for item in plan["schedule"]] == ["PUMP-101", "VALVE-S22"]
+    assert [item["downtime_hours"] for item in plan["schedule"]] == [4.0, 0.0]
+    assert plan["parts_quantities"]["Ổ trục"] == 1
+    assert "Gioăng" in plan["parts_list"]
+
+
+def test_advisor_only_writes_the_justification():
+    advisor = JustifyingAdvisor()
+    scheduler = MaintenanceScheduler(crews={"Alpha": 0}, advisor=advisor)
+
+    empty = scheduler.create_maintenance_plan([], {})
+    plan = scheduler.create_maintenance_plan(["PUMP-101"], {"PUMP-101": recommendation("high", 2)})
+
+    assert empty["schedule"] == [] and empty["makespan_hours"] == 0.0
+    assert plan["justification"] == "Lý do từ LLM"
+    assert len(advisor.plans) == 1
@@ -0,0 +1,150 @@
+"""
+Kiểm thử bộ giám sát thích ứng: thứ tự ưu tiên, ngân sách CPU/LLM và chu kỳ quét lại.
+"""
+import time
+
+from src.advisors.llm_advisor import LLMAdvisor
+from src.agents.maintenance_agent import MaintenanceAgent
+from src.agents.monitoring_scheduler import AdaptiveMonitor
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingAdvisor:
+    def __init__(self):
+        self.call_count = 0
+
+
+class ScriptedAgent:
+    """Agent double: processing sets a scripted status and anomaly percentage and may 'call' the LLM."""
+
+    def __init__(self, outcomes, cpu_seconds=0.0):
+        self.outcomes = outcomes
+        self.cpu_seconds = cpu_seconds
+        self.equipment_status = {equipment_id: "Unknown" for equipment_id in outcomes}
+        self.anomaly_percentages = {}
+        self.llm_advisor = CountingAdvisor()
+        self.processed = []
+        self.new_readings = []
+        self.drift_checks = 0
+
+    def ingest_new_data(self):
+        new, self.new_readings = self.new_readings, []
+        for equipment_id in new:
+            self.equipment_status.setdefault(equipment_id, "Unknown")
+        return new
+
+    def check_drift(self, completed_only=False):
+        self.drift_checks += 1
+        return []
+
+    def process_equipment(self, equipment_id, allow_analysis=True):
+        status, percentage = self.outcomes[equipment_id].pop(0)
+        started = time.process_time()
+        while time.process_time() - started < self.cpu_seconds:
+            pass
+        self.processed.append((equipment_id, allow_analysis))
+        if allow_analysis:
+            self.llm_advisor.call_count += 1
+        self.equipment_status[equipment_id] = status
+        self.anomaly_percentages[equipment_id] = percentage
+
+    def update_maintenance_plan(self):
+        return False
+
+    def save_snapshot(self):
+        pass
+
+
+def monitor_for(agent, **kwargs):
+    clock = FakeClock()
+    options = dict(intervals={"critical": 60, "high": 60, "medium": 300, "low": 1800},
+                   cpu_budget_seconds=1000, llm_budget=10, clock=clock)
+    options.update(kwargs)
+    return AdaptiveMonitor(agent, **options), clock
+
+
+def test_risky_assets_are_rescanned_more_often():
+    agent = ScriptedAgent({
+        "PUMP-101": [("low", 1.0)] * 3,
+        "COMPRESSOR-A1": [("critical", 20.0)] * 3,
+    })
+    monitor, clock = monitor_for(agent)
+
+    assert monitor.run_interval()["processed"] == ["PUMP-101", "COMPRESSOR-A1"]
+
+    clock.now = 60
+    assert monitor.run_interval()["processed"] == ["COMPRESSOR-A1"]
+    clock.now = 1800
+    assert monitor.run_interval()["processed"] == ["COMPRESSOR-A1", "PUMP-101"]
+
+
+def test_rising_trend_shortens_the_interval():
+    agent = ScriptedAgent({"VALVE-S22": [("medium", 4.0), ("medium", 6.0), ("medium", 5.0)]})
+    monitor, clock = monitor_for(agent, trend_factor=0.5)
+
+    monitor.run_interval()
+    assert monitor.next_interval("VALVE-S22") == 300
+    clock.now = 300
+    monitor.run_interval()
+    assert monitor.next_interval("VALVE-S22") == 150
+    clock.now = 450
+    assert monitor.run_interval()["processed"] == ["VALVE-S22"]
+    assert monitor.next_interval("VALVE-S22") == 300
+
+
+def test_llm_budget_defers_analysis():
+    agent = ScriptedAgent({f"PUMP-{i}": [("high", 10.0)] for i in range(4)})
+    monitor, _ = monitor_for(agent, llm_budget=2)
+
+    result = monitor.run_interval()
+
+    assert len(result["processed"]) == 4
+    assert result["llm_calls"] == 2
+    assert [allowed for _, allowed in agent.processed] == [True, True, False, False]
+
+
+def test_cpu_budget_defers_assets_to_the_next_interval():
+    agent = ScriptedAgent({f"PUMP-{i}": [("low", 0.0)] for i in range(3)}, cpu_seconds=0.02)
+    monitor, _ = monitor_for(agent, cpu_budget_seconds=0.01)
+
+    first = monitor.run_interval()
+    assert len(first["processed"]) == 1 and first["deferred"] == 2
+
+    second = monitor.run_interval()
+    assert len(second["processed"]) == 1 and second["deferred"] == 1
+    assert first["processed"] != second["processed"]
+
+
+def test_new_readings_trigger_drift_check_and_scan_new_equipment():
+    agent = ScriptedAgent({"PUMP-101": [("low", 0.0)], "PUMP-999": [("high", 12.0)]})
+    del agent.equipment_status["PUMP-999"]
+    monitor, clock = monitor_for(agent)
+
+    monitor.run_interval()
+    assert agent.drift_checks == 0
+
+    clock.now = 10
+    agent.new_readings = ["PUMP-999"]
+    result = monitor.run_interval()
+    assert result["new_readings_for"] == ["PUMP-999"]
+    assert result["processed"] == ["PUMP-999"]
+    assert agent.drift_checks == 1
+
+
+def test_interval_with_real_agent_counts_llm_calls(readings_csv, fake_llm):
+    agent = MaintenanceAgent(llm_advisor=LLMAdvisor(llm=fake_llm.as_runnable()))
+    agent.initialize_system(readings_csv)
+    monitor, _ = monitor_for(agent)
+
+    result = monitor.run_interval()
+
+    assert sorted(result["processed"]) == sorted(agent.equipment_status)
+    assert result["llm_calls"] == fake_llm.calls
+    assert "Unknown" not in agent.equipment_status.values()
@@ -0,0 +1,93 @@
+"""
+Kiểm thử chỉ mục láng giềng gần nhất dùng lại khuyến nghị đã phân tích.
+"""
+import joblib
+import numpy as np
+import pytest
+
+from src.advisors.llm_advisor import LLMAdvisor
+from src.advisors.recommendation_index import RecommendationIndex, summary_vector
+from tests.test_batch_analysis import scored_frame
+
+
+def summary(equipment_id="PUMP-101", temperature=0.0, anomaly_percentage=5.0, **values):
+    return {"equipment_id": equipment_id, "avg_temperature": temperature, "avg_pressure": 0.0,
+            "avg_vibration": 0.0, "avg_flow_rate": 0.0, "avg_power_consumption": 0.0,
+            "anomaly_percentage": anomaly_percentage, "days_since_maintenance": 30, **values}
+
+
+def test_summary_vector_scales_components():
+    vector = summary_vector(summary(temperature=1.5, anomaly_percentage=20.0, days_since_maintenance=60,
+                                    avg_vibration=np.nan))
+
+    np.testing.assert_array_equal(vector, [1.5, 0.0, 0.0, 0.0, 0.0, 2.0, 2.0])
+
+
+def test_nearest_matches_brute_force_across_growth():
+    rng = np.random.default_rng(0)
+    index = RecommendationIndex()
+    stored = [summary(f"PUMP-{i}", temperature=t) for i, t in enumerate(rng.normal(0, 3, 40))]
+    for i, item in enumerate(stored):
+        index.add(item, {"issue": f"vấn đề {i}"})
+
+    query = summary("PUMP-999", temperature=1.23)
+    entry, distance = index.nearest(query)
+
+    distances = [np.linalg.norm(summary_vector(item) - summary_vector(query)) for item in stored]
+    assert len(index) == 40
+    assert entry["equipment_id"] == stored[int(np.argmin(distances))]["equipment_id"]
+    assert distance == pytest.approx(min(distances))
+
+
+def test_lookup_reuses_only_close_summaries_of_the_same_type():
+    index = RecommendationIndex(max_distance=0.5)
+    recommendation = {"issue": "Quá nhiệt", "severity": "high"}
+    index.add(summary("PUMP-101", temperature=2.0), recommendation)
+
+    reused = index.lookup(summary("PUMP-102", temperature=2.3))
+    assert reused["issue"] == "Quá nhiệt"
+    assert reused["reused_from"]["equipment_id"] == "PUMP-101"
+    assert reused["reused_from"]["distance"] == pytest.approx(0.3)
+    assert "reused_from" not in recommendation
+
+    assert index.lookup(summary("PUMP-102", temperature=3.0)) is None
+    assert index.lookup(summary("VALVE-S22", temperature=2.0)) is None
+    assert (index.hits, index.misses) == (1, 2)
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "index" / "recommendations.joblib")
+    index = RecommendationIndex(path=path)
+    index.save()
+    assert not (tmp_path / "index").exists()
+
+    index.add(summary("PUMP-101", temperature=2.0), {"issue": "Quá nhiệt"})
+    index.add(summary("VALVE-S22"), {"issue": "Kẹt van"})
+    index.save()
+
+    restored = RecommendationIndex(path=path)
+    assert len(restored) == 2
+    assert restored.lookup(summary("PUMP-103", temperature=2.1))["issue"] == "Quá nhiệt"
+    # Appending after a load grows the restored matrix
+    restored.add(summary("PUMP-104", temperature=-2.0), {"issue": "Lạnh"})
+    assert restored.lookup(summary("PUMP-105", temperature=-2.0))["issue"] == "Lạnh"
+
+
+def test_index_with_other_components_is_ignored(tmp_path):
+    path = str(tmp_path / "old.joblib")
+    joblib.dump({"version": 1, "components": ["avg_temperature"], "types": {}}, path)
+
+    assert not RecommendationIndex().load(path)
+    assert len(RecommendationIndex(path=path)) == 0
+
+
+def test_advisor_reuses_analyses_of_similar_equipment(fake_llm):
+    advisor = LLMAdvisor(llm=fake_llm.as_runnable(), recommendation_index=RecommendationIndex(max_distance=0.5))
+
+    first = advisor.analyze_anomaly(scored_frame("PUMP-101", 5))
+    second = advisor.analyze_anomaly(scored_frame("PUMP-102", 5))
+    other_type = advisor.analyze_anomaly(scored_frame("VALVE-S22", 5))
+
+    assert fake_llm.calls == 2
+    assert "reused_from" not in first and "reused_from" not in other_type
+    assert second["reused_from"]["equipment_id"] == "PUMP-101"
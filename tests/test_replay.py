@@ -0,0 +1,85 @@
+"""
+Kiểm thử phát lại dữ liệu lịch sử qua agent với LLM giả lập.
+"""
+import json
+import math
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from src.agents.replay import FAKE_RECOMMENDATION, FakeLLM, ReplayHarness, format_report, load_fault_labels
+from src.data.fleet_generator import FleetDataGenerator
+
+
+class SimulatedTime:
+    """Clock that only advances when the harness sleeps."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def fleet(tmp_path):
+    generator = FleetDataGenerator(
+        n_equipment=3, readings_per_equipment=864, start=datetime(2025, 1, 1), seed=5,
+        failure_patterns={"step": {"share": 1.0, "sensor": "flow_rate", "magnitude": 0.3, "onset": (0.6, 0.7)}}
+    )
+    data_path = tmp_path / "fleet.csv"
+    labels_path = tmp_path / "labels.csv"
+    generator.write(str(data_path))
+    generator.failure_labels().to_csv(labels_path, index=False)
+    return str(data_path), load_fault_labels(str(labels_path))
+
+
+def test_fake_llm_answers_analysis_prompts():
+    llm = FakeLLM()
+
+    assert llm('Trả lời với các khóa: "issue", "severity"') == json.dumps(FAKE_RECOMMENDATION, ensure_ascii=False)
+    assert "LLM giả lập" in llm("Hãy giải thích kế hoạch")
+    assert llm.calls == 2
+
+
+def test_invalid_warmup():
+    with pytest.raises(ValueError):
+        ReplayHarness("unused.csv", warmup=1.0)
+
+
+def test_replay_report(fleet):
+    data_path, labels = fleet
+    harness = ReplayHarness(data_path, speedup=None, tick="6h", fault_labels=labels)
+
+    report = harness.run()
+
+    data = harness.data
+    assert report["readings"] == int((data['timestamp'] > harness.replay_start).sum())
+    assert report["equipment"] == 3
+    assert report["lag_seconds"] is None
+    assert report["llm_calls"] == harness.fake_llm.calls > 0
+    assert sorted(d["equipment_id"] for d in report["detections"]) == sorted(labels['equipment_id'])
+    assert any(d["detected_at"] is not None for d in report["detections"])
+    for detection in report["detections"]:
+        if detection["detected_at"] is not None:
+            assert pd.Timestamp(detection["detected_at"]) >= pd.Timestamp(detection["onset"])
+            assert detection["time_to_detect_minutes"] >= 0
+    assert "Đã phát lại" in format_report(report)
+
+
+def test_paced_replay_measures_lag(fleet):
+    data_path, labels = fleet
+    simulated = SimulatedTime()
+    harness = ReplayHarness(data_path, speedup=3600, tick="6h", fault_labels=labels,
+                            clock=simulated.clock, sleep=simulated.sleep)
+
+    report = harness.run()
+
+    # Each 6 h tick is due 6 s apart at 3600x; the simulated clock never runs late
+    assert report["ticks"] == math.ceil(report["simulated_seconds"] / (6 * 3600))
+    assert report["lag_seconds"]["max"] == 0.0
+    assert report["achieved_speedup"] == pytest.approx(3600)
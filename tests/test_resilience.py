@@ -0,0 +1,139 @@
+"""
+Kiểm thử giới hạn tốc độ, cầu dao và cơ chế thử lại của lời gọi LLM.
+"""
+import threading
+import time
+
+import pytest
+
+from src.advisors.resilience import (CircuitBreaker, CircuitOpenError, LLMUnavailableError, ResilientCaller,
+                                     TokenBucket, is_transient)
+
+
+class ProviderError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+def test_is_transient():
+    assert is_transient(ProviderError(429))
+    assert is_transient(ProviderError(503))
+    assert is_transient(TimeoutError())
+    assert not is_transient(ProviderError(400))
+    assert not is_transient(ValueError("sai khóa API"))
+
+    wrapped = RuntimeError("lỗi bọc")
+    wrapped.__cause__ = ConnectionError()
+    assert is_transient(wrapped)
+
+
+@pytest.mark.parametrize("rate", [0, -1, float("nan")])
+def test_token_bucket_requires_positive_rate(rate):
+    with pytest.raises(ValueError):
+        TokenBucket(rate)
+
+
+def test_token_bucket_limits_and_refills():
+    bucket = TokenBucket(rate_per_minute=60, capacity=2)
+    assert bucket.acquire()
+    assert bucket.acquire()
+    assert not bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0.1)
+
+    fast = TokenBucket(rate_per_minute=6000, capacity=1)
+    assert fast.acquire()
+    assert fast.acquire(timeout=1.0)
+    # Requests larger than the capacity are clamped instead of waiting forever
+    assert fast.acquire(amount=50, timeout=1.0)
+
+
+def test_circuit_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_half_open_breaker_allows_a_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+    # A failed probe re-opens the breaker, a successful one closes it
+    breaker.record_failure()
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_transient_errors_are_retried():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ProviderError(503)
+        return "ok"
+
+    caller = ResilientCaller(base_delay=0, max_retries=3)
+    assert caller.call(flaky) == "ok"
+    assert len(attempts) == 3
+    assert caller.breaker.state == "closed"
+
+
+def test_permanent_errors_fail_at_once():
+    attempts = []
+
+    def invalid():
+        attempts.append(1)
+        raise ValueError("sai khóa API")
+
+    caller = ResilientCaller(base_delay=0)
+    with pytest.raises(LLMUnavailableError) as excinfo:
+        caller.call(invalid)
+    assert len(attempts) == 1
+    assert isinstance(excinfo.value.__cause__, ValueError)
+
+
+def test_open_breaker_rejects_without_calling():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    called = []
+
+    with pytest.raises(CircuitOpenError):
+        ResilientCaller(breaker=breaker).call(lambda: called.append(1))
+    assert not called
+
+
+def test_hung_calls_are_bounded_per_caller():
+    release = threading.Event()
+    caller = ResilientCaller(call_timeout=0.05, max_retries=0, max_in_flight=1,
+                             breaker=CircuitBreaker(failure_threshold=10))
+    other = ResilientCaller()
+    try:
+        with pytest.raises(LLMUnavailableError):
+            caller.call(release.wait)
+
+        started = time.monotonic()
+        with pytest.raises(LLMUnavailableError, match="chưa trả về"):
+            caller.call(lambda: "ok")
+        assert time.monotonic() - started < 1.0
+
+        # Another caller has its own threads
+        assert other.call(lambda: "ok") == "ok"
+    finally:
+        release.set()
@@ -0,0 +1,93 @@
+"""
+Kiểm thử kho kết quả SQLite và việc dùng lại kết quả đã lưu khi khởi động lại.
+"""
+import pandas as pd
+import pytest
+
+from src.advisors.llm_advisor import LLMAdvisor
+from src.agents.maintenance_agent import MaintenanceAgent
+from src.data.results_store import ResultsStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"))
+    yield store
+    store.close()
+
+
+def scores_frame(timestamps, scores, equipment_id="PUMP-101"):
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(timestamps),
+        'equipment_id': equipment_id,
+        'anomaly_score': scores,
+        'is_anomaly': [score < 0 for score in scores]
+    })
+
+
+def test_save_scores_upserts_by_equipment_and_timestamp(store):
+    store.save_scores(scores_frame(["2025-01-01 00:00", "2025-01-01 00:05"], [0.1, -0.2]))
+    store.save_scores(scores_frame(["2025-01-01 00:05", "2025-01-01 00:10"], [0.3, 0.4]))
+    store.save_scores(scores_frame(["2025-01-01 00:05"], [-0.5], equipment_id="VALVE-S22"))
+
+    scores = store.get_scores("PUMP-101")
+    assert scores['anomaly_score'].tolist() == [0.1, 0.3, 0.4]
+    assert scores['is_anomaly'].tolist() == [False, False, False]
+    assert len(store.get_scores("PUMP-101", start="2025-01-01 00:05", end="2025-01-01 00:05")) == 1
+    assert store.get_scores("VALVE-S22")['is_anomaly'].tolist() == [True]
+
+
+def test_latest_entries_win(store):
+    store.save_status({"PUMP-101": "low", "VALVE-S22": "high"}, recorded_at="2025-01-01T00:00:00.000000")
+    store.save_status({"PUMP-101": "critical"}, {"PUMP-101": 20.0}, recorded_at="2025-01-02T00:00:00.000000")
+    store.save_recommendations({"PUMP-101": {"issue": "cũ"}}, recorded_at="2025-01-01T00:00:00.000000")
+    store.save_recommendations({"PUMP-101": {"issue": "mới"}}, recorded_at="2025-01-02T00:00:00.000000")
+    store.save_plan({"schedule": []}, created_at="2025-01-01T00:00:00.000000")
+    store.save_plan({"schedule": [{"equipment_id": "PUMP-101"}]}, created_at="2025-01-02T00:00:00.000000")
+
+    assert store.latest_status() == {"PUMP-101": "critical", "VALVE-S22": "high"}
+    assert store.latest_recommendations() == {"PUMP-101": {"issue": "mới"}}
+    assert store.latest_plan() == {"schedule": [{"equipment_id": "PUMP-101"}]}
+    assert store.status_history("PUMP-101")['status'].tolist() == ["low", "critical"]
+
+
+def test_metadata_and_signatures(store):
+    assert store.get_metadata("data_key") is None
+    store.set_metadata("data_key", "abc")
+    store.set_metadata("data_key", "def")
+    store.save_signatures({"PUMP-101": {"anomaly_count": 3.0}})
+
+    assert store.get_metadata("data_key") == "def"
+    assert store.latest_signatures() == {"PUMP-101": {"anomaly_count": 3.0}}
+
+
+def test_agent_persists_every_row_once_and_reuses_results(tmp_path, readings_csv, readings, fake_llm):
+    db_path = str(tmp_path / "results.db")
+
+    def start_agent():
+        store = ResultsStore(db_path)
+        agent = MaintenanceAgent(results_store=store, llm_advisor=LLMAdvisor(llm=fake_llm.as_runnable()))
+        agent.initialize_system(readings_csv)
+        return agent, store
+
+    agent, store = start_agent()
+    try:
+        assert not agent.load_results()
+        agent.process_all_equipment()
+        # A second pass over unchanged data writes no score rows past the watermark
+        agent.process_all_equipment()
+        for equipment_id, group in readings.groupby('equipment_id'):
+            assert len(store.get_scores(equipment_id)) == len(group)
+        status = dict(agent.equipment_status)
+    finally:
+        store.close()
+
+    restarted, store = start_agent()
+    try:
+        calls = fake_llm.calls
+        assert restarted.load_results()
+        assert restarted.equipment_status == status
+        assert restarted.maintenance_plan is not None
+        assert fake_llm.calls == calls
+    finally:
+        store.close()
@@ -0,0 +1,139 @@
+"""
+Kiểm thử dữ liệu tổng hợp nhiều độ phân giải và việc cập nhật tăng dần (upsert) theo bucket.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.advisors.llm_advisor import LLMAdvisor
+from src.agents.maintenance_agent import MaintenanceAgent
+from src.data.rollups import RESOLUTIONS, RollupStore, coarsen_rollup, compute_rollup
+from src.models.anomaly_detector import FEATURES
+from tests.conftest import make_readings
+
+
+def scored_readings(seed=0, days=2, freq="30s"):
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range("2025-01-01", periods=int(pd.Timedelta(days=days) / pd.Timedelta(freq)), freq=freq)
+    frames = []
+    for equipment_id in ("PUMP-101", "VALVE-S22"):
+        frame = pd.DataFrame({feature: rng.normal(0, 1, len(timestamps)) for feature in FEATURES})
+        frame['timestamp'] = timestamps
+        frame['equipment_id'] = equipment_id
+        frame['is_anomaly'] = rng.random(len(timestamps)) < 0.05
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def open_store(tmp_path, name):
+    return RollupStore(str(tmp_path / f"{name}.db"))
+
+
+def all_resolutions(store, equipment_id="PUMP-101"):
+    return {resolution: store.query(equipment_id, resolution=resolution) for resolution in RESOLUTIONS}
+
+
+def assert_same_rollups(store, expected):
+    for equipment_id in ("PUMP-101", "VALVE-S22"):
+        for resolution, frame in all_resolutions(expected, equipment_id).items():
+            pd.testing.assert_frame_equal(store.query(equipment_id, resolution=resolution), frame)
+
+
+def test_coarsened_rollup_equals_direct_rollup():
+    data = scored_readings()
+    minute = compute_rollup(data, "1min")
+
+    pd.testing.assert_frame_equal(coarsen_rollup(minute, "1h"), compute_rollup(data, "1h"),
+                                  check_dtype=False)
+
+
+def test_query_returns_bucket_statistics(tmp_path):
+    data = scored_readings()
+    store = open_store(tmp_path, "rollups")
+    assert store.append(data) == len(data)
+
+    hourly = store.query("PUMP-101", resolution="1h")
+    pump = data[data['equipment_id'] == "PUMP-101"]
+    expected = pump.groupby(pump['timestamp'].dt.floor("1h"))
+
+    assert len(hourly) == 48 and hourly.attrs["resolution"] == "1h"
+    np.testing.assert_allclose(hourly['temperature_mean'], expected['temperature'].mean())
+    np.testing.assert_allclose(hourly['vibration_max'], expected['vibration'].max())
+    np.testing.assert_allclose(hourly['anomaly_percentage'], expected['is_anomaly'].mean() * 100)
+    assert hourly['count'].eq(120).all()
+
+
+def test_incremental_appends_equal_one_append(tmp_path):
+    data = scored_readings()
+    full = open_store(tmp_path, "full")
+    full.append(data)
+
+    incremental = open_store(tmp_path, "incremental")
+    # Batches split inside hours and days, as new readings arrive
+    for start in pd.date_range("2025-01-01", periods=7, freq="7h17min"):
+        batch = data[(data['timestamp'] >= start) & (data['timestamp'] < start + pd.Timedelta("7h17min"))]
+        incremental.append(batch)
+
+    assert_same_rollups(incremental, full)
+
+
+def test_backfill_and_rescoring_replace_buckets(tmp_path):
+    data = scored_readings()
+    full = open_store(tmp_path, "full")
+    full.append(data)
+
+    store = open_store(tmp_path, "upserted")
+    gap = (data['timestamp'] >= "2025-01-01 10:00") & (data['timestamp'] < "2025-01-01 13:30")
+    store.append(data[~gap])
+    # Backfilled readings arrive late
+    store.append(data[gap])
+
+    # Re-scored readings: the same minutes with different flags replace the stored ones
+    rescored = data.copy()
+    rescored['is_anomaly'] = ~rescored['is_anomaly']
+    store.append(rescored)
+    store.append(data)
+
+    assert_same_rollups(store, full)
+
+
+@pytest.mark.parametrize("span, max_points, expected", [
+    ("2h", 2500, "1min"),
+    ("10D", 2500, "1h"),
+    ("10D", 100, "1d"),
+])
+def test_choose_resolution(tmp_path, span, max_points, expected):
+    store = open_store(tmp_path, "rollups")
+    start = pd.Timestamp("2025-01-01")
+
+    assert store.choose_resolution("PUMP-101", start, start + pd.Timedelta(span), max_points) == expected
+
+
+def test_fleet_summary(tmp_path):
+    data = scored_readings()
+    store = open_store(tmp_path, "rollups")
+    store.append(data)
+
+    summary = store.fleet_summary().set_index('equipment_id')
+    expected = data.groupby('equipment_id')['is_anomaly']
+
+    assert summary['readings'].to_dict() == expected.size().to_dict()
+    assert summary['anomalies'].to_dict() == expected.sum().to_dict()
+    assert store.fleet_summary(start="2025-01-02")['readings'].eq(2880).all()
+
+
+def test_agent_keeps_rollups_in_step_with_new_readings(tmp_path, readings_csv, fake_llm):
+    store = open_store(tmp_path, "agent")
+    agent = MaintenanceAgent(rollup_store=store, llm_advisor=LLMAdvisor(llm=fake_llm.as_runnable()))
+    agent.initialize_system(readings_csv)
+    agent.process_all_equipment()
+
+    # More readings are appended to the source file
+    later = make_readings(n_per_equipment=300, seed=1)
+    later = later[later['timestamp'] > pd.read_csv(readings_csv, parse_dates=['timestamp'])['timestamp'].max()]
+    later.to_csv(readings_csv, mode="a", header=False, index=False)
+    assert agent.ingest_new_data()
+    agent.process_all_equipment()
+
+    summary = store.fleet_summary().set_index('equipment_id')['readings']
+    assert summary.to_dict() == agent.data_processor.data.groupby('equipment_id').size().to_dict()
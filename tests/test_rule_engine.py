@@ -0,0 +1,124 @@
+"""
+Kiểm thử bộ luật ngưỡng kỹ thuật được đánh giá theo nhóm, vector hóa.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from src.models.anomaly_detector import FEATURES
+from src.models.rule_engine import RuleEngine, load_rules, more_severe, rule_threshold
+
+RULES = {
+    "COMPRESSOR": [
+        {"name": "compressor_high_vibration", "sensor": "vibration", "op": ">", "threshold": 1.4, "severity": "high"},
+        {"name": "compressor_vibration_trip", "sensor": "vibration", "op": ">", "threshold": 1.8,
+         "severity": "critical"},
+        {"name": "compressor_vibration_watch", "sensor": "vibration", "op": ">=", "threshold": 1.0,
+         "severity": "medium"},
+    ],
+    "VALVE": [
+        {"name": "valve_low_flow", "sensor": "flow_rate", "op": "<", "nominal": 110, "percent": 70, "severity": "high"},
+        {"name": "valve_very_low_flow", "sensor": "flow_rate", "op": "<", "threshold": 30, "severity": "medium"},
+    ],
+}
+
+
+def frame(rows):
+    """Readings with nominal values for every sensor a row does not set."""
+    nominal = {"temperature": 65.0, "pressure": 100.0, "vibration": 0.5, "flow_rate": 150.0,
+               "power_consumption": 75.0}
+    return pd.DataFrame([{**nominal, **row} for row in rows], columns=["equipment_id"] + FEATURES)
+
+
+def names(engine, data):
+    return list(engine.rule_names[engine.evaluate(data)])
+
+
+def test_rule_threshold_and_severity_order():
+    assert rule_threshold({"threshold": 95}) == 95.0
+    assert rule_threshold({"nominal": 110, "percent": 70}) == pytest.approx(77.0)
+    assert more_severe("low", "critical") == "critical"
+    assert more_severe("high", "medium") == "high"
+    assert more_severe("medium", None) == "medium"
+    assert more_severe("Unknown", "low") == "low"
+
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError):
+        RuleEngine({"PUMP": [{"name": "x", "sensor": "vibration", "op": "!=", "threshold": 1}]})
+    with pytest.raises(ValueError):
+        RuleEngine({"PUMP": [{"name": "x", "sensor": "vibration", "op": ">", "threshold": 1, "severity": "fatal"}]})
+
+
+def test_most_severe_violated_rule_wins_within_a_group():
+    engine = RuleEngine(RULES)
+    data = frame([
+        {"equipment_id": "COMPRESSOR-A1", "vibration": 0.5},
+        {"equipment_id": "COMPRESSOR-A1", "vibration": 1.0},
+        {"equipment_id": "COMPRESSOR-A1", "vibration": 1.5},
+        {"equipment_id": "COMPRESSOR-B2", "vibration": 1.9},
+        # Rules of another type do not apply
+        {"equipment_id": "PUMP-101", "vibration": 5.0},
+    ])
+
+    assert names(engine, data) == ["", "compressor_vibration_watch", "compressor_high_vibration",
+                                   "compressor_vibration_trip", ""]
+
+
+def test_less_than_rules_and_nominal_percent():
+    engine = RuleEngine(RULES)
+    data = frame([
+        {"equipment_id": "VALVE-S22", "flow_rate": 100.0},
+        {"equipment_id": "VALVE-S22", "flow_rate": 77.0},
+        {"equipment_id": "VALVE-S22", "flow_rate": 50.0},
+        {"equipment_id": "valve-s23", "flow_rate": 20.0},
+    ])
+
+    # 77 is not strictly below 70% of 110; below 30 both rules fire and "high" outranks "medium"
+    assert names(engine, data) == ["", "", "valve_low_flow", "valve_low_flow"]
+
+
+def test_missing_values_violate_nothing():
+    engine = RuleEngine(RULES)
+    data = frame([
+        {"equipment_id": "COMPRESSOR-A1", "vibration": np.nan},
+        {"equipment_id": "VALVE-S22", "flow_rate": np.nan},
+        {"equipment_id": None, "vibration": 3.0},
+    ])
+
+    assert list(engine.evaluate(data)) == [-1, -1, -1]
+
+
+def test_thresholds_are_mapped_into_the_scaled_space():
+    raw = frame([{"equipment_id": "COMPRESSOR-A1", "vibration": value} for value in (0.5, 1.2, 1.6, 2.0)])
+    scaler = StandardScaler().fit(raw[FEATURES])
+    scaled = raw.copy()
+    scaled[FEATURES] = scaler.transform(raw[FEATURES])
+
+    assert names(RuleEngine(RULES, scaler), scaled) == names(RuleEngine(RULES), raw)
+
+
+def test_apply_flags_violations_as_anomalies():
+    engine = RuleEngine(RULES)
+    data = frame([
+        {"equipment_id": "COMPRESSOR-A1", "vibration": 1.9},
+        {"equipment_id": "COMPRESSOR-A1", "vibration": 0.1},
+        {"equipment_id": "VALVE-S22", "flow_rate": 150.0},
+    ])
+    data['is_anomaly'] = [False, False, True]
+
+    result = engine.apply(data)
+
+    assert result['is_anomaly'].tolist() == [True, False, True]
+    assert result['rule_violation'].tolist() == ["compressor_vibration_trip", "", ""]
+    assert engine.worst_severity(result) == "critical"
+    assert engine.worst_severity(result.iloc[1:]) is None
+
+
+def test_repository_rules_load():
+    rules = load_rules()
+
+    assert {"PUMP", "COMPRESSOR", "VALVE"} <= set(rules)
+    assert load_rules("không/tồn/tại.json") == {}
+    RuleEngine(rules)
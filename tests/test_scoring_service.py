@@ -0,0 +1,100 @@
+"""
+Kiểm thử dịch vụ chấm điểm HTTP và việc gom yêu cầu thành lô.
+"""
+import asyncio
+import math
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from src.models.anomaly_detector import FEATURES
+from src.service.scoring_service import RequestBatcher, _parse_readings, create_app
+
+
+def reading(equipment_id="PUMP-101", **overrides):
+    values = {"equipment_id": equipment_id, "temperature": 65.0, "pressure": 100.0, "vibration": 0.5,
+              "flow_rate": 150.0, "power_consumption": 75.0}
+    values.update(overrides)
+    return values
+
+
+def test_parse_readings_accepts_single_and_list_payloads():
+    assert set(FEATURES) <= set(reading())
+    assert _parse_readings(reading()) == [reading()]
+    assert _parse_readings({"readings": [reading(), reading("VALVE-S22")]})[1]["equipment_id"] == "VALVE-S22"
+
+
+@pytest.mark.parametrize("payload", [
+    {"readings": []},
+    {"readings": ["not a reading"]},
+    reading(temperature=None),
+    reading(temperature="65"),
+    reading(temperature=True),
+    reading(pressure=math.nan),
+    reading(vibration=math.inf),
+])
+def test_parse_readings_rejects_invalid_payloads(payload):
+    with pytest.raises(ValueError):
+        _parse_readings(payload)
+
+
+def test_concurrent_requests_are_scored_in_one_batch(trained_agent):
+    requests = [[reading(equipment_id)] for equipment_id in ("PUMP-101", "COMPRESSOR-A1", "VALVE-S22")]
+    requests.append([reading(temperature=70.0), reading(vibration=0.7)])
+
+    async def run():
+        batcher = RequestBatcher(trained_agent, max_batch_size=64, max_wait_ms=200)
+        await batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(readings) for readings in requests)), batcher
+        finally:
+            await batcher.stop()
+
+    results, batcher = asyncio.run(run())
+
+    assert list(batcher.batch_sizes) == [5]
+    assert [len(result) for result in results] == [1, 1, 1, 2]
+    # Coalescing does not change the scores: each request is scored as if it were alone
+    for readings, result in zip(requests, results):
+        assert batcher._score_batch([readings])[0] == result
+    assert batcher.latency_stats()["count"] == len(requests)
+
+
+def test_batch_is_closed_at_max_batch_size(trained_agent):
+    async def run():
+        batcher = RequestBatcher(trained_agent, max_batch_size=2, max_wait_ms=200)
+        await batcher.start()
+        try:
+            await asyncio.gather(*(batcher.submit([reading()]) for _ in range(4)))
+        finally:
+            await batcher.stop()
+        return batcher
+
+    assert list(asyncio.run(run()).batch_sizes) == [2, 2]
+
+
+def test_score_batch_reports_rule_violations(trained_agent):
+    batcher = RequestBatcher(trained_agent)
+    [result] = batcher._score_batch([[reading(temperature=120.0), reading(), {**reading(), "equipment_id": None}]])
+
+    assert result[0]["rule_violation"] == "pump_high_temperature"
+    assert result[0]["is_anomaly"] is True
+    assert result[1]["rule_violation"] is None
+    assert result[2]["equipment_id"] is None and result[2]["rule_violation"] is None
+
+
+def test_score_endpoint(trained_agent):
+    async def run():
+        async with TestClient(TestServer(create_app(trained_agent, max_wait_ms=1))) as client:
+            ok = await client.post("/score", json={"readings": [reading(), reading("VALVE-S22")]})
+            bad = await client.post("/score", json=reading(flow_rate=None))
+            health = await client.get("/health")
+            return ok.status, await ok.json(), bad.status, await bad.json(), await health.json()
+
+    ok_status, ok_body, bad_status, bad_body, health = asyncio.run(run())
+
+    assert ok_status == 200
+    assert [result["equipment_id"] for result in ok_body["results"]] == ["PUMP-101", "VALVE-S22"]
+    assert set(ok_body["results"][0]) == {"equipment_id", "anomaly_score", "is_anomaly", "rule_violation"}
+    assert bad_status == 400 and "flow_rate" in bad_body["error"]
+    assert health["status"] == "ok"
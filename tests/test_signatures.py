@@ -0,0 +1,66 @@
+"""
+Kiểm thử chữ ký bất thường dùng để bỏ qua các lần gọi LLM không cần thiết.
+"""
+import numpy as np
+import pandas as pd
+
+from src.advisors.llm_advisor import LLMAdvisor
+from src.agents.maintenance_agent import MaintenanceAgent, anomaly_signature, signature_changed
+from src.models.anomaly_detector import FEATURES
+
+
+def signature(count=10.0, percentage=5.0, **means):
+    values = {"anomaly_count": count, "anomaly_percentage": percentage}
+    values.update({f"mean_{feature}": means.get(feature, 0.0) for feature in FEATURES})
+    return values
+
+
+def test_anomaly_signature_of_scored_data():
+    data = pd.DataFrame({feature: [1.0, 3.0, 5.0, 7.0] for feature in FEATURES})
+    data['is_anomaly'] = [True, False, True, False]
+
+    result = anomaly_signature(data)
+    assert result["anomaly_count"] == 2
+    assert result["anomaly_percentage"] == 50
+    assert result["mean_temperature"] == 3.0
+
+
+def test_signature_without_anomalies_has_nan_means():
+    data = pd.DataFrame({feature: [1.0] for feature in FEATURES})
+    data['is_anomaly'] = [False]
+
+    result = anomaly_signature(data)
+    assert result["anomaly_count"] == 0
+    assert all(np.isnan(result[f"mean_{feature}"]) for feature in FEATURES)
+    assert not signature_changed(result, anomaly_signature(data))
+
+
+def test_signature_changed_within_and_beyond_tolerance():
+    previous = signature()
+
+    assert signature_changed(None, previous)
+    assert not signature_changed(previous, signature(count=14.0, percentage=5.9, temperature=0.2))
+    assert signature_changed(previous, signature(count=16.0))
+    assert signature_changed(previous, signature(percentage=6.5))
+    assert signature_changed(previous, signature(vibration=0.3))
+    assert not signature_changed(previous, signature(vibration=0.3), {"sensor_mean": 0.5})
+
+
+def test_signature_changed_when_anomalies_appear_or_vanish():
+    without = signature(count=0.0, percentage=0.0, **{feature: np.nan for feature in FEATURES})
+
+    assert signature_changed(without, signature(count=1.0, percentage=0.5))
+    assert signature_changed(signature(count=1.0, percentage=0.5), without)
+
+
+def test_unchanged_equipment_is_not_reanalysed(readings_csv, fake_llm):
+    agent = MaintenanceAgent(llm_advisor=LLMAdvisor(llm=fake_llm.as_runnable()))
+    agent.initialize_system(readings_csv)
+    agent.process_all_equipment()
+    first_calls = agent.analysis_count
+
+    agent.process_all_equipment()
+    assert agent.analysis_count == first_calls
+
+    agent.process_equipment("PUMP-101", force=True)
+    assert agent.analysis_count == first_calls + 1
@@ -0,0 +1,66 @@
+"""
+Kiểm thử lưu và khôi phục snapshot trạng thái agent.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.advisors.llm_advisor import LLMAdvisor
+from src.agents.maintenance_agent import MaintenanceAgent
+from src.agents.snapshot import AgentSnapshot, snapshot_key
+from src.models.anomaly_detector import FEATURES
+
+
+def test_snapshot_key_tracks_files_and_config(readings_csv):
+    key = snapshot_key(readings_csv, {"planning": "llm"})
+
+    assert snapshot_key([readings_csv], {"planning": "llm"}) == key
+    assert snapshot_key(readings_csv, {"planning": "scheduler"}) != key
+
+    stat = os.stat(readings_csv)
+    os.utime(readings_csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert snapshot_key(readings_csv, {"planning": "llm"}) != key
+
+
+def test_data_round_trip(tmp_path):
+    data = pd.DataFrame({
+        'temperature': [1.0, 2.0], 'pressure': [3.0, 4.0], 'vibration': [5.0, 6.0],
+        'flow_rate': [7.0, 8.0], 'power_consumption': [9.0, 10.0],
+        'timestamp': pd.to_datetime(["2025-01-01 00:00", "2025-01-01 00:05"]),
+        'equipment_id': ["PUMP-101", "VALVE-S22"],
+        'days_since_maintenance': [30, 31],
+    })
+    AgentSnapshot._save_data(data, str(tmp_path))
+
+    restored = AgentSnapshot._load_data(str(tmp_path))
+    pd.testing.assert_frame_equal(restored, data)
+
+
+def test_restart_restores_agent_from_snapshot(tmp_path, readings_csv, fake_llm):
+    snapshot_dir = str(tmp_path / "snapshots")
+
+    def start_agent():
+        agent = MaintenanceAgent(snapshot_dir=snapshot_dir, llm_advisor=LLMAdvisor(llm=fake_llm.as_runnable()))
+        return agent, agent.initialize_system(readings_csv)
+
+    agent, restored = start_agent()
+    assert not restored
+    agent.process_all_equipment()
+
+    copy, restored = start_agent()
+    assert restored
+    assert copy.equipment_status == agent.equipment_status
+    assert copy.maintenance_recommendations == agent.maintenance_recommendations
+    assert copy.maintenance_plan == agent.maintenance_plan
+
+    pd.testing.assert_frame_equal(copy.data_processor.data[agent.data_processor.data.columns],
+                                  agent.data_processor.data)
+    features = agent.data_processor.data[FEATURES].to_numpy()
+    np.testing.assert_array_equal(copy.anomaly_detector.score(features)[0],
+                                  agent.anomaly_detector.score(features)[0])
+
+    # The restored agent skips the LLM for the unchanged equipment
+    calls = fake_llm.calls
+    copy.process_all_equipment()
+    assert fake_llm.calls == calls